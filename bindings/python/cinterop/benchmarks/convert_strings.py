@@ -0,0 +1,80 @@
+"""Call rates of native functions wrapped with `convert_strings`, compared with the generic wrapper it replaces.
+
+Requires the test native library, built in `tests/test_native_library/build`.
+
+Usage: python benchmarks/convert_strings.py [n_calls]
+"""
+
+import itertools
+import os
+import sys
+import timeit
+from functools import wraps
+
+from cffi import FFI
+from refcount.putils import library_short_filename
+
+pkg_dir = os.path.join(os.path.dirname(__file__), "..")
+sys.path.insert(0, pkg_dir)
+
+from cinterop.cffi.marshal import as_bytes, as_string, convert_strings
+
+native_dir = os.path.join(pkg_dir, "tests/test_native_library")
+
+
+def generic_convert_strings(func):
+    """The previous implementation of `convert_strings`, converting all arguments on every call"""
+
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        new_args = []
+        for arg in args:
+            new_args.append(as_bytes(arg))
+        new_kwargs = {}
+        for key in kwargs:
+            new_kwargs[key] = as_bytes(kwargs[key])
+        return_value = func(*new_args, **new_kwargs)
+        if isinstance(return_value, (list, tuple)):
+            return [as_string(obj) for obj in return_value]
+        else:
+            return as_string(return_value)
+
+    return wrapper
+
+
+def _rate(f, n_calls: int) -> float:
+    return n_calls / min(timeit.repeat(f, number=n_calls, repeat=5))
+
+
+def main(n_calls: int = 100000) -> None:
+    ffi = FFI()
+    for header in ["structs_cdef.h", "funcs_cdef.h"]:
+        with open(os.path.join(native_dir, header)) as f:
+            ffi.cdef(f.read())
+    lib = ffi.dlopen(os.path.join(native_dir, "build", library_short_filename("test_native_library")))
+    ssm = lib.create_ssm()
+    arr = ffi.new("int[3]")
+    names = [("name_%d" % i).encode() for i in range(100)]
+    # distinct strings for each call of a repetition, so that any caching of encodings would miss
+    keys = ["key_%d" % i for i in range(n_calls)]
+    # the strings returned by value_for_key_ssm are not freed: a small leak, acceptable for a benchmark
+    cases = [
+        ("value_for_key_ssm(str, struct)", lib.value_for_key_ssm, lambda f: f("a", ssm[0])),
+        ("value_for_key_ssm(distinct str)", lib.value_for_key_ssm, lambda f: f(next(distinct), ssm[0])),
+        ("get_array_int(int*, int)", lib.get_array_int, lambda f: f(arr, 1)),
+        ("python function -> 100 bytes", lambda: names, lambda f: f()),
+    ]
+    print(f"{'function':<32} {'generic calls/s':>16} {'specialised calls/s':>20} {'speedup':>8}")
+    for name, func, call in cases:
+        generic = generic_convert_strings(func)
+        specialised = convert_strings(func)
+        distinct = itertools.cycle(keys)
+        r0 = _rate(lambda: call(generic), n_calls)
+        distinct = itertools.cycle(keys)
+        r1 = _rate(lambda: call(specialised), n_calls)
+        print(f"{name:<32} {r0:>16.0f} {r1:>20.0f} {r1 / r0:>8.2f}")
+    lib.dispose_ssm(ssm)
+
+
+if __name__ == "__main__":
+    main(*[int(x) for x in sys.argv[1:2]])
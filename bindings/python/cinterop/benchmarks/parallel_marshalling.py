@@ -0,0 +1,57 @@
+"""Timings of the conversion of large ensemble time series, with a varying number of copy threads.
+
+Any speedup over one worker depends on the number of CPUs and the memory bandwidth; on a single CPU
+the timings are the same for all numbers of workers.
+
+Usage: python benchmarks/parallel_marshalling.py [ensemble_size] [length]
+"""
+
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+from cffi import FFI
+
+pkg_dir = os.path.join(os.path.dirname(__file__), "..")
+sys.path.insert(0, pkg_dir)
+
+from cinterop.cffi.marshal import CffiMarshal
+from cinterop.cffi.parallel import ParallelCopyEngine
+from cinterop.timeseries import create_daily_time_index, create_ensemble_series
+
+cdefs_dir = os.path.join(pkg_dir, "tests/test_native_library")
+
+
+def _timeit(func, repeat: int = 5) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main(ensemble_size: int = 1000, length: int = 20000) -> None:
+    ffi = FFI()
+    with open(os.path.join(cdefs_dir, "structs_cdef.h")) as f:
+        ffi.cdef(f.read())
+    data = create_ensemble_series(
+        np.random.rand(ensemble_size, length),
+        [str(i) for i in range(ensemble_size)],
+        create_daily_time_index(pd.Timestamp("1900-01-01"), length),
+    )
+    print(f"ensemble_size={ensemble_size}, length={length}, cpus={os.cpu_count()}")
+    print(f"{'workers':>8} {'to_native (s)':>14} {'to_xarray (s)':>14}")
+    for n in [1, 2, 4, 8, 16]:
+        with ParallelCopyEngine(max_workers=n) as engine:
+            m = CffiMarshal(ffi, engine=engine)
+            native = m.as_native_time_series(data)
+            t_to = _timeit(lambda: m.as_native_time_series(data))
+            t_from = _timeit(lambda: m.as_xarray_time_series(native.ptr))
+        print(f"{n:>8} {t_to:>14.4f} {t_from:>14.4f}")
+
+
+if __name__ == "__main__":
+    main(*[int(x) for x in sys.argv[1:3]])
@@ -0,0 +1,72 @@
+"""Throughput of time series conversions with a CffiMarshal shared by a varying number of threads.
+
+The interpreter build and GIL status are reported along with the timings. With the GIL enabled,
+more threads do not increase the throughput. Scaling on a free-threaded build (e.g. `python3.13t`)
+has not been measured yet.
+
+Usage: python benchmarks/threaded_marshalling.py [ensemble_size] [length] [n_conversions]
+"""
+
+import os
+import sys
+import sysconfig
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+from cffi import FFI
+
+pkg_dir = os.path.join(os.path.dirname(__file__), "..")
+sys.path.insert(0, pkg_dir)
+
+from cinterop.cffi.marshal import CffiMarshal
+from cinterop.timeseries import create_daily_time_index, create_ensemble_series
+
+cdefs_dir = os.path.join(pkg_dir, "tests/test_native_library")
+
+
+def _run(marshal: CffiMarshal, data, n_threads: int, n_conversions: int) -> float:
+    per_thread = n_conversions // n_threads
+    barrier = threading.Barrier(n_threads + 1)
+
+    def worker() -> None:
+        barrier.wait()
+        for _ in range(per_thread):
+            native = marshal.as_native_time_series(data)
+            marshal.as_xarray_time_series(native.ptr)
+
+    threads = [threading.Thread(target=worker) for _ in range(n_threads)]
+    for t in threads:
+        t.start()
+    barrier.wait()
+    start = time.perf_counter()
+    for t in threads:
+        t.join()
+    return per_thread * n_threads / (time.perf_counter() - start)
+
+
+def main(ensemble_size: int = 10, length: int = 1000, n_conversions: int = 2000) -> None:
+    ffi = FFI()
+    with open(os.path.join(cdefs_dir, "structs_cdef.h")) as f:
+        ffi.cdef(f.read())
+    marshal = CffiMarshal(ffi)
+    data = create_ensemble_series(
+        np.random.rand(ensemble_size, length),
+        [str(i) for i in range(ensemble_size)],
+        create_daily_time_index(pd.Timestamp("1900-01-01"), length),
+    )
+    free_threaded_build = bool(sysconfig.get_config_var("Py_GIL_DISABLED"))
+    gil_enabled = getattr(sys, "_is_gil_enabled", lambda: True)()
+    print(f"python {sys.version.split()[0]}, free-threaded build: {free_threaded_build}, GIL enabled: {gil_enabled}")
+    print(f"ensemble_size={ensemble_size}, length={length}, cpus={os.cpu_count()}")
+    print(f"{'threads':>8} {'round trips/s':>14} {'speedup':>8} {'efficiency':>10}")
+    base = None
+    for n in [1, 2, 4, 8, 16]:
+        rate = _run(marshal, data, n, n_conversions)
+        base = base or rate
+        print(f"{n:>8} {rate:>14.1f} {rate / base:>8.2f} {rate / base / n:>10.2f}")
+
+
+if __name__ == "__main__":
+    main(*[int(x) for x in sys.argv[1:4]])
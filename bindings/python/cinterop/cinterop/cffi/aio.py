@@ -0,0 +1,193 @@
+"""Asynchronous (asyncio) interface to native calls and marshalling via cffi.
+
+Native calls and the conversions of large data to/from native representations are
+run on a thread pool, so that they do not block the event loop.
+"""
+
+import asyncio
+import functools
+import threading
+from concurrent.futures import Executor, Future, ThreadPoolExecutor
+from typing import Any, Awaitable, Callable, Optional, Sequence, Set, Union
+
+import xarray as xr
+from refcount.interop import (
+    CffiData,
+    OwningCffiNativeHandle,
+    unwrap_cffi_native_handle,
+)
+
+from cinterop.cffi.marshal import CffiMarshal
+from cinterop.timeseries import TimeSeriesLike
+
+
+def _unwrap(x: Any) -> Any:
+    if isinstance(x, OwningCffiNativeHandle):
+        return unwrap_cffi_native_handle(x)
+    return x
+
+
+class AsyncNativeCaller:
+    """Runs native calls and marshalling on a thread pool, awaitable from an asyncio event loop.
+
+    The arguments of a call, including native handles, are referenced until the call
+    has completed in its worker thread, even if the awaiting task is cancelled in the meantime.
+    Calls waiting for a concurrency slot or for a worker thread are cancelled along with their task,
+    and are then never started. A call already running in native code cannot be interrupted;
+    it still counts towards the concurrency limit until it returns.
+    """
+
+    def __init__(
+        self,
+        marshal: CffiMarshal,
+        max_workers: Optional[int] = None,
+        max_concurrency: Optional[int] = None,
+        executor: Optional[Executor] = None,
+    ) -> None:
+        """Runs native calls and marshalling on a thread pool, awaitable from an asyncio event loop.
+
+        Args:
+            marshal (CffiMarshal): marshalling helper for the native library
+            max_workers (Optional[int], optional): number of worker threads, if the executor is created by this object. Defaults to None.
+            max_concurrency (Optional[int], optional): maximum number of calls running or queued in the executor at any one time. Defaults to None, for `max_workers` if specified, otherwise no limit.
+            executor (Optional[Executor], optional): executor to use. Defaults to None, in which case a thread pool is created on first use and owned by this object.
+        """
+        self.marshal = marshal
+        self.max_workers = max_workers
+        self.max_concurrency = max_concurrency if max_concurrency is not None else max_workers
+        self._executor = executor
+        self._owns_executor = executor is None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._pending: Set[Future] = set()
+        self._lock = threading.Lock()
+
+    @property
+    def executor(self) -> Executor:
+        """The executor running the calls"""
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.max_workers, thread_name_prefix="cinterop-aio"
+                )
+            return self._executor
+
+    @property
+    def pending_count(self) -> int:
+        """Number of calls submitted to the executor and not yet completed"""
+        with self._lock:
+            return len(self._pending)
+
+    def _get_semaphore(self) -> Optional[asyncio.Semaphore]:
+        if self.max_concurrency is None:
+            return None
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        return self._semaphore
+
+    def _done(
+        self,
+        loop: asyncio.AbstractEventLoop,
+        semaphore: Optional[asyncio.Semaphore],
+        f: Future,
+    ) -> None:
+        with self._lock:
+            self._pending.discard(f)
+        if semaphore is not None and not loop.is_closed():
+            loop.call_soon_threadsafe(semaphore.release)
+
+    async def run(self, func: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+        """Runs a function on the thread pool, e.g. a sequence of marshalling steps and native calls
+
+        Args:
+            func (Callable[..., Any]): function to run
+            args: positional arguments to the function
+            kwargs: keyword arguments to the function
+
+        Returns:
+            Any: the result of the function
+        """
+        loop = asyncio.get_running_loop()
+        semaphore = self._get_semaphore()
+        if semaphore is not None:
+            await semaphore.acquire()
+        try:
+            f = self.executor.submit(func, *args, **kwargs)
+        except BaseException:
+            if semaphore is not None:
+                semaphore.release()
+            raise
+        with self._lock:
+            self._pending.add(f)
+        f.add_done_callback(functools.partial(self._done, loop, semaphore))
+        return await asyncio.wrap_future(f, loop=loop)
+
+    async def call_native(self, func: Callable[..., Any], *args: Any) -> Any:
+        """Calls a native function on the thread pool
+
+        Args:
+            func (Callable[..., Any]): function of the library loaded with `FFI.dlopen`
+            args: arguments to the native function. Native handles are unwrapped to their pointers, and are kept alive until the native call returns.
+
+        Returns:
+            Any: the result of the native function
+        """
+        return await self.run(lambda: func(*[_unwrap(x) for x in args]))
+
+    def wrap(self, func: Callable[..., Any]) -> Callable[..., Awaitable[Any]]:
+        """Creates an async function calling a native function on the thread pool"""
+
+        @functools.wraps(func)
+        async def _f(*args: Any) -> Any:
+            return await self.call_native(func, *args)
+
+        return _f
+
+    async def as_native_time_series(self, data: TimeSeriesLike) -> OwningCffiNativeHandle:
+        """Convert a time series to a native `multi_regular_time_series_data`, on the thread pool"""
+        return await self.run(self.marshal.as_native_time_series, data)
+
+    async def as_xarray_time_series(
+        self, ptr: Union[CffiData, OwningCffiNativeHandle]
+    ) -> xr.DataArray:
+        """Convert a native `multi_regular_time_series_data` to an xarray time series, on the thread pool"""
+        return await self.run(lambda: self.marshal.as_xarray_time_series(_unwrap(ptr)))
+
+    async def as_native_time_series_batch(self, data: Any) -> OwningCffiNativeHandle:
+        """Convert a batch of time series to a native array of `multi_regular_time_series_data*`, on the thread pool"""
+        return await self.run(self.marshal.as_native_time_series_batch, data)
+
+    async def as_xarray_dataset(
+        self, ptrs: Sequence[CffiData], names: Sequence[str], stack: bool = False
+    ) -> Any:
+        """Convert native time series to an xarray dataset, on the thread pool"""
+        return await self.run(self.marshal.as_xarray_dataset, ptrs, names, stack)
+
+    def cancel_pending(self) -> int:
+        """Cancels the calls queued in the executor and not yet started
+
+        Returns:
+            int: number of calls cancelled
+        """
+        with self._lock:
+            pending = list(self._pending)
+        return sum(1 for f in pending if f.cancel())
+
+    def shutdown(self, wait: bool = True) -> None:
+        """Cancels queued calls and shuts down the thread pool, if owned by this object"""
+        self.cancel_pending()
+        with self._lock:
+            executor = self._executor if self._owns_executor else None
+            if executor is not None:
+                self._executor = None
+        if executor is not None:
+            executor.shutdown(wait=wait)
+
+    async def aclose(self) -> None:
+        """Cancels queued calls and waits for the running ones without blocking the event loop"""
+        await asyncio.get_running_loop().run_in_executor(None, self.shutdown)
+
+    async def __aenter__(self) -> "AsyncNativeCaller":
+        return self
+
+    async def __aexit__(self, *args: Any) -> None:
+        await self.aclose()
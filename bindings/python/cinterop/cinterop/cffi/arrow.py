@@ -0,0 +1,271 @@
+"""Conversions between native structs and Apache Arrow arrays and tables (optional dependency `pyarrow`).
+
+Numeric data can be wrapped without copies in either direction. In that case the Arrow buffers or native structs
+reference the objects owning the memory, but native memory freed by the native library itself
+(e.g. with a `dispose_*` function) must outlive the Arrow objects wrapping it.
+"""
+
+from typing import TYPE_CHECKING, Any, Optional, Union
+
+import numpy as np
+import pandas as pd
+from cffi import FFI
+from refcount.interop import CffiData, OwningCffiNativeHandle, unwrap_cffi_native_handle
+
+from cinterop.cffi.marshal import (
+    TimeSeriesGeometry,
+    TimeSeriesGeometryNative,
+    as_np_array_double,
+    get_tsgeom,
+    new_doubleptr_array,
+)
+from cinterop.timeseries import TIME_DIMNAME, as_timestamp
+
+if TYPE_CHECKING:
+    import pyarrow as pa
+else:
+    try:
+        import pyarrow as pa
+    except ImportError:  # pragma: no cover
+        pa = None
+
+
+def _require_pyarrow() -> None:
+    if pa is None:  # pragma: no cover
+        raise ImportError("Arrow interoperability requires the package 'pyarrow'")
+
+
+def _wrap_doubles(
+    ffi: FFI, ptr: CffiData, size: int, base: Any, zero_copy: bool
+) -> "pa.Array":
+    if size == 0:
+        return pa.array([], type=pa.float64())
+    if zero_copy:
+        address = int(ffi.cast("uintptr_t", ptr))
+        buffer = pa.foreign_buffer(address, size * 8, base=base)
+        return pa.Array.from_buffers(pa.float64(), size, [None, buffer])
+    return pa.array(as_np_array_double(ffi, ptr, size, shallow=False))
+
+
+def _float64_values(arr: Any) -> np.ndarray:
+    """numpy float64 values of an Arrow array, chunked array or table column, without copy if possible"""
+    if isinstance(arr, pa.ChunkedArray):
+        arr = arr.combine_chunks() if arr.num_chunks != 1 else arr.chunk(0)
+    if arr.null_count > 0:
+        raise ValueError(
+            "Arrow arrays with null values cannot be converted to native numeric data"
+        )
+    if arr.type != pa.float64():
+        arr = arr.cast(pa.float64())
+    # a read only view on the Arrow buffer, for float64 arrays without nulls
+    return arr.to_numpy(zero_copy_only=False)
+
+
+def values_vector_to_arrow(
+    ffi: FFI, ptr: Union[CffiData, OwningCffiNativeHandle], zero_copy: bool = False
+) -> "pa.Array":
+    """Convert a native `values_vector` to an Arrow array of float64
+
+    Args:
+        ffi (FFI): ffi object to the library
+        ptr (Union[CffiData, OwningCffiNativeHandle]): pointer or handle to a `values_vector` struct
+        zero_copy (bool, optional): If True the Arrow array points to the native values, and references `ptr`. Defaults to False.
+
+    Returns:
+        pa.Array: float64 array
+    """
+    _require_pyarrow()
+    p: CffiData = unwrap_cffi_native_handle(ptr)
+    return _wrap_doubles(ffi, p.values, p.size, ptr, zero_copy)
+
+
+def arrow_to_values_vector(ffi: FFI, arr: Any) -> OwningCffiNativeHandle:
+    """Convert an Arrow numeric array to a native `values_vector`
+
+    Arrays of float64 without null values, in a single chunk, are passed to the native struct without copy.
+    Arrow data is immutable: native code must not modify the values.
+
+    Args:
+        ffi (FFI): ffi object to the library
+        arr (Any): Arrow array or chunked array
+
+    Returns:
+        OwningCffiNativeHandle: wrapper to a `values_vector` struct, keeping the data alive
+    """
+    _require_pyarrow()
+    values = _float64_values(arr)
+    ptr = ffi.new("values_vector*")
+    ptr.size = len(values)
+    buffer = ffi.from_buffer("double[]", values) if len(values) > 0 else ffi.NULL
+    ptr.values = buffer
+    result = OwningCffiNativeHandle(ptr)
+    result.keepalive = [arr, values, buffer]
+    return result
+
+
+def character_vector_to_arrow(
+    ffi: FFI, ptr: Union[CffiData, OwningCffiNativeHandle]
+) -> "pa.Array":
+    """Convert a native `character_vector` to an Arrow string array
+
+    The offsets and data buffers of the Arrow array are built in one pass over the native strings.
+
+    Args:
+        ffi (FFI): ffi object to the library
+        ptr (Union[CffiData, OwningCffiNativeHandle]): pointer or handle to a `character_vector` struct
+
+    Returns:
+        pa.Array: array of strings
+    """
+    _require_pyarrow()
+    p: CffiData = unwrap_cffi_native_handle(ptr)
+    n = p.size
+    items = [ffi.string(p.values[i]) for i in range(n)]
+    offsets = np.zeros(n + 1, dtype=np.int32)
+    if n > 0:
+        np.cumsum([len(x) for x in items], out=offsets[1:])
+    data = b"".join(items)
+    return pa.Array.from_buffers(
+        pa.string(), n, [None, pa.py_buffer(offsets), pa.py_buffer(data)]
+    )
+
+
+def arrow_to_character_vector(ffi: FFI, arr: Any) -> OwningCffiNativeHandle:
+    """Convert an Arrow string array to a native `character_vector`
+
+    All strings are copied into a single native buffer of null terminated strings.
+
+    Args:
+        ffi (FFI): ffi object to the library
+        arr (Any): Arrow array or chunked array of strings
+
+    Raises:
+        ValueError: the array contains null values
+
+    Returns:
+        OwningCffiNativeHandle: wrapper to a `character_vector` struct
+    """
+    _require_pyarrow()
+    if isinstance(arr, pa.ChunkedArray):
+        arr = arr.combine_chunks()
+    if arr.null_count > 0:
+        raise ValueError(
+            "Arrow string arrays with null values cannot be converted to a character_vector"
+        )
+    if arr.type != pa.large_string():
+        arr = arr.cast(pa.large_string())
+    n = len(arr)
+    _, offsets_buffer, data_buffer = arr.buffers()
+    offsets = np.frombuffer(offsets_buffer, dtype=np.int64)[arr.offset : arr.offset + n + 1]
+    if data_buffer is None:
+        data = np.empty(0, dtype=np.uint8)
+    else:
+        data = np.frombuffer(data_buffer, dtype=np.uint8)[offsets[0] : offsets[-1]]
+    starts = offsets[:-1] - offsets[0]
+    # null terminator after each string
+    block = np.insert(data, offsets[1:] - offsets[0], 0)
+    ptr = ffi.new("character_vector*")
+    ptr.size = n
+    ptr.values = ffi.NULL
+    result = OwningCffiNativeHandle(ptr)
+    if n > 0:
+        # the strings point directly into the new numpy block
+        native_block = ffi.from_buffer("char[]", block)
+        base = int(ffi.cast("intptr_t", native_block))
+        addresses = (base + starts + np.arange(n)).astype(np.intp)
+        values = ffi.from_buffer("char *[]", addresses)
+        ptr.values = values
+        result.keepalive = [block, native_block, addresses, values]
+    return result
+
+
+def _arrow_timestamps(geometry: TimeSeriesGeometry) -> "pa.Array":
+    if geometry.time_step_code == 0:
+        start = np.datetime64(as_timestamp(geometry.start).to_datetime64(), "s")
+        step = np.timedelta64(geometry.time_step_seconds, "s")
+        ticks = start + np.arange(geometry.length) * step
+        return pa.array(ticks, type=pa.timestamp("s"))
+    index = pd.DatetimeIndex(geometry.time_index())
+    return pa.array(index.values.astype("datetime64[s]"), type=pa.timestamp("s"))
+
+
+def time_series_to_arrow(
+    ffi: FFI,
+    ptr: Union[CffiData, OwningCffiNativeHandle],
+    zero_copy: bool = False,
+    time_column: str = TIME_DIMNAME,
+) -> "pa.Table":
+    """Convert a native `multi_regular_time_series_data` to an Arrow table
+
+    The table has a timestamp column derived from the geometry of the series, and a float64 column per ensemble member,
+    named after the index of the member.
+
+    Args:
+        ffi (FFI): ffi object to the library
+        ptr (Union[CffiData, OwningCffiNativeHandle]): pointer or handle to a `multi_regular_time_series_data` struct
+        zero_copy (bool, optional): If True the data columns point to the native rows, and reference `ptr`. Defaults to False.
+        time_column (str, optional): name of the timestamp column. Defaults to "time".
+
+    Returns:
+        pa.Table: table
+    """
+    _require_pyarrow()
+    p: CffiData = unwrap_cffi_native_handle(ptr)
+    geometry = TimeSeriesGeometry.from_native(
+        TimeSeriesGeometryNative(p.time_series_geometry)
+    )
+    columns = [_arrow_timestamps(geometry)]
+    for i in range(p.ensemble_size):
+        columns.append(
+            _wrap_doubles(ffi, p.numeric_data[i], geometry.length, ptr, zero_copy)
+        )
+    names = [time_column] + [str(i) for i in range(p.ensemble_size)]
+    return pa.Table.from_arrays(columns, names=names)
+
+
+def arrow_to_native_time_series(
+    ffi: FFI,
+    table: "pa.Table",
+    time_column: str = TIME_DIMNAME,
+    time_step_seconds: Optional[int] = None,
+) -> OwningCffiNativeHandle:
+    """Convert an Arrow table to a native `multi_regular_time_series_data`
+
+    The geometry is derived from the timestamp column; the other columns are the ensemble members.
+    Columns of float64 without null values, in a single chunk, are passed as native rows without copy.
+    Arrow data is immutable: native code must not modify the values.
+
+    Args:
+        ffi (FFI): ffi object to the library
+        table (pa.Table): table with a regular timestamp column
+        time_column (str, optional): name of the timestamp column. Defaults to "time".
+        time_step_seconds (Optional[int], optional): time step, required for a table with a single row. Defaults to None.
+
+    Raises:
+        ValueError: the table has no row, or a single row and no `time_step_seconds`
+
+    Returns:
+        OwningCffiNativeHandle: wrapper to a `multi_regular_time_series_data` struct, keeping the data alive
+    """
+    _require_pyarrow()
+    index = pd.DatetimeIndex(table.column(time_column).to_numpy())
+    if len(index) == 0:
+        raise ValueError("Cannot convert a table without rows to a native time series")
+    geometry = get_tsgeom(pd.Series(np.empty(len(index)), index=index), time_step_seconds)
+    members = [table.column(c) for c in table.column_names if c != time_column]
+    rows = [_float64_values(c) for c in members]
+    buffers = [ffi.from_buffer("double[]", r) if len(r) > 0 else ffi.NULL for r in rows]
+    numeric_data: CffiData = new_doubleptr_array(ffi, len(rows))
+    for i, b in enumerate(buffers):
+        numeric_data[i] = b
+    ptr = ffi.new("multi_regular_time_series_data*")
+    ptr.ensemble_size = len(rows)
+    ptr.numeric_data = numeric_data
+    tsg = TimeSeriesGeometryNative(ptr.time_series_geometry)
+    tsg.start = geometry.start
+    tsg.time_step_seconds = geometry.time_step_seconds
+    tsg.length = geometry.length
+    tsg.time_step_code = geometry.time_step_code
+    result = OwningCffiNativeHandle(ptr)
+    result.keepalive = [table, rows, buffers, numeric_data]
+    return result
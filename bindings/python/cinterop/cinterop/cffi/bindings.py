@@ -0,0 +1,388 @@
+"""Generation of Python bindings to native functions, with the marshalling of their arguments and results.
+
+The wrapper of a native function is generated from its cffi signature, and optionally from a Python stub with type hints.
+Each argument is marshalled by a converter chosen once for its C type; unlike `convert_strings`, this includes
+conversions of Python objects to the cinterop structs. When the type hint of an argument is a Python type
+(e.g. `str`, `xr.DataArray`, `dict`), the generated code calls the converter directly, without runtime type checks.
+The native handles created for the call are kept alive until the native function returns.
+
+Examples:
+    >>> @native_binding(ffi, lib)
+    ... def value_for_key_ssm(key: str, ssm: Dict[str, str]) -> str:
+    ...     '''Value in a string map'''
+    >>> value_for_key_ssm("a", {"a": "A"})
+    'A'
+"""
+
+import inspect
+import keyword
+import re
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+import xarray as xr
+from cffi import FFI
+from refcount.interop import CffiData, OwningCffiNativeHandle, unwrap_cffi_native_handle
+
+from cinterop.cffi.marshal import (
+    TimeSeriesGeometry,
+    TimeSeriesGeometryNative,
+    as_bytes,
+    as_character_vector,
+    as_native_time_series,
+    as_xarray_time_series,
+    c_charptrptr_as_string_list,
+    create_values_struct,
+    datetime_to_dtts,
+    dict_to_named_values,
+    dict_to_string_map,
+    dtts_as_datetime,
+    named_values_to_dict,
+    string_map_to_dict,
+    values_to_nparray,
+)
+
+_to_native: Dict[str, Callable[[FFI, Any], OwningCffiNativeHandle]] = {
+    "multi_regular_time_series_data": as_native_time_series,
+    "values_vector": create_values_struct,
+    "named_values_vector": dict_to_named_values,
+    "character_vector": as_character_vector,
+    "string_string_map": dict_to_string_map,
+    "date_time_to_second": datetime_to_dtts,
+    "regular_time_series_geometry": lambda ffi, x: x.as_native(ffi),
+}
+"""Conversions of Python objects to native structs, by struct type"""
+
+_from_native: Dict[str, Callable[[FFI, CffiData], Any]] = {
+    "multi_regular_time_series_data": as_xarray_time_series,
+    "values_vector": values_to_nparray,
+    "named_values_vector": named_values_to_dict,
+    "character_vector": lambda ffi, p: c_charptrptr_as_string_list(ffi, p.values, p.size),
+    "string_string_map": string_map_to_dict,
+    "date_time_to_second": lambda ffi, p: dtts_as_datetime(p),
+    "regular_time_series_geometry": lambda ffi, p: TimeSeriesGeometry.from_native(
+        TimeSeriesGeometryNative(p)
+    ),
+}
+"""Conversions of pointers to native structs to Python objects, by struct type"""
+
+_PYTHON_HINTS = {
+    "multi_regular_time_series_data": (xr.DataArray, pd.Series, pd.DataFrame),
+    "values_vector": (np.ndarray, list),
+    "named_values_vector": (dict,),
+    "character_vector": (list,),
+    "string_string_map": (dict,),
+    "date_time_to_second": (datetime,),
+    "regular_time_series_geometry": (TimeSeriesGeometry,),
+}
+"""Python types that are always converted, i.e. without runtime type checks, when used as type hints"""
+
+
+def _hint_origin(hint: Any) -> Any:
+    """The class of a type hint, e.g. `dict` for `Dict[str, float]`"""
+    return getattr(hint, "__origin__", hint)
+
+
+def _is_python_hint(hint: Any, struct_name: str) -> bool:
+    origin = _hint_origin(hint)
+    return isinstance(origin, type) and issubclass(origin, _PYTHON_HINTS.get(struct_name, ()))
+
+
+def _struct_name(ctype: Any) -> Optional[str]:
+    t = ctype.item if ctype.kind == "pointer" else ctype
+    return t.cname if t.kind == "struct" else None
+
+
+class _Generic:
+    """Converts a Python object to a native struct, unless it is already a pointer or handle"""
+
+    __slots__ = ("ffi", "convert")
+
+    def __init__(self, ffi: FFI, convert: Callable[[FFI, Any], Any]) -> None:
+        self.ffi = ffi
+        self.convert = convert
+
+    def __call__(self, x: Any) -> Any:
+        if isinstance(x, (FFI.CData, OwningCffiNativeHandle)):
+            return x
+        return self.convert(self.ffi, x)
+
+
+def _doubles(ffi: FFI) -> Callable[[Any], Any]:
+    def convert(x: Any) -> Any:
+        if isinstance(x, (FFI.CData, OwningCffiNativeHandle)) or x is None:
+            return x
+        return ffi.from_buffer("double[]", np.ascontiguousarray(x, dtype=np.float64))
+
+    return convert
+
+
+def _deref(ffi: FFI) -> Callable[[Any], Any]:
+    def deref(x: Any) -> Any:
+        p: CffiData = unwrap_cffi_native_handle(x)
+        return p[0] if ffi.typeof(p).kind == "pointer" else p
+
+    return deref
+
+
+def _string_result(ffi: FFI, p: CffiData) -> Optional[str]:
+    if p == ffi.NULL:
+        return None
+    return ffi.string(p).decode("utf-8")
+
+
+_identifier = re.compile(r"([A-Za-z_]\w*)\s*(\[\s*\d*\s*\])?\s*$")
+
+_C_TYPE_WORDS = frozenset(
+    ["void", "char", "short", "int", "long", "float", "double", "signed", "unsigned", "const", "size_t"]
+)
+
+
+def cdef_arg_names(cdecl: str) -> List[str]:
+    """Names of the arguments in a C function declaration
+
+    Args:
+        cdecl (str): C function declaration, e.g. `char* value_for_key_ssm(const char* key, string_string_map ssm);`.
+            Function pointer arguments such as `int (*callback)(int, int)` are supported.
+
+    Raises:
+        ValueError: unnamed arguments, or unbalanced parentheses
+
+    Returns:
+        List[str]: argument names
+    """
+    params = cdecl[cdecl.index("(") + 1 : cdecl.rindex(")")].strip()
+    if params in ("", "void"):
+        return []
+    names = []
+    for param in _split_top_level(params):
+        param = param.strip()
+        if "(" in param:
+            # function pointer, e.g. `int (*callback)(int, int)`: the name is in the first parentheses
+            opening = param.index("(")
+            type_part = param[:opening]
+            m = _identifier.search(param[opening + 1 : _closing_paren(param, opening)])
+        else:
+            m = _identifier.search(param)
+            type_part = param[: m.start()] if m is not None else ""
+        if m is None or m.group(1) in _C_TYPE_WORDS or not type_part.strip():
+            raise ValueError("Unnamed argument '{}' in: {}".format(param, cdecl))
+        names.append(m.group(1))
+    return names
+
+
+def _closing_paren(text: str, start: int) -> int:
+    depth = 0
+    for i in range(start, len(text)):
+        if text[i] == "(":
+            depth += 1
+        elif text[i] == ")":
+            depth -= 1
+            if depth == 0:
+                return i
+    raise ValueError("Unbalanced parentheses in: {}".format(text))
+
+
+def _split_top_level(params: str) -> List[str]:
+    """Splits C parameters on the commas outside of parentheses, i.e. not those of function pointer parameters"""
+    parts = []
+    depth = 0
+    start = 0
+    for i, c in enumerate(params):
+        if c == "(":
+            depth += 1
+        elif c == ")":
+            depth -= 1
+        elif c == "," and depth == 0:
+            parts.append(params[start:i])
+            start = i + 1
+    parts.append(params[start:])
+    return parts
+
+
+class _Source:
+    def __init__(self) -> None:
+        self.lines: List[str] = []
+        self.namespace: Dict[str, Any] = {}
+
+    def bind(self, name: str, value: Any) -> str:
+        self.namespace[name] = value
+        return name
+
+
+def bind_native_function(
+    ffi: FFI,
+    lib: Any,
+    name: str,
+    arg_names: Optional[Sequence[str]] = None,
+    hints: Optional[Dict[str, Any]] = None,
+    dispose: Optional[Callable[[CffiData], Any]] = None,
+) -> Callable:
+    """Generates a Python function calling a native function, with the marshalling of its arguments and result
+
+    Arguments are marshalled according to their C type:
+
+    - `char*`: strings are encoded to UTF-8 bytes, with the encoding of short strings cached;
+    - `double*`: numpy arrays and sequences are passed as a pointer to their (contiguous float64) data;
+    - the cinterop structs, by pointer or by value: Python objects such as xarray time series, dictionaries,
+      lists or datetimes are converted to new native structs, kept alive during the call. Pointers and handles are passed as is;
+    - other pointers: handles are unwrapped;
+    - numbers are passed as is.
+
+    The result is converted only if there is a type hint for it ("return" in `hints`): `str` for `char*` results,
+    or the Python equivalent of a cinterop struct. The native result is then passed to `dispose`, if given, after its conversion.
+
+    Args:
+        ffi (FFI): ffi object to the library
+        lib (Any): native library loaded with `ffi.dlopen`
+        name (str): name of the native function
+        arg_names (Optional[Sequence[str]], optional): names of the arguments, e.g. from `cdef_arg_names`. Defaults to None, for `arg0`, `arg1`, ...
+        hints (Optional[Dict[str, Any]], optional): Python type hints of the arguments and result, by argument name and "return". Defaults to None.
+        dispose (Optional[Callable[[CffiData], Any]], optional): function freeing the native result once converted. Defaults to None.
+
+    Raises:
+        ValueError: arguments names inconsistent with the native function, or `dispose` without a conversion of the result
+
+    Returns:
+        Callable: Python function
+    """
+    func = getattr(lib, name)
+    ftype = ffi.typeof(func)
+    n = len(ftype.args)
+    if arg_names is None:
+        arg_names = ["arg{}".format(i) for i in range(n)]
+    arg_names = list(arg_names)
+    if len(arg_names) != n:
+        raise ValueError(
+            "Native function '{}' has {} arguments, but {} names were given".format(name, n, len(arg_names))
+        )
+    for a in arg_names:
+        # names starting with an underscore are reserved for the generated code
+        if not a.isidentifier() or keyword.iskeyword(a) or a.startswith("_"):
+            raise ValueError("Invalid argument name: {}".format(a))
+    hints = hints or {}
+    src = _Source()
+    src.bind("_f", func)
+    src.bind("_ffi", ffi)
+    call_args = []
+    for i, (a, ctype) in enumerate(zip(arg_names, ftype.args)):
+        hint = hints.get(a)
+        struct_name = _struct_name(ctype)
+        by_value = ctype.kind == "struct"
+        if ctype.kind == "pointer" and ctype.item.cname == "char":
+            src.bind("_as_bytes", as_bytes)
+            call_args.append("_as_bytes({})".format(a))
+        elif struct_name in _to_native:
+            local = "_k{}".format(i)
+            convert = _to_native[struct_name]
+            if hint is not None and _is_python_hint(hint, struct_name):
+                conv = src.bind("_c{}".format(i), convert)
+                src.lines.append("    {} = {}(_ffi, {})".format(local, conv, a))
+                native = "{}.ptr".format(local)
+            else:
+                conv = src.bind("_c{}".format(i), _Generic(ffi, convert))
+                src.lines.append("    {} = {}({})".format(local, conv, a))
+                if by_value:
+                    # a struct may also be given by value
+                    src.bind("_deref", _deref(ffi))
+                    call_args.append("_deref({})".format(local))
+                    continue
+                src.bind("_unwrap", unwrap_cffi_native_handle)
+                native = "_unwrap({})".format(local)
+            call_args.append(native + "[0]" if by_value else native)
+        elif by_value:
+            src.bind("_deref", _deref(ffi))
+            call_args.append("_deref({})".format(a))
+        elif ctype.kind == "pointer" and ctype.item.cname == "double":
+            local = "_k{}".format(i)
+            conv = src.bind("_c{}".format(i), _doubles(ffi))
+            src.bind("_unwrap", unwrap_cffi_native_handle)
+            src.lines.append("    {} = {}({})".format(local, conv, a))
+            call_args.append("_unwrap({})".format(local))
+        elif ctype.kind == "pointer":
+            src.bind("_unwrap", unwrap_cffi_native_handle)
+            call_args.append("_unwrap({})".format(a))
+        else:
+            call_args.append(a)
+    call = "_f({})".format(", ".join(call_args))
+
+    result_hint = hints.get("return")
+    result = ftype.result
+    convert_result = None
+    if result_hint is not None and result.kind == "pointer":
+        struct_name = _struct_name(result)
+        if result.item.cname == "char" and _hint_origin(result_hint) is str:
+            convert_result = _string_result
+        elif struct_name in _from_native:
+            convert_result = _from_native[struct_name]
+    if dispose is not None and convert_result is None:
+        raise ValueError(
+            "The result of '{}' can only be disposed of if converted: give a Python type hint for it".format(name)
+        )
+    if convert_result is None:
+        src.lines.append("    return " + call)
+    else:
+        src.bind("_out", convert_result)
+        src.lines.append("    _r = " + call)
+        if dispose is None:
+            src.lines.append("    return _out(_ffi, _r)")
+        else:
+            src.bind("_dispose", dispose)
+            src.lines.append("    try:")
+            src.lines.append("        return _out(_ffi, _r)")
+            src.lines.append("    finally:")
+            src.lines.append("        _dispose(_r)")
+    source = "def {}({}):\n{}\n".format(name, ", ".join(arg_names), "\n".join(src.lines))
+    code = compile(source, "<native binding {}>".format(name), "exec")
+    exec(code, src.namespace)
+    return src.namespace[name]
+
+
+def native_binding(
+    ffi: FFI,
+    lib: Any,
+    name: Optional[str] = None,
+    dispose: Optional[Callable[[CffiData], Any]] = None,
+) -> Callable[[Callable], Callable]:
+    """Decorator generating the binding to a native function from a Python stub with type hints
+
+    The names and type hints of the arguments of the stub, and its docstring, are used for the generated function.
+    The body of the stub is not used.
+
+    Args:
+        ffi (FFI): ffi object to the library
+        lib (Any): native library loaded with `ffi.dlopen`
+        name (Optional[str], optional): name of the native function. Defaults to None, for the name of the stub.
+        dispose (Optional[Callable[[CffiData], Any]], optional): function freeing the native result once converted. Defaults to None.
+
+    Returns:
+        Callable[[Callable], Callable]: decorator
+    """
+
+    def decorator(stub: Callable) -> Callable:
+        signature = inspect.signature(stub)
+        hints = {
+            k: p.annotation
+            for k, p in signature.parameters.items()
+            if p.annotation is not inspect.Parameter.empty
+        }
+        if signature.return_annotation is not inspect.Signature.empty:
+            hints["return"] = signature.return_annotation
+        wrapper = bind_native_function(
+            ffi,
+            lib,
+            name or stub.__name__,
+            list(signature.parameters),
+            hints,
+            dispose,
+        )
+        wrapper.__name__ = stub.__name__
+        wrapper.__qualname__ = stub.__qualname__
+        wrapper.__doc__ = stub.__doc__
+        wrapper.__module__ = stub.__module__
+        wrapper.__annotations__ = dict(getattr(stub, "__annotations__", {}))
+        return wrapper
+
+    return decorator
@@ -1,40 +1,171 @@
-from datetime import datetime
+import hashlib
+import threading
+import weakref
+from collections import OrderedDict
+from datetime import datetime, timedelta
 from functools import wraps
-from typing import Any, Callable, Dict, List, Optional, Union
+from types import MappingProxyType
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Mapping,
+    Optional,
+    Sequence,
+    Tuple,
+    Union,
+)
 
 import numpy as np
 import pandas as pd
 import six
 import xarray as xr
 from cffi import FFI
-from refcount.interop import CffiData, CffiNativeHandle, OwningCffiNativeHandle
+from refcount.interop import (
+    CffiData,
+    CffiNativeHandle,
+    OwningCffiNativeHandle,
+    unwrap_cffi_native_handle,
+)
 from typing_extensions import TypeAlias
 
+from cinterop.cffi.parallel import ParallelCopyEngine
 from cinterop.timeseries import (
     ENSEMBLE_DIMNAME,
+    LEADTIME_DIMNAME,
     TIME_DIMNAME,
+    VARIABLE_DIMNAME,
     ConvertibleToTimestamp,
     TimeSeriesLike,
+    TimeWindow,
     _pd_index,
+    as_datetime64,
     as_pydatetime,
     as_timestamp,
+    create_ensemble_forecasts_series,
     create_ensemble_series,
     create_even_time_index,
     create_monthly_time_index,
+    stacked_windows,
+    window_positions,
 )
 
+try:
+    import xxhash  # optional, faster content fingerprints
+except ImportError:  # pragma: no cover
+    xxhash = None
+
 NativePointerLike: TypeAlias = Union[OwningCffiNativeHandle, CffiNativeHandle, CffiData]
 """types that can represent time series 
 """
 # if TYPE_CHECKING:
 
 
-_c2dtype = dict()
-"""Mapping from a C pointer type to a numpy dtypes"""
+_c2dtype = MappingProxyType(
+    {
+        "float *": np.dtype("f4"),
+        "double *": np.dtype("f8"),
+        # "int *": np.dtype("i4"), TBD
+    }
+)
+"""Mapping from a C pointer type to a numpy dtypes (read only, shared by all threads)"""
+
+
+class ReadMostlyCache:
+    """A bounded cache for immutable values, safe for concurrent use and read without locks.
+
+    Lookups read a dictionary that is never modified in place; additions copy it and
+    swap the reference under a lock (copy on write). This suits caches that quickly reach
+    a steady state, such as time indices of recurring time series geometries.
+    When full, the cache is cleared before adding a new item.
+    """
+
+    def __init__(self, max_size: int = 256) -> None:
+        """A bounded cache for immutable values, safe for concurrent use and read without locks.
+
+        Args:
+            max_size (int, optional): maximum number of items. Defaults to 256.
+        """
+        self.max_size = max_size
+        self._items: Dict[Any, Any] = {}
+        self._lock = threading.Lock()
+
+    def get(self, key: Any) -> Any:
+        """The cached value for a key, or None"""
+        return self._items.get(key)
+
+    def get_or_create(self, key: Any, create: Callable[[], Any]) -> Any:
+        """The cached value for a key, created and cached if missing
+
+        Args:
+            key (Any): hashable key
+            create (Callable[[], Any]): function creating the value. It may be called concurrently by several threads for the same key; one of the values is retained.
+
+        Returns:
+            Any: the cached value
+        """
+        value = self._items.get(key)
+        if value is not None:
+            return value
+        value = create()
+        with self._lock:
+            existing = self._items.get(key)
+            if existing is not None:
+                return existing
+            items = {} if len(self._items) >= self.max_size else dict(self._items)
+            items[key] = value
+            self._items = items
+        return value
+
+    def clear(self) -> None:
+        """Removes all items"""
+        with self._lock:
+            self._items = {}
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+
+_time_index_cache = ReadMostlyCache(max_size=256)
+"""Time indices of time series geometries recently converted from native representations"""
+
+_DOUBLE_SIZE = np.dtype(np.float64).itemsize
+
+
+def _find_dtype(ctype: Any) -> Optional[np.dtype]:
+    if ctype.kind == "array":
+        return _c2dtype.get(ctype.item.cname + " *")
+    return _c2dtype.get(ctype.cname)
+
+
+_ctype_dtypes = ReadMostlyCache(max_size=256)
+"""numpy dtypes of the cffi pointer types converted to numpy arrays"""
+
+
+def _dtype_of_ctype(ctype: Any) -> Optional[np.dtype]:
+    dtype = _ctype_dtypes.get(ctype)
+    if dtype is None:
+        dtype = _find_dtype(ctype)
+        if dtype is not None:
+            dtype = _ctype_dtypes.get_or_create(ctype, lambda: dtype)
+    return dtype
+
+
+def _numeric_array_converter(
+    ffi: FFI, dtype: np.dtype
+) -> Callable[[CffiData, int, bool], np.ndarray]:
+    itemsize = dtype.itemsize
+    buffer = ffi.buffer
+    frombuffer = np.frombuffer
 
-_c2dtype["float *"] = np.dtype("f4")
-_c2dtype["double *"] = np.dtype("f8")
-# _c2dtype[ 'int *' ] = np.dtype( 'i4' ) TBD
+    def convert(ptr: CffiData, size: int, shallow: bool = False) -> np.ndarray:
+        res = frombuffer(buffer(ptr, size * itemsize), dtype)
+        return res if shallow else res.copy()
+
+    return convert
 
 
 def __check_positive_size(size: int) -> None:
@@ -180,10 +311,10 @@ def as_numeric_np_array(
     Returns:
         np.ndarray: converted data
     """
-    t = ffi.typeof(ptr).cname  # e.g. 'double *'
-    if t not in _c2dtype:
-        raise TypeError("Cannot (yet)create an array for element type: %s" % t)
-    dtype = _c2dtype[t]
+    t = ffi.typeof(ptr)  # e.g. 'double *'
+    dtype = _dtype_of_ctype(t)
+    if dtype is None:
+        raise TypeError("Cannot (yet)create an array for element type: %s" % t.cname)
     buffer_size = size * dtype.itemsize
     res = np.frombuffer(ffi.buffer(ptr, buffer_size), dtype)
     if shallow:
@@ -212,13 +343,153 @@ def as_np_array_double(
     Returns:
         np.ndarray: converted data
     """
-    res = np.frombuffer(ffi.buffer(ffi.cast("double[%d]" % (size,), ptr)))
+    res = np.frombuffer(ffi.buffer(ptr, size * _DOUBLE_SIZE), np.float64)
     if shallow:
         return res
     else:
         return res.copy()
 
 
+_DLPACK_CPU = 1
+"""DLPack device type of the CPU"""
+
+_PYBUF_WRITABLE = 0x0001
+"""Buffer protocol flag requesting a writable buffer, `inspect.BufferFlags.WRITABLE` from Python 3.12"""
+
+
+class NativeArray:
+    """A view of a native numeric array, exportable to array libraries without copy.
+
+    Implements `__array_interface__`, `__dlpack__` and `__dlpack_device__`,
+    so that e.g. `np.asarray` or `torch.from_dlpack` read the native memory directly.
+    Arrays created by consumers reference this object, which references the owner of the native memory.
+
+    The buffer protocol (`__buffer__`) is only used by Python 3.12 and later: on earlier versions
+    `memoryview(a)` raises a `TypeError`, and `memoryview(a.to_numpy())` is the equivalent.
+    Buffers are read-only unless the consumer requests a writable one.
+    """
+
+    __slots__ = ("_ffi", "ptr", "shape", "dtype", "owner", "__weakref__")
+
+    def __init__(
+        self, ffi: FFI, ptr: CffiData, shape: Union[int, Tuple[int, ...]], owner: Any = None
+    ) -> None:
+        """A view of a native numeric array, exportable to array libraries without copy.
+
+        Args:
+            ffi (FFI): ffi object to the library
+            ptr (CffiData): pointer to the first element, e.g. `double*`
+            shape (Union[int, Tuple[int, ...]]): shape of the contiguous (C order) array
+            owner (Any, optional): object owning the native memory, kept alive by this view. Defaults to None, for `ptr`.
+
+        Raises:
+            TypeError: unsupported element type
+        """
+        ctype = ffi.typeof(ptr)
+        key = ctype.cname if ctype.kind == "pointer" else ctype.item.cname + " *"
+        if key not in _c2dtype:
+            raise TypeError("Cannot (yet) create an array for element type: %s" % key)
+        self._ffi = ffi
+        self.ptr = ptr
+        self.shape = (shape,) if isinstance(shape, int) else tuple(shape)
+        if any(n < 0 for n in self.shape):
+            raise ValueError(f"array shape must be positive, but got {self.shape}")
+        self.dtype = _c2dtype[key]
+        self.owner = owner if owner is not None else ptr
+
+    @property
+    def size(self) -> int:
+        """Number of elements"""
+        return int(np.prod(self.shape))
+
+    @property
+    def nbytes(self) -> int:
+        """Size of the array in bytes"""
+        return self.size * self.dtype.itemsize
+
+    @property
+    def address(self) -> int:
+        """Address of the first element"""
+        return int(self._ffi.cast("uintptr_t", self.ptr))
+
+    @property
+    def __array_interface__(self) -> Dict[str, Any]:
+        return {
+            "shape": self.shape,
+            "typestr": self.dtype.str,
+            "data": (self.address, False),
+            "version": 3,
+        }
+
+    def to_numpy(self) -> np.ndarray:
+        """numpy array pointing to the native memory, and referencing this object"""
+        return np.asarray(_ArrayInterfaceView(self))
+
+    def __buffer__(self, flags: int) -> memoryview:
+        view = memoryview(self.to_numpy())
+        return view if flags & _PYBUF_WRITABLE else view.toreadonly()
+
+    def __dlpack__(self, **kwargs: Any) -> Any:
+        return self.to_numpy().__dlpack__(**kwargs)
+
+    def __dlpack_device__(self) -> Tuple[int, int]:
+        return (_DLPACK_CPU, 0)
+
+    def __len__(self) -> int:
+        if not self.shape:
+            raise TypeError("len() of unsized object")
+        return self.shape[0]
+
+    def __repr__(self) -> str:
+        return "NativeArray(shape={}, dtype={})".format(self.shape, self.dtype)
+
+
+class _ArrayInterfaceView:
+    """Exposes the array interface of a native array, so that numpy arrays created from it reference the native array"""
+
+    __slots__ = ("base", "__array_interface__")
+
+    def __init__(self, base: NativeArray) -> None:
+        self.base = base
+        self.__array_interface__ = base.__array_interface__
+
+
+def values_vector_as_array(
+    ffi: FFI, ptr: Union[CffiData, OwningCffiNativeHandle]
+) -> NativeArray:
+    """Zero-copy view of the values of a native `values_vector`
+
+    Args:
+        ffi (FFI): ffi object to the library
+        ptr (Union[CffiData, OwningCffiNativeHandle]): pointer or handle to a `values_vector` struct, kept alive by the view
+
+    Returns:
+        NativeArray: view of the values
+    """
+    p: CffiData = unwrap_cffi_native_handle(ptr)
+    return NativeArray(ffi, p.values, p.size, owner=ptr)
+
+
+def time_series_rows_as_arrays(
+    ffi: FFI, ptr: Union[CffiData, OwningCffiNativeHandle]
+) -> List[NativeArray]:
+    """Zero-copy views of the rows (ensemble members) of a native `multi_regular_time_series_data`
+
+    Args:
+        ffi (FFI): ffi object to the library
+        ptr (Union[CffiData, OwningCffiNativeHandle]): pointer or handle to a `multi_regular_time_series_data` struct, kept alive by the views
+
+    Returns:
+        List[NativeArray]: views of the rows
+    """
+    p: CffiData = unwrap_cffi_native_handle(ptr)
+    length = p.time_series_geometry.length
+    return [
+        NativeArray(ffi, p.numeric_data[i], length, owner=ptr)
+        for i in range(p.ensemble_size)
+    ]
+
+
 def named_values_to_dict(ffi: FFI, ptr: CffiData) -> Dict[str, float]:
     """Convert if possible a cffi pointer to a `named_values_vector` struct, into a dictionary
 
@@ -348,6 +619,15 @@ class TimeSeriesGeometry:
             ffi, self.start, self.time_step_seconds, self.length, self.time_step_code
         )
 
+    def __reduce__(self) -> Tuple:
+        return (
+            TimeSeriesGeometry,
+            (self.start, self.time_step_seconds, self.length, self.time_step_code),
+        )
+
+    def time_index(self) -> Union[List, pd.DatetimeIndex]:
+        return _ts_geom_to_time_index(self)
+
     @staticmethod
     def from_native(ts_geom: "TimeSeriesGeometryNative") -> "TimeSeriesGeometry":
         return TimeSeriesGeometry(
@@ -430,9 +710,17 @@ class TimeSeriesGeometryNative(OwningCffiNativeHandle):
 
 
 def _ts_geom_to_time_index(
-    ts_geom: TimeSeriesGeometryNative,
+    ts_geom: Union[TimeSeriesGeometry, TimeSeriesGeometryNative],
 ) -> Union[List, pd.DatetimeIndex]:
     start = as_timestamp(ts_geom.start)
+    key = (start, ts_geom.time_step_seconds, ts_geom.length, ts_geom.time_step_code)
+    # pandas indices are immutable, and can be shared by all the series with the same geometry
+    return _time_index_cache.get_or_create(key, lambda: _create_time_index(start, ts_geom))
+
+
+def _create_time_index(
+    start: pd.Timestamp, ts_geom: Union[TimeSeriesGeometry, TimeSeriesGeometryNative]
+) -> Union[List, pd.DatetimeIndex]:
     if ts_geom.time_step_code == 0:
         return create_even_time_index(start, ts_geom.time_step_seconds, ts_geom.length)
     if ts_geom.time_step_code == 1:
@@ -456,14 +744,18 @@ def as_native_tsgeom(ffi: FFI, tsgeom: TimeSeriesGeometry) -> TimeSeriesGeometry
     return tsgeom.as_native(ffi)
 
 
-def get_tsgeom(data: TimeSeriesLike) -> TimeSeriesGeometry:
+def get_tsgeom(
+    data: TimeSeriesLike, time_step_seconds: Optional[int] = None
+) -> TimeSeriesGeometry:
     """Extract a simplified representation of the geometry of a time series. A simple heuristic is used to find the time step
 
     Args:
         data (TimeSeriesLike): A pandas or xarray representation of a time series, with the pandas index or "time" dimension expected.
+        time_step_seconds (Optional[int], optional): time step of a series with a single time step, from which it cannot be inferred. Not used for longer series. Defaults to None.
 
     Raises:
         TypeError: Unexpected type of data
+        ValueError: the time step cannot be inferred, and is not specified
 
     Returns:
         TimeSeriesGeometry: simplified time series geometry
@@ -476,6 +768,8 @@ def get_tsgeom(data: TimeSeriesLike) -> TimeSeriesGeometry:
         indx = _pd_index(data)
     else:
         raise TypeError("Not recognised as a type of time series: " + str(type(data)))
+    if len(indx) == 1 and time_step_seconds is not None:
+        return TimeSeriesGeometry(as_timestamp(indx[0]), time_step_seconds, 1, 0)
     if len(indx) < 2:
         raise ValueError(
             "There must be at least two entries in the time series to guess the time step length"
@@ -500,14 +794,19 @@ def get_native_tsgeom(ffi: FFI, pd_series: "TimeSeriesLike") -> OwningCffiNative
 
 
 def as_xarray_time_series(
-    ffi: FFI, ptr: CffiData, name: str = None, allow_empty: bool = True
+    ffi: FFI,
+    ptr: CffiData,
+    name: Optional[str] = None,
+    allow_empty: bool = True,
+    engine: Optional[ParallelCopyEngine] = None,
 ) -> Optional[xr.DataArray]:
     """Converts a native time series structure to an xarray representation
 
     Args:
         ffi (FFI): ffi object to the library
         ptr (CffiData): pointer to the native struct `multi_regular_time_series_data`
-        name (str, optional): name of the returned series. Defaults to None.
+        name (Optional[str], optional): name of the returned series. Defaults to None.
+        engine (Optional[ParallelCopyEngine], optional): engine for parallel copies of large ensembles. Defaults to None.
 
     Returns:
         xr.DataArray: xarray time series
@@ -516,7 +815,7 @@ def as_xarray_time_series(
         return None
     ts_geom = TimeSeriesGeometryNative(ptr.time_series_geometry)
     npx = two_d_as_np_array_double(
-        ffi, ptr.numeric_data, ptr.ensemble_size, ts_geom.length
+        ffi, ptr.numeric_data, ptr.ensemble_size, ts_geom.length, engine
     )
     time_index = _ts_geom_to_time_index(ts_geom)
     ens_index = [i for i in range(ptr.ensemble_size)]
@@ -526,15 +825,346 @@ def as_xarray_time_series(
     return x
 
 
+def _native_rows(ffi: FFI, ptr: CffiData) -> List[np.ndarray]:
+    """numpy arrays pointing directly to each row of the data of a native `multi_regular_time_series_data`"""
+    length = ptr.time_series_geometry.length
+    if length == 0:
+        return [np.empty(0) for _ in range(ptr.ensemble_size)]
+    return [
+        as_np_array_double(ffi, ptr.numeric_data[i], length, shallow=True)
+        for i in range(ptr.ensemble_size)
+    ]
+
+
+def native_ts_windows(
+    ffi: FFI, ptr: CffiData, windows: Sequence[TimeWindow]
+) -> List[xr.DataArray]:
+    """Gets many temporal windows of a native time series, as xarray time series
+
+    The time index is searched once for all windows, and only the data within each window is copied.
+
+    Args:
+        ffi (FFI): ffi object to the library
+        ptr (CffiData): pointer to the native struct `multi_regular_time_series_data`
+        windows (Sequence[TimeWindow]): (from_date, to_date) pairs, inclusive. `None` means unbounded.
+
+    Returns:
+        List[xr.DataArray]: xarray time series, one per window
+    """
+    ts_geom = TimeSeriesGeometryNative(ptr.time_series_geometry)
+    time_index = _ts_geom_to_time_index(ts_geom)
+    starts, ends = window_positions(time_index, windows)
+    rows = _native_rows(ffi, ptr)
+    ens_index = [i for i in range(ptr.ensemble_size)]
+    result = []
+    for a, b in zip(starts, ends):
+        npx = np.empty(shape=(len(rows), b - a))
+        for i, row in enumerate(rows):
+            npx[i, :] = row[a:b]
+        result.append(create_ensemble_series(npx, ens_index, time_index[a:b]))
+    return result
+
+
+def _geom_window_positions(
+    ts_geom: TimeSeriesGeometryNative, windows: Sequence[TimeWindow]
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Positions of temporal windows in a time series geometry, without creating its full time index if possible"""
+    if ts_geom.time_step_code != 0:
+        return window_positions(_ts_geom_to_time_index(ts_geom), windows)
+    n = ts_geom.length
+    start = np.datetime64(ts_geom.start, "s")
+    step = ts_geom.time_step_seconds
+    if step <= 0:
+        raise ValueError(
+            "Time series geometry (start {}, length {}) has a time step of {} seconds, but it must be strictly positive".format(
+                start, n, step
+            )
+        )
+    n_windows = len(windows)
+    starts = np.zeros(n_windows, dtype=np.int64)
+    ends = np.full(n_windows, n, dtype=np.int64)
+    for i, (from_date, to_date) in enumerate(windows):
+        if from_date is not None:
+            delta = (as_datetime64(from_date) - start) / np.timedelta64(1, "s")
+            starts[i] = np.ceil(delta / step)
+        if to_date is not None:
+            delta = (as_datetime64(to_date) - start) / np.timedelta64(1, "s")
+            ends[i] = np.floor(delta / step) + 1
+    starts = np.clip(starts, 0, n)
+    ends = np.maximum(np.clip(ends, 0, n), starts)
+    return starts, ends
+
+
+def stacked_native_ts_windows(
+    ffi: FFI, ptr: CffiData, windows: Sequence[TimeWindow]
+) -> np.ndarray:
+    """Gets many temporal windows of identical lengths of a native time series, stacked in a single array
+
+    Args:
+        ffi (FFI): ffi object to the library
+        ptr (CffiData): pointer to the native struct `multi_regular_time_series_data`
+        windows (Sequence[TimeWindow]): (from_date, to_date) pairs, inclusive. `None` means unbounded.
+
+    Raises:
+        ValueError: windows are not all of the same length, or the series has an even time step that is not strictly positive
+
+    Returns:
+        np.ndarray: array of dimensions (window, ensemble, time), managed by Python.
+    """
+    ts_geom = TimeSeriesGeometryNative(ptr.time_series_geometry)
+    starts, ends = _geom_window_positions(ts_geom, windows)
+    lengths = ends - starts
+    if len(lengths) > 0 and not np.all(lengths == lengths[0]):
+        raise ValueError(
+            "Windows must all be of the same length to be stacked, but got lengths "
+            + str(sorted(set(lengths.tolist())))
+        )
+    length = int(lengths[0]) if len(lengths) > 0 else 0
+    rows = _native_rows(ffi, ptr)
+    result = np.empty(shape=(len(starts), len(rows), length))
+    for i, row in enumerate(rows):
+        result[:, i, :] = stacked_windows(row, starts, length)
+    return result
+
+
+def _shifted_start(ts_geom: TimeSeriesGeometryNative, offset: int) -> datetime:
+    if ts_geom.time_step_code == 0:
+        return ts_geom.start + timedelta(seconds=offset * ts_geom.time_step_seconds)
+    elif ts_geom.time_step_code == 1:
+        return as_pydatetime(
+            as_timestamp(ts_geom.start) + pd.DateOffset(months=offset)
+        )
+    else:
+        raise NotImplementedError(
+            "Unrecognised time step code '{}'".format(ts_geom.time_step_code)
+        )
+
+
+def window_native_time_series(
+    ffi: FFI,
+    data: NativePointerLike,
+    from_date: ConvertibleToTimestamp = None,
+    to_date: ConvertibleToTimestamp = None,
+) -> OwningCffiNativeHandle:
+    """Gets a temporal window of a native time series, without copying its data
+
+    The new `multi_regular_time_series_data` has an adjusted geometry, and its rows point inside
+    the rows of the original series. The wrapper returned keeps `data` alive, but
+    if `data` is a cdata pointer to memory owned by a native library, it is the responsibility
+    of the caller not to dispose of it while the window is in use.
+
+    Args:
+        ffi (FFI): ffi object to the library
+        data (NativePointerLike): (wrapper to a) pointer to the native struct `multi_regular_time_series_data`
+        from_date (ConvertibleToTimestamp, optional): start date of the window. Defaults to None.
+        to_date (ConvertibleToTimestamp, optional): end date of the window, inclusive. Defaults to None.
+
+    Raises:
+        ValueError: the series has an even time step that is not strictly positive
+
+    Returns:
+        OwningCffiNativeHandle: wrapper to a C struct `multi_regular_time_series_data`
+    """
+    parent: CffiData = unwrap_cffi_native_handle(data, stringent=True)
+    ts_geom = TimeSeriesGeometryNative(parent.time_series_geometry)
+    starts, ends = _geom_window_positions(ts_geom, [(from_date, to_date)])
+    offset, end = int(starts[0]), int(ends[0])
+    ptr = ffi.new("multi_regular_time_series_data*")
+    ptr.time_series_geometry = parent.time_series_geometry
+    window_geom = TimeSeriesGeometryNative(ptr.time_series_geometry)
+    window_geom.start = _shifted_start(ts_geom, offset)
+    window_geom.length = end - offset
+    ensemble_size = parent.ensemble_size
+    ptr.ensemble_size = ensemble_size
+    rows = new_doubleptr_array(ffi, ensemble_size)
+    for i in range(ensemble_size):
+        rows[i] = parent.numeric_data[i] + offset
+    ptr.numeric_data = rows
+    result = OwningCffiNativeHandle(ptr)
+    result.keepalive = [data, rows]
+    return result
+
+
+def _geom_time_index(
+    ts_geom: TimeSeriesGeometryNative, offset: int, length: int
+) -> pd.DatetimeIndex:
+    """time index of a subset of a time series geometry, starting at position `offset`"""
+    start = _shifted_start(ts_geom, offset)
+    if ts_geom.time_step_code == 0:
+        return create_even_time_index(start, ts_geom.time_step_seconds, length)
+    else:
+        return create_monthly_time_index(start, length)
+
+
+def _chunk_edges(
+    ts_geom: TimeSeriesGeometryNative, chunk_size: Optional[int], freq: Optional[str]
+) -> np.ndarray:
+    n = ts_geom.length
+    if (chunk_size is None) == (freq is None):
+        raise ValueError("Exactly one of chunk_size or freq must be specified")
+    if chunk_size is not None:
+        if chunk_size < 1:
+            raise ValueError(f"chunk_size must be strictly positive, but got {chunk_size}")
+        return np.append(np.arange(0, n, chunk_size), n)
+    if n == 0:
+        # no chunk, as with chunk_size
+        return np.array([0])
+    first = as_timestamp(ts_geom.start)
+    last = as_timestamp(_shifted_start(ts_geom, n - 1))
+    anchors = pd.date_range(first, last, freq=freq, normalize=True)
+    starts, _ = _geom_window_positions(ts_geom, [(a, None) for a in anchors])
+    return np.unique(np.concatenate([[0], starts, [n]]))
+
+
+def iter_native_time_series(
+    ffi: FFI,
+    ptr: CffiData,
+    chunk_size: Optional[int] = None,
+    freq: Optional[str] = None,
+    as_xarray: bool = True,
+) -> Iterator[Union[xr.DataArray, Tuple[pd.DatetimeIndex, np.ndarray]]]:
+    """Iterates over consecutive chunks of a native time series
+
+    Only the data of the current chunk is copied and its time index created,
+    so that the memory used is bounded by the chunk size rather than the series length.
+
+    Args:
+        ffi (FFI): ffi object to the library
+        ptr (CffiData): pointer to the native struct `multi_regular_time_series_data`
+        chunk_size (Optional[int], optional): number of time steps in each chunk. Defaults to None.
+        freq (Optional[str], optional): pandas frequency string for calendar aligned chunks, e.g. "YS" for yearly chunks starting on the 1st of January. Defaults to None.
+        as_xarray (bool, optional): yields xarray time series if True, otherwise tuples of the time index and a numpy array (ensemble, time). Defaults to True.
+
+    Raises:
+        ValueError: none, or both, of `chunk_size` and `freq` are specified
+
+    Yields:
+        Union[xr.DataArray, Tuple[pd.DatetimeIndex, np.ndarray]]: chunks of the time series, in chronological order
+    """
+    ts_geom = TimeSeriesGeometryNative(ptr.time_series_geometry)
+    edges = _chunk_edges(ts_geom, chunk_size, freq)
+    ensemble_size = ptr.ensemble_size
+    ens_index = [i for i in range(ensemble_size)]
+    for a, b in zip(edges[:-1], edges[1:]):
+        a, b = int(a), int(b)
+        npx = np.empty(shape=(ensemble_size, b - a))
+        for i in range(ensemble_size):
+            npx[i, :] = as_np_array_double(ffi, ptr.numeric_data[i] + a, b - a, shallow=True)
+        time_index = _geom_time_index(ts_geom, a, b - a)
+        if as_xarray:
+            yield create_ensemble_series(npx, ens_index, time_index)
+        else:
+            yield time_index, npx
+
+
+def _native_geometry_key(ptr: CffiData) -> Tuple:
+    g = ptr.time_series_geometry
+    d = g.start
+    return (
+        (d.year, d.month, d.day, d.hour, d.minute, d.second),
+        g.time_step_seconds,
+        g.length,
+        g.time_step_code,
+    )
+
+
+def as_xarray_dataset(
+    ffi: FFI,
+    ptrs: Sequence[CffiData],
+    names: Sequence[str],
+    stack: bool = False,
+    engine: Optional[ParallelCopyEngine] = None,
+) -> Union[xr.Dataset, xr.DataArray]:
+    """Converts many native time series to a single xarray Dataset, or a DataArray stacked along a "variable" dimension
+
+    Each distinct time geometry is converted to a time index only once, and the data of
+    all the series with the same geometry and ensemble size is copied into a single preallocated array.
+
+    Args:
+        ffi (FFI): ffi object to the library
+        ptrs (Sequence[CffiData]): pointers to native structs `multi_regular_time_series_data`
+        names (Sequence[str]): names of the series, used as variable names
+        stack (bool, optional): If True return a DataArray with dimensions (variable, ensemble, time). Defaults to False.
+        engine (Optional[ParallelCopyEngine], optional): engine copying the series in parallel. Defaults to None.
+
+    Raises:
+        ValueError: inconsistent arguments, duplicate names, or series that cannot be stacked as they have different geometries
+
+    Returns:
+        Union[xr.Dataset, xr.DataArray]: Dataset with one variable per series, or stacked DataArray
+    """
+    n = len(ptrs)
+    if len(names) != n:
+        raise ValueError(
+            "There must be as many names as series, but got {} names for {} series".format(len(names), n)
+        )
+    if len(set(names)) < n:
+        raise ValueError(
+            "Names of the series are not unique; cannot use them as variable names"
+        )
+    groups: Dict[Tuple, List[int]] = dict()
+    for i in range(n):
+        key = (_native_geometry_key(ptrs[i]), ptrs[i].ensemble_size)
+        groups.setdefault(key, []).append(i)
+    if stack and len(groups) > 1:
+        raise ValueError(
+            "Series can only be stacked if they all have the same time geometry and ensemble size"
+        )
+    time_indices: Dict[Tuple, pd.DatetimeIndex] = dict()
+    variables: Dict[str, xr.DataArray] = dict()
+    stacked = None
+    for (geom_key, ensemble_size), indices in groups.items():
+        if geom_key not in time_indices:
+            time_indices[geom_key] = _ts_geom_to_time_index(
+                TimeSeriesGeometryNative(ptrs[indices[0]].time_series_geometry)
+            )
+        time_index = time_indices[geom_key]
+        length = geom_key[2]
+        block = np.empty(shape=(len(indices), ensemble_size, length))
+
+        def _copy(k: int) -> None:
+            if length > 0:
+                numeric_data = ptrs[indices[k]].numeric_data
+                for j in range(ensemble_size):
+                    block[k, j, :] = as_np_array_double(
+                        ffi, numeric_data[j], length, shallow=True
+                    )
+
+        if engine is None:
+            for k in range(len(indices)):
+                _copy(k)
+        else:
+            engine.map(_copy, range(len(indices)), block.size)
+        ens_index = [i for i in range(ensemble_size)]
+        if stack:
+            stacked = xr.DataArray(
+                block,
+                coords=[[names[i] for i in indices], ens_index, time_index],
+                dims=[VARIABLE_DIMNAME, ENSEMBLE_DIMNAME, TIME_DIMNAME],
+            )
+        else:
+            for k, i in enumerate(indices):
+                variables[names[i]] = create_ensemble_series(block[k], ens_index, time_index)
+    if stack:
+        if stacked is None:
+            return xr.DataArray(
+                np.empty(shape=(0, 0, 0)),
+                coords=[[], [], pd.DatetimeIndex([])],
+                dims=[VARIABLE_DIMNAME, ENSEMBLE_DIMNAME, TIME_DIMNAME],
+            )
+        return stacked
+    return xr.Dataset({name: variables[name] for name in names})
+
+
 def geom_to_xarray_time_series(
-    ts_geom: TimeSeriesGeometryNative, data: np.ndarray, name: str = None
+    ts_geom: TimeSeriesGeometryNative, data: np.ndarray, name: Optional[str] = None
 ) -> xr.DataArray:
     """Converts an native time series structure to an xarray representation
 
     Args:
         ts_geom (TimeSeriesGeometryNative): time series geometry
         data (np.ndarray): time series data, with one dimension
-        name (str, optional): name of the returned series. Defaults to None.
+        name (Optional[str], optional): name of the returned series. Defaults to None.
 
     Returns:
         xr.DataArray: xarray time series
@@ -549,47 +1179,1040 @@ def geom_to_xarray_time_series(
     return x
 
 
-def as_native_time_series(ffi: FFI, data: TimeSeriesLike) -> OwningCffiNativeHandle:
+def _as_ensemble_array(data: TimeSeriesLike) -> np.ndarray:
+    """numpy array of a time series, with dimensions (ensemble, time) or (time) for univariate series"""
+    if isinstance(data, xr.DataArray):
+        np_data = data.values
+        if len(data.shape) == 2:
+            assert set(data.variable.dims) == set([ENSEMBLE_DIMNAME, TIME_DIMNAME])
+            if not data.variable.dims[0] == ENSEMBLE_DIMNAME:
+                np_data = data.values.transpose()
+        elif len(data.shape) > 2:
+            raise ValueError(
+                "Cannot convert data with more than 2 dimensions; see as_native_nd_time_series"
+            )
+    elif isinstance(data, pd.Series):
+        np_data = data.values
+    elif isinstance(data, pd.DataFrame):
+        np_data = data.values.transpose()
+    else:
+        raise TypeError("Not recognised as a type of time series: " + str(type(data)))
+    return np_data
+
+
+def as_native_time_series(
+    ffi: FFI, data: TimeSeriesLike, engine: Optional[ParallelCopyEngine] = None
+) -> OwningCffiNativeHandle:
     """Convert a pure python time series to a native representation via a C struct `multi_regular_time_series_data`
 
     Args:
         ffi (FFI): _description_
         data (TimeSeriesLike): xarray or pandas based time series
+        engine (Optional[ParallelCopyEngine], optional): engine for parallel copies of large ensembles. Defaults to None.
+
+    Raises:
+        TypeError: unexpected input type
+
+    Returns:
+        OwningCffiNativeHandle: wrapper to a C struct `multi_regular_time_series_data`
+    """
+    ptr = ffi.new("multi_regular_time_series_data*")
+    tsg = get_native_tsgeom(ffi, data)
+    ptr.time_series_geometry = tsg.obj
+    np_data = _as_ensemble_array(data)
+    ptr.ensemble_size = 1 if len(np_data.shape) == 1 else np_data.shape[0]
+    num_data = two_d_np_array_double_to_native(ffi, np_data, engine)
+    ptr.numeric_data = num_data.ptr
+    result = OwningCffiNativeHandle(ptr)
+    result.keepalive = [tsg, num_data]
+    return result
+
+
+def _time_index_of(data: TimeSeriesLike) -> pd.Index:
+    if isinstance(data, xr.DataArray):
+        return data.indexes[TIME_DIMNAME]
+    elif isinstance(data, (pd.Series, pd.DataFrame)):
+        return _pd_index(data)
+    raise TypeError("Not recognised as a type of time series: " + str(type(data)))
+
+
+def as_native_time_series_batch(
+    ffi: FFI,
+    data: Union[Sequence[TimeSeriesLike], Mapping[str, TimeSeriesLike], xr.Dataset],
+    engine: Optional[ParallelCopyEngine] = None,
+) -> OwningCffiNativeHandle:
+    """Convert many time series to native `multi_regular_time_series_data` structs in one pass
+
+    The time geometry is inferred only once for all the series with equal time indices,
+    for instance all the variables of an `xr.Dataset`. All the data is copied into a single
+    contiguous native block.
+
+    Args:
+        ffi (FFI): ffi object to the library
+        data (Union[Sequence[TimeSeriesLike], Mapping[str, TimeSeriesLike], xr.Dataset]): time series. For mappings and datasets, the order of the keys is the order of the native array.
+        engine (Optional[ParallelCopyEngine], optional): engine copying the series in parallel. Defaults to None.
+
+    Raises:
+        TypeError: unexpected input type
+
+    Returns:
+        OwningCffiNativeHandle: wrapper to a C array `multi_regular_time_series_data*[n]`, owning all the native memory
+    """
+    if isinstance(data, xr.Dataset):
+        series = [data[k] for k in data.data_vars]
+    elif isinstance(data, Mapping):
+        series = list(data.values())
+    else:
+        series = list(data)
+    n = len(series)
+    arrays = []
+    # series are grouped by (length, first, last) time, then by equality of their whole time index
+    geometries: Dict[Tuple, List[Tuple[pd.Index, TimeSeriesGeometryNative]]] = dict()
+    series_geometries = []
+    for x in series:
+        tindx = _time_index_of(x)
+        key = (len(tindx), tindx[0], tindx[-1]) if len(tindx) > 0 else (0,)
+        group = geometries.setdefault(key, [])
+        geom = next((g for indx, g in group if indx is tindx or indx.equals(tindx)), None)
+        if geom is None:
+            geom = get_native_tsgeom(ffi, x)
+            group.append((tindx, geom))
+        series_geometries.append(geom)
+        np_data = _as_ensemble_array(x)
+        arrays.append(np_data.reshape((1, len(np_data))) if len(np_data.shape) == 1 else np_data)
+    total_rows = sum(a.shape[0] for a in arrays)
+    offsets = np.cumsum([0] + [a.size for a in arrays])
+    block = np.empty(offsets[-1], dtype=np.float64)
+
+    def _copy(i: int) -> None:
+        block[offsets[i] : offsets[i + 1]].reshape(arrays[i].shape)[:] = arrays[i]
+
+    if engine is None:
+        for i in range(n):
+            _copy(i)
+    else:
+        engine.map(_copy, range(n), len(block))
+    row_ptrs = new_doubleptr_array(ffi, total_rows)
+    buffer = ffi.from_buffer("double[]", block)
+    structs = ffi.new("multi_regular_time_series_data[%d]" % (n,))
+    ptr = ffi.new("multi_regular_time_series_data*[%d]" % (n,))
+    offset = 0
+    row = 0
+    for i in range(n):
+        nrow, ncol = arrays[i].shape
+        for j in range(nrow):
+            row_ptrs[row + j] = buffer + offset + j * ncol
+        structs[i].time_series_geometry = series_geometries[i].obj
+        structs[i].ensemble_size = nrow
+        structs[i].numeric_data = row_ptrs + row
+        ptr[i] = structs + i
+        offset += nrow * ncol
+        row += nrow
+    result = OwningCffiNativeHandle(ptr)
+    result.keepalive = [structs, row_ptrs, buffer, block]
+    return result
+
+
+def _row_pointers(ffi: FFI, data: np.ndarray) -> OwningCffiNativeHandle:
+    """Creates a `double*[nrow]` array pointing to each row of a C-contiguous 2D numpy array of `float64`, without copy.
+    The returned wrapper keeps the numpy array alive"""
+    if data.dtype != np.float64 or not data.flags["C_CONTIGUOUS"]:
+        raise ValueError("Expected a C-contiguous 2D array of float64")
+    if data.ndim != 2:
+        raise ValueError("Expected a 2D array, got {} dimensions".format(data.ndim))
+    nrow, ncol = data.shape
+    ptr = new_doubleptr_array(ffi, nrow)
+    if data.size > 0:
+        buffer = ffi.from_buffer("double[]", data)
+        for i in range(nrow):
+            ptr[i] = buffer + i * ncol
+    result = OwningCffiNativeHandle(ptr)
+    result.keepalive = data
+    return result
+
+
+LEAD_TIME_STEP_ATTR = "lead_time_step_seconds"
+"""Attribute of forecasts series converted from native structs, holding the lead time step in seconds"""
+
+
+def _lead_time_step_seconds(data: xr.DataArray) -> int:
+    """Lead time step from the attribute set by `as_xarray_forecasts_series`, inferred from timedelta lead time coordinates,
+    or else from the time step of the issue times"""
+    if LEAD_TIME_STEP_ATTR in data.attrs:
+        return int(data.attrs[LEAD_TIME_STEP_ATTR])
+    lead_times = data.coords[LEADTIME_DIMNAME].values
+    if np.issubdtype(lead_times.dtype, np.timedelta64) and len(lead_times) > 1:
+        return int((lead_times[1] - lead_times[0]) / np.timedelta64(1, "s"))
+    if data.sizes[TIME_DIMNAME] < 2:
+        raise ValueError(
+            "Cannot infer the lead time step of forecasts with a single issue time: specify lead_time_step_seconds"
+        )
+    issue_geom = get_tsgeom(data)
+    if issue_geom.time_step_code != 0:
+        raise ValueError(
+            "Cannot infer the lead time step from monthly issue times: specify lead_time_step_seconds"
+        )
+    return issue_geom.time_step_seconds
+
+
+def as_native_forecasts_series(
+    ffi: FFI, data: xr.DataArray, lead_time_step_seconds: Optional[int] = None
+) -> OwningCffiNativeHandle:
+    """Convert an ensemble forecasts time series to an array of native `multi_regular_time_series_data` structs
+
+    Each issue time of the forecasts maps to a `multi_regular_time_series_data`,
+    starting at the issue time and with one row per ensemble member along the lead time dimension.
+    All the data is stored in a single contiguous block, which is the numpy array of the input
+    data itself (no copy) if its dimensions are ordered (time, ensemble, lead_time) and C-contiguous.
+
+    Args:
+        ffi (FFI): ffi object to the library
+        data (xr.DataArray): forecasts with dimensions "ensemble", "lead_time" and "time", e.g. created with `create_ensemble_forecasts_series`
+        lead_time_step_seconds (Optional[int], optional): length of the lead time step in seconds. Defaults to None, in which case it is read from the attribute `LEAD_TIME_STEP_ATTR` if present, inferred from timedelta lead time coordinates, or assumed to be the (strictly regular) time step of the issue times.
+
+    Raises:
+        TypeError: unexpected input type
+        ValueError: unexpected dimensions, or lead time step that cannot be inferred
+
+    Returns:
+        OwningCffiNativeHandle: wrapper to a C array `multi_regular_time_series_data*[n]`, where n is the number of issue times
+    """
+    if not isinstance(data, xr.DataArray):
+        raise TypeError("Expected xr.DataArray, got " + str(type(data)))
+    expected_dims = (TIME_DIMNAME, ENSEMBLE_DIMNAME, LEADTIME_DIMNAME)
+    if set(data.dims) != set(expected_dims):
+        raise ValueError(
+            "Expected dimensions {}, got {}".format(expected_dims, data.dims)
+        )
+    if lead_time_step_seconds is None:
+        lead_time_step_seconds = _lead_time_step_seconds(data)
+    block = np.ascontiguousarray(
+        data.transpose(*expected_dims).values, dtype=np.float64
+    )
+    n_issues, ensemble_size, n_leads = block.shape
+    rows = _row_pointers(ffi, block.reshape((n_issues * ensemble_size, n_leads)))
+    structs = ffi.new("multi_regular_time_series_data[%d]" % (n_issues,))
+    ptr = ffi.new("multi_regular_time_series_data*[%d]" % (n_issues,))
+    issue_times = data.coords[TIME_DIMNAME].values
+    for i in range(n_issues):
+        item = structs[i]
+        geom = TimeSeriesGeometryNative(item.time_series_geometry)
+        geom.start = issue_times[i]
+        geom.time_step_seconds = lead_time_step_seconds
+        geom.length = n_leads
+        geom.time_step_code = 0
+        item.ensemble_size = ensemble_size
+        item.numeric_data = rows.ptr + i * ensemble_size
+        ptr[i] = structs + i
+    result = OwningCffiNativeHandle(ptr)
+    result.keepalive = [structs, rows]
+    return result
+
+
+def as_xarray_forecasts_series(
+    ffi: FFI, ptr: CffiData, size: int, name: Optional[str] = None
+) -> xr.DataArray:
+    """Converts an array of native `multi_regular_time_series_data` forecasts into an ensemble forecasts time series
+
+    All the forecasts must have the same ensemble size and lead time length.
+    The data is copied once, into a single numpy array. The lead time coordinates are the indices of the lead times;
+    the lead time step of even time steps is kept in the attribute `LEAD_TIME_STEP_ATTR`, so that the series converts back
+    to native structs with the same geometry.
+
+    Args:
+        ffi (FFI): ffi object to the library
+        ptr (CffiData): pointer to a C array `multi_regular_time_series_data*`, one per issue time
+        size (int): number of issue times (forecasts) in the array
+        name (Optional[str], optional): name of the returned series. Defaults to None.
+
+    Raises:
+        ValueError: forecasts have inconsistent shapes
+
+    Returns:
+        xr.DataArray: forecasts with dimensions "ensemble", "lead_time" and "time"
+    """
+    if size == 0:
+        return create_ensemble_forecasts_series(None, [], [], [])
+    ensemble_size = ptr[0].ensemble_size
+    n_leads = ptr[0].time_series_geometry.length
+    block = np.empty(shape=(size, ensemble_size, n_leads))
+    issue_times = []
+    for i in range(size):
+        item = ptr[i]
+        if item.ensemble_size != ensemble_size or item.time_series_geometry.length != n_leads:
+            raise ValueError(
+                "All forecasts must have the same ensemble size and lead time length"
+            )
+        issue_times.append(dtts_as_datetime(item.time_series_geometry.start))
+        if n_leads > 0:
+            for j in range(ensemble_size):
+                block[i, j, :] = as_np_array_double(
+                    ffi, item.numeric_data[j], n_leads, shallow=True
+                )
+    x = create_ensemble_forecasts_series(
+        block.transpose((1, 2, 0)),
+        [i for i in range(ensemble_size)],
+        [i for i in range(n_leads)],
+        pd.DatetimeIndex(issue_times),
+    )
+    lead_geom = ptr[0].time_series_geometry
+    if lead_geom.time_step_code == 0:
+        x.attrs[LEAD_TIME_STEP_ATTR] = int(lead_geom.time_step_seconds)
+    if name is not None:
+        x.name = name
+    return x
+
+
+def as_native_dimensions_description(
+    ffi: FFI, dimensions: Sequence[Tuple[str, int]]
+) -> OwningCffiNativeHandle:
+    """Creates a native `time_series_dimensions_description` struct
+
+    Args:
+        ffi (FFI): ffi object to the library
+        dimensions (Sequence[Tuple[str, int]]): names (dimension types) and sizes of the dimensions, in order
+
+    Returns:
+        OwningCffiNativeHandle: wrapper to a C struct `time_series_dimensions_description`
+    """
+    n = len(dimensions)
+    ptr = ffi.new("time_series_dimensions_description*")
+    dims = ffi.new("time_series_dimension_description[%d]" % (n,))
+    names = [as_charptr(ffi, name) for name, _ in dimensions]
+    for i in range(n):
+        dims[i].dimension_type = names[i]
+        dims[i].size = dimensions[i][1]
+    ptr.dimensions = dims
+    ptr.num_dimensions = n
+    result = OwningCffiNativeHandle(ptr)
+    result.keepalive = [dims, names]
+    return result
+
+
+def dimensions_description_as_list(
+    ffi: FFI, ptr: CffiData
+) -> List[Tuple[str, int]]:
+    """Convert a native `time_series_dimensions_description` struct to a list of dimension names and sizes
+
+    Args:
+        ffi (FFI): ffi object to the library
+        ptr (CffiData): pointer to the native struct `time_series_dimensions_description`
+
+    Returns:
+        List[Tuple[str, int]]: names (dimension types) and sizes of the dimensions, in order
+    """
+    return [
+        (c_string_as_py_string(ffi, ptr.dimensions[i].dimension_type), int(ptr.dimensions[i].size))
+        for i in range(ptr.num_dimensions)
+    ]
+
+
+class NdTimeSeriesNative:
+    """Native representation of a multidimensional time series: a `time_series_dimensions_description`,
+    a contiguous block of `double` in C (row-major) order, and the geometry of the time dimension if there is one.
+    """
+
+    def __init__(
+        self,
+        dimensions: OwningCffiNativeHandle,
+        data: OwningCffiNativeHandle,
+        time_series_geometry: Optional[TimeSeriesGeometryNative] = None,
+    ):
+        """Native representation of a multidimensional time series
+
+        Args:
+            dimensions (OwningCffiNativeHandle): wrapper to a C struct `time_series_dimensions_description`
+            data (OwningCffiNativeHandle): wrapper to a C array of `double`, with the data in C (row-major) order
+            time_series_geometry (Optional[TimeSeriesGeometryNative], optional): geometry of the "time" dimension, if any. Defaults to None.
+        """
+        self.dimensions = dimensions
+        self.data = data
+        self.time_series_geometry = time_series_geometry
+
+
+def as_native_nd_time_series(
+    ffi: FFI, data: xr.DataArray, time_step_seconds: Optional[int] = None
+) -> NdTimeSeriesNative:
+    """Convert an xarray time series of any rank to a native representation, described by a `time_series_dimensions_description`
+
+    The native data block is the numpy array of the input data (no copy) if it is C-contiguous and of type `float64`.
+
+    Args:
+        ffi (FFI): ffi object to the library
+        data (xr.DataArray): time series, or any data array. A "time" dimension is optional.
+        time_step_seconds (Optional[int], optional): time step, required if the time dimension has length one. Defaults to None.
+
+    Raises:
+        TypeError: unexpected input type
+        ValueError: time dimension of length one, and no `time_step_seconds`
+
+    Returns:
+        NdTimeSeriesNative: native representation of the data
+    """
+    if not isinstance(data, xr.DataArray):
+        raise TypeError("Expected xr.DataArray, got " + str(type(data)))
+    dimensions = as_native_dimensions_description(
+        ffi, [(str(d), n) for d, n in zip(data.dims, data.shape)]
+    )
+    np_data = np.ascontiguousarray(data.values, dtype=np.float64)
+    native_data = OwningCffiNativeHandle(
+        ffi.cast("double*", ffi.from_buffer("double[]", np_data))
+    )
+    native_data.keepalive = np_data
+    tsg = None
+    if TIME_DIMNAME in data.dims:
+        tsg = as_native_tsgeom(ffi, get_tsgeom(data, time_step_seconds))
+    return NdTimeSeriesNative(dimensions, native_data, tsg)
+
+
+def nd_time_series_as_xarray(
+    ffi: FFI,
+    dimensions: CffiData,
+    data: CffiData,
+    time_series_geometry: Optional[CffiData] = None,
+    coords: Optional[Dict[str, Any]] = None,
+    shallow: bool = False,
+    name: Optional[str] = None,
+) -> xr.DataArray:
+    """Converts a native multidimensional time series, described by a `time_series_dimensions_description`, to an xarray representation
+
+    Args:
+        ffi (FFI): ffi object to the library
+        dimensions (CffiData): pointer to the native struct `time_series_dimensions_description`
+        data (CffiData): pointer to the native array of `double`, in C (row-major) order
+        time_series_geometry (Optional[CffiData], optional): pointer to the `regular_time_series_geometry` of the "time" dimension. Defaults to None.
+        coords (Optional[Dict[str, Any]], optional): coordinates for the dimensions other than "time". Defaults to None, in which case integer indices are used.
+        shallow (bool, optional): If True the resulting array points directly to the native data. Defaults to False.
+        name (Optional[str], optional): name of the returned series. Defaults to None.
+
+    Returns:
+        xr.DataArray: xarray time series
+    """
+    dims = dimensions_description_as_list(ffi, dimensions)
+    shape = tuple(n for _, n in dims)
+    npx = as_np_array_double(ffi, data, int(np.prod(shape)), shallow=shallow).reshape(shape)
+    coords = dict() if coords is None else dict(coords)
+    for dim_name, n in dims:
+        if dim_name == TIME_DIMNAME and time_series_geometry is not None:
+            coords[dim_name] = _ts_geom_to_time_index(TimeSeriesGeometryNative(time_series_geometry))
+        elif dim_name not in coords:
+            coords[dim_name] = np.arange(n)
+    x = xr.DataArray(npx, coords=[coords[d] for d, _ in dims], dims=[d for d, _ in dims])
+    if name is not None:
+        x.name = name
+    return x
+
+
+STATISTIC_DEFINITION_FIELDS = [
+    "model_variable_id",
+    "objective_identifier",
+    "objective_name",
+    "statistic_identifier",
+    "start",
+    "end",
+    "observations",
+]
+"""Names of the fields of a statistic definition, matching the C struct `statistic_definition`"""
+
+_OPTIONAL_STATISTIC_FIELDS = ("start", "end")
+
+
+def _time_series_values(data: TimeSeriesLike) -> np.ndarray:
+    if isinstance(data, (xr.DataArray, pd.Series, pd.DataFrame)):
+        return np.asarray(data.values)
+    raise TypeError("Not recognised as a type of time series: " + str(type(data)))
+
+
+def _content_fingerprint(data: np.ndarray) -> bytes:
+    """A digest of the content of a numpy array, to detect identical data. Uses xxhash if available, otherwise blake2b"""
+    data = np.ascontiguousarray(data)
+    h = xxhash.xxh3_128() if xxhash is not None else hashlib.blake2b(digest_size=16)
+    h.update(str((data.dtype.str, data.shape)).encode("utf-8"))
+    h.update(memoryview(data).cast("B"))
+    return h.digest()
+
+
+def _geometry_key(tsg: TimeSeriesGeometry) -> Tuple:
+    return (as_timestamp(tsg.start), tsg.time_step_seconds, tsg.length, tsg.time_step_code)
+
+
+def _is_missing(x: Any) -> bool:
+    return x is None or (isinstance(x, float) and np.isnan(x)) or x is pd.NaT
+
+
+def as_native_multi_statistic_definition(
+    ffi: FFI,
+    objectives: Union[pd.DataFrame, Iterable[Mapping[str, Any]]],
+    mix_statistics_id: str = "",
+) -> OwningCffiNativeHandle:
+    """Creates a native `multi_statistic_definition` from a table of objectives
+
+    Observation series are converted to native representations only once:
+    the same object, or series with identical time geometry and values, share a single
+    native `multi_regular_time_series_data`. All identifier strings are likewise allocated once.
+
+    Args:
+        ffi (FFI): ffi object to the library
+        objectives (Union[pd.DataFrame, Iterable[Mapping[str, Any]]]): one row or mapping per statistic,
+            with keys as in `STATISTIC_DEFINITION_FIELDS`. "observations" are time series, or (wrappers to) pointers
+            to native `multi_regular_time_series_data`. "start" and "end" default to the start and end of the observations.
+        mix_statistics_id (str, optional): name of the list of statistics. Defaults to "".
+
+    Raises:
+        KeyError: missing field for a statistic, other than "start" and "end"
+
+    Returns:
+        OwningCffiNativeHandle: wrapper to a C struct `multi_statistic_definition`
+    """
+    if isinstance(objectives, pd.DataFrame):
+        objectives = objectives.to_dict(orient="records")
+    objectives = list(objectives)
+    strings: Dict[Any, CffiData] = dict()
+
+    def _intern(x: Any) -> CffiData:
+        key = as_bytes(x)
+        if key not in strings:
+            strings[key] = ffi.new("char[]", key)
+        return strings[key]
+
+    by_identity: Dict[int, Tuple[Any, CffiData]] = dict()
+    by_content: Dict[Tuple, CffiData] = dict()
+    native_series: List[Any] = []
+
+    def _observations(obs: Any) -> CffiData:
+        if id(obs) in by_identity:
+            return by_identity[id(obs)][1]
+        if isinstance(obs, (CffiNativeHandle, FFI.CData)):
+            obs_ptr = unwrap_cffi_native_handle(obs)
+        else:
+            key = _geometry_key(get_tsgeom(obs)) + (_content_fingerprint(_time_series_values(obs)),)
+            if key not in by_content:
+                native = as_native_time_series(ffi, obs)
+                native_series.append(native)
+                by_content[key] = native.ptr
+            obs_ptr = by_content[key]
+        # keeping obs referenced so that its id is not reused during this function call
+        by_identity[id(obs)] = (obs, obs_ptr)
+        return obs_ptr
+
+    n = len(objectives)
+    statistics = ffi.new("statistic_definition[%d]" % (n,))
+    statistics_ptrs = ffi.new("statistic_definition*[%d]" % (n,))
+    for i, objective in enumerate(objectives):
+        for field in STATISTIC_DEFINITION_FIELDS:
+            if field not in objective and field not in _OPTIONAL_STATISTIC_FIELDS:
+                raise KeyError("Missing field '{}' for statistic {}".format(field, i))
+        stat = statistics[i]
+        stat.model_variable_id = _intern(objective["model_variable_id"])
+        stat.objective_identifier = _intern(objective["objective_identifier"])
+        stat.objective_name = _intern(objective["objective_name"])
+        stat.statistic_identifier = _intern(objective["statistic_identifier"])
+        obs_ptr = _observations(objective["observations"])
+        stat.observations = obs_ptr
+        ts_geom = TimeSeriesGeometryNative(obs_ptr.time_series_geometry)
+        start, end = objective.get("start"), objective.get("end")
+        start = ts_geom.start if _is_missing(start) else as_pydatetime(start)
+        end = _shifted_start(ts_geom, ts_geom.length - 1) if _is_missing(end) else as_pydatetime(end)
+        _copy_datetime_to_dtts(start, stat.start)
+        _copy_datetime_to_dtts(end, stat.end)
+        statistics_ptrs[i] = statistics + i
+    ptr = ffi.new("multi_statistic_definition*")
+    ptr.size = n
+    ptr.statistics = statistics_ptrs
+    ptr.mix_statistics_id = _intern(mix_statistics_id)
+    result = OwningCffiNativeHandle(ptr)
+    result.keepalive = [
+        statistics,
+        statistics_ptrs,
+        list(strings.values()),
+        native_series,
+        [x[0] for x in by_identity.values()],
+    ]
+    return result
+
+
+def _copy_geometry_to_native(tsg: TimeSeriesGeometry, ptr: CffiData) -> None:
+    start = tsg.start
+    if not isinstance(start, datetime):
+        start = as_pydatetime(start)
+    _copy_datetime_to_dtts(start, ptr.start)
+    ptr.time_step_seconds = tsg.time_step_seconds
+    ptr.length = tsg.length
+    ptr.time_step_code = tsg.time_step_code
+
+
+def _geometry_from_native(ptr: CffiData) -> TimeSeriesGeometry:
+    return TimeSeriesGeometry(
+        dtts_as_datetime(ptr.start),
+        ptr.time_step_seconds,
+        ptr.length,
+        ptr.time_step_code,
+    )
+
+
+class NumpyTimeSeries:
+    """A lightweight time series: a time series geometry and a numpy array (ensemble, time).
+
+    This maps one to one to the C struct `multi_regular_time_series_data`, and converts to and from it
+    without using pandas or xarray. The conversion to xarray or pandas representations is done only on demand.
+    """
+
+    __slots__ = ("geometry", "data")
+
+    def __init__(self, geometry: TimeSeriesGeometry, data: np.ndarray):
+        """A lightweight time series: a time series geometry and a numpy array (ensemble, time)
+
+        Args:
+            geometry (TimeSeriesGeometry): temporal geometry of the series
+            data (np.ndarray): data of dimensions (ensemble, time), or (time) for a univariate series
+
+        Raises:
+            ValueError: the data is not consistent with the length of the geometry
+        """
+        if len(data.shape) == 1:
+            data = data.reshape((1, len(data)))
+        if len(data.shape) != 2 or data.shape[1] != geometry.length:
+            raise ValueError(
+                "Expected data of shape (ensemble, {}), but got {}".format(geometry.length, data.shape)
+            )
+        self.geometry = geometry
+        self.data = data
+
+    def __reduce__(self) -> Tuple:
+        # with pickle protocol 5, numpy passes the data as an out-of-band buffer if requested
+        return (NumpyTimeSeries, (self.geometry, self.data))
+
+    @property
+    def ensemble_size(self) -> int:
+        return self.data.shape[0]
+
+    @property
+    def length(self) -> int:
+        return self.data.shape[1]
+
+    @staticmethod
+    def from_native(ffi: FFI, ptr: CffiData) -> "NumpyTimeSeries":
+        """Copies a native time series into a new NumpyTimeSeries
+
+        Args:
+            ffi (FFI): ffi object to the library
+            ptr (CffiData): pointer to the native struct `multi_regular_time_series_data`
+
+        Returns:
+            NumpyTimeSeries: time series, with data managed by Python
+        """
+        geometry = _geometry_from_native(ptr.time_series_geometry)
+        length = geometry.length
+        data = np.empty(shape=(ptr.ensemble_size, length))
+        if length > 0:
+            for i in range(ptr.ensemble_size):
+                data[i, :] = as_np_array_double(ffi, ptr.numeric_data[i], length, shallow=True)
+        return NumpyTimeSeries(geometry, data)
+
+    @staticmethod
+    def from_time_series(data: TimeSeriesLike) -> "NumpyTimeSeries":
+        """Creates a NumpyTimeSeries from a pandas or xarray time series
+
+        Args:
+            data (TimeSeriesLike): xarray or pandas based time series
+
+        Returns:
+            NumpyTimeSeries: time series, possibly sharing the data of the input
+        """
+        return NumpyTimeSeries(get_tsgeom(data), _as_ensemble_array(data))
+
+    def as_native(self, ffi: FFI) -> OwningCffiNativeHandle:
+        """Convert to a native C struct `multi_regular_time_series_data`
+
+        The native rows point directly to the numpy data (no copy) if it is a C-contiguous array of `float64`.
+
+        Args:
+            ffi (FFI): ffi object to the library
+
+        Returns:
+            OwningCffiNativeHandle: wrapper to a C struct `multi_regular_time_series_data`, keeping the data alive
+        """
+        ptr = ffi.new("multi_regular_time_series_data*")
+        _copy_geometry_to_native(self.geometry, ptr.time_series_geometry)
+        ptr.ensemble_size = self.ensemble_size
+        rows = _row_pointers(ffi, np.ascontiguousarray(self.data, dtype=np.float64))
+        ptr.numeric_data = rows.ptr
+        result = OwningCffiNativeHandle(ptr)
+        result.keepalive = rows
+        return result
+
+    def time_index(self) -> pd.DatetimeIndex:
+        """Creates the time index of this time series"""
+        return self.geometry.time_index()
+
+    def to_xarray(self, name: Optional[str] = None) -> xr.DataArray:
+        """Convert to an xarray time series with dimensions (ensemble, time)"""
+        x = create_ensemble_series(
+            self.data, [i for i in range(self.ensemble_size)], self.time_index()
+        )
+        if name is not None:
+            x.name = name
+        return x
+
+    def to_pandas(self) -> Union[pd.Series, pd.DataFrame]:
+        """Convert to a pandas Series if univariate, otherwise a DataFrame with one column per ensemble member"""
+        if self.ensemble_size == 1:
+            return pd.Series(self.data[0], index=self.time_index())
+        return pd.DataFrame(self.data.transpose(), index=self.time_index())
+
+
+class NativeTimeSeriesBuffer:
+    """A preallocated native time series `multi_regular_time_series_data`, reusable for time series of the same shape.
+
+    Filling the buffer copies the data in place, without new native or numpy allocations.
+    This is intended for iterative workflows, typically with a `MarshallingPipeline`.
+    """
+
+    __slots__ = ("series", "handle")
+
+    def __init__(self, ffi: FFI, ensemble_size: int, length: int) -> None:
+        """A preallocated native time series `multi_regular_time_series_data`
+
+        Args:
+            ffi (FFI): ffi object to the library
+            ensemble_size (int): number of ensemble members
+            length (int): length of the series
+        """
+        geometry = TimeSeriesGeometry(length=length)
+        self.series = NumpyTimeSeries(geometry, np.zeros(shape=(ensemble_size, length)))
+        self.handle = self.series.as_native(ffi)
+
+    @property
+    def ptr(self) -> CffiData:
+        """Pointer to the native struct `multi_regular_time_series_data`"""
+        return self.handle.ptr
+
+    def fill(self, data: TimeSeriesLike) -> OwningCffiNativeHandle:
+        """Copies a time series into this buffer
+
+        Args:
+            data (TimeSeriesLike): xarray or pandas based time series, of the shape of this buffer. Univariate series fill a buffer with one ensemble member.
+
+        Raises:
+            ValueError: the shape of the time series differs from the shape of this buffer
+
+        Returns:
+            OwningCffiNativeHandle: the native handle to this buffer
+        """
+        values = _as_ensemble_array(data)
+        if len(values.shape) == 1:
+            values = values.reshape((1, len(values)))
+        if values.shape != self.series.data.shape:
+            raise ValueError(
+                "Expected a time series of shape {}, but got {}".format(self.series.data.shape, values.shape)
+            )
+        geometry = get_tsgeom(data)
+        np.copyto(self.series.data, values)
+        self.series.geometry = geometry
+        _copy_geometry_to_native(geometry, self.handle.ptr.time_series_geometry)
+        return self.handle
+
+    def to_xarray(self, name: Optional[str] = None) -> xr.DataArray:
+        """Copies the content of the native buffer to an xarray time series"""
+        self.series.geometry = _geometry_from_native(self.handle.ptr.time_series_geometry)
+        x = self.series.to_xarray(name)
+        return x.copy(data=self.series.data.copy())
+
+
+class NativeStructWrapper(OwningCffiNativeHandle):
+    """Base class for typed wrappers around a pointer to a native struct.
+
+    Views of the members of the struct are created on first access and cached, so that repeated accesses
+    do not convert the native data again. Numeric members are zero-copy numpy views of the native memory.
+    The views reference the struct and the owner of its memory, but not the wrapper, which they may outlive.
+    Call `refresh` if the native code modifies the struct after the views were created.
+    """
+
+    __slots__ = ("_ffi",)
+
+    _ctype = ""
+    """C type of the pointer wrapped"""
+
+    _cached: Tuple[str, ...] = ()
+    """slots holding lazily created views of the members"""
+
+    def __init__(self, ffi: FFI, ptr: CffiData, owner: Any = None) -> None:
+        """Typed wrapper around a pointer to a native struct
+
+        Args:
+            ffi (FFI): ffi object to the library
+            ptr (CffiData): pointer to the native struct
+            owner (Any, optional): object owning the native memory of the struct or its members, kept alive by this wrapper. Defaults to None.
+        """
+        super().__init__(ptr, self._ctype, 0)
+        self._ffi = ffi
+        if owner is not None:
+            self.keepalive = owner
+        self.refresh()
+
+    def refresh(self) -> None:
+        """Discards the cached views of the members of the struct"""
+        for name in self._cached:
+            setattr(self, name, None)
+
+    def _view_owner(self) -> Tuple[CffiData, Any]:
+        # views cached on the wrapper must not reference it: numpy arrays are not tracked by the garbage collector,
+        # and the reference cycle would never be freed
+        return (self.ptr, getattr(self, "keepalive", None))
+
+    @property
+    def size(self) -> int:
+        """Number of items"""
+        return int(self.ptr.size)
+
+    def __len__(self) -> int:
+        return self.size
+
+
+class ValuesVectorNative(NativeStructWrapper):
+    """Typed wrapper around a pointer to a native `values_vector`"""
+
+    __slots__ = ("_values",)
+    _ctype = "values_vector*"
+    _cached = ("_values",)
+
+    @property
+    def values(self) -> np.ndarray:
+        """The values, as a numpy array pointing to the native memory"""
+        if self._values is None:
+            self._values = NativeArray(
+                self._ffi, self.ptr.values, self.size, owner=self._view_owner()
+            ).to_numpy()
+        return self._values
+
+    @staticmethod
+    def from_values(
+        ffi: FFI, data: Union[List[float], np.ndarray]
+    ) -> "ValuesVectorNative":
+        """Creates a native `values_vector` pointing directly to the data if it is a contiguous array of float64
+
+        Args:
+            ffi (FFI): ffi object to the library
+            data (Union[List[float], np.ndarray]): values
+
+        Returns:
+            ValuesVectorNative: wrapper owning the native struct
+        """
+        data = np.ascontiguousarray(data, dtype=np.float64)
+        ptr = ffi.new("values_vector*")
+        ptr.size = len(data)
+        buffer = ffi.from_buffer("double[]", data)
+        ptr.values = buffer
+        return ValuesVectorNative(ffi, ptr, owner=[data, buffer])
+
+
+class NamedValuesVectorNative(NativeStructWrapper):
+    """Typed wrapper around a pointer to a native `named_values_vector`"""
+
+    __slots__ = ("_values", "_names", "_dict")
+    _ctype = "named_values_vector*"
+    _cached = ("_values", "_names", "_dict")
+
+    @property
+    def values(self) -> np.ndarray:
+        """The values, as a numpy array pointing to the native memory"""
+        if self._values is None:
+            self._values = NativeArray(
+                self._ffi, self.ptr.values, self.size, owner=self._view_owner()
+            ).to_numpy()
+        return self._values
+
+    @property
+    def names(self) -> List[str]:
+        """The names of the values"""
+        if self._names is None:
+            self._names = c_charptrptr_as_string_list(self._ffi, self.ptr.names, self.size)
+        return self._names
+
+    def to_dict(self) -> Dict[str, float]:
+        """The named values as a dictionary"""
+        if self._dict is None:
+            names = self.names
+            if len(set(names)) < len(names):
+                raise KeyError(
+                    "Names of the values are not unique; cannot use as keys to make a dictionary"
+                )
+            self._dict = dict(zip(names, self.values.tolist()))
+        return self._dict
+
+    @staticmethod
+    def from_dict(ffi: FFI, data: Dict[str, float]) -> "NamedValuesVectorNative":
+        """Creates a native `named_values_vector` from a dictionary"""
+        handle = dict_to_named_values(ffi, data)
+        return NamedValuesVectorNative(ffi, handle.ptr, owner=handle)
+
+
+class CharacterVectorNative(NativeStructWrapper):
+    """Typed wrapper around a pointer to a native `character_vector`"""
+
+    __slots__ = ("_values",)
+    _ctype = "character_vector*"
+    _cached = ("_values",)
+
+    @property
+    def values(self) -> List[str]:
+        """The strings"""
+        if self._values is None:
+            self._values = c_charptrptr_as_string_list(self._ffi, self.ptr.values, self.size)
+        return self._values
+
+    def __getitem__(self, i: int) -> str:
+        return self.values[i]
+
+    @staticmethod
+    def from_strings(ffi: FFI, data: List[str]) -> "CharacterVectorNative":
+        """Creates a native `character_vector` from strings"""
+        handle = as_character_vector(ffi, data)
+        return CharacterVectorNative(ffi, handle.ptr, owner=handle)
+
+
+class StringStringMapNative(NativeStructWrapper):
+    """Typed wrapper around a pointer to a native `string_string_map`"""
+
+    __slots__ = ("_keys", "_values", "_dict")
+    _ctype = "string_string_map*"
+    _cached = ("_keys", "_values", "_dict")
+
+    @property
+    def keys(self) -> List[str]:
+        """The keys"""
+        if self._keys is None:
+            self._keys = c_charptrptr_as_string_list(self._ffi, self.ptr.keys, self.size)
+        return self._keys
+
+    @property
+    def values(self) -> List[str]:
+        """The values"""
+        if self._values is None:
+            self._values = c_charptrptr_as_string_list(self._ffi, self.ptr.values, self.size)
+        return self._values
+
+    def to_dict(self) -> Dict[str, str]:
+        """The map as a dictionary"""
+        if self._dict is None:
+            keys = self.keys
+            if len(set(keys)) < len(keys):
+                raise KeyError(
+                    "Names of the values are not unique; cannot use as keys to make a dictionary"
+                )
+            self._dict = dict(zip(keys, self.values))
+        return self._dict
+
+    @staticmethod
+    def from_dict(ffi: FFI, data: Dict[str, str]) -> "StringStringMapNative":
+        """Creates a native `string_string_map` from a dictionary"""
+        handle = dict_to_string_map(ffi, data)
+        return StringStringMapNative(ffi, handle.ptr, owner=handle)
+
+
+class MultiRegularTimeSeriesDataNative(NativeStructWrapper):
+    """Typed wrapper around a pointer to a native `multi_regular_time_series_data`"""
+
+    __slots__ = ("_geometry", "_rows", "_time_index", "_xarray")
+    _ctype = "multi_regular_time_series_data*"
+    _cached = ("_geometry", "_rows", "_time_index", "_xarray")
+
+    @property
+    def size(self) -> int:
+        """Number of ensemble members"""
+        return int(self.ptr.ensemble_size)
+
+    @property
+    def ensemble_size(self) -> int:
+        """Number of ensemble members"""
+        return self.size
+
+    @property
+    def geometry(self) -> TimeSeriesGeometryNative:
+        """The time series geometry, a view of the native struct member"""
+        if self._geometry is None:
+            self._geometry = TimeSeriesGeometryNative(self.ptr.time_series_geometry)
+        return self._geometry
+
+    @property
+    def rows(self) -> List[np.ndarray]:
+        """The data of each ensemble member, as numpy arrays pointing to the native memory"""
+        if self._rows is None:
+            length = self.geometry.length
+            owner = self._view_owner()
+            self._rows = [
+                NativeArray(self._ffi, self.ptr.numeric_data[i], length, owner=owner).to_numpy()
+                for i in range(self.size)
+            ]
+        return self._rows
+
+    def time_index(self) -> pd.DatetimeIndex:
+        """The time index of the series"""
+        if self._time_index is None:
+            self._time_index = _ts_geom_to_time_index(self.geometry)
+        return self._time_index
+
+    def to_numpy(self) -> np.ndarray:
+        """A copy of the data, of dimensions (ensemble, time)"""
+        if self.size == 0:
+            return np.empty((0, self.geometry.length))
+        return np.vstack(self.rows)
+
+    def to_xarray(self) -> xr.DataArray:
+        """The series as an xarray time series, converted once then cached; do not modify it"""
+        if self._xarray is None:
+            self._xarray = create_ensemble_series(
+                self.to_numpy(), list(range(self.size)), self.time_index()
+            )
+        return self._xarray
+
+    @staticmethod
+    def from_time_series(
+        ffi: FFI, data: TimeSeriesLike
+    ) -> "MultiRegularTimeSeriesDataNative":
+        """Creates a native `multi_regular_time_series_data` from a pandas or xarray time series"""
+        handle = as_native_time_series(ffi, data)
+        return MultiRegularTimeSeriesDataNative(ffi, handle.ptr, owner=handle)
+
+
+_struct_wrappers = MappingProxyType(
+    {
+        w._ctype.replace("*", " *"): w
+        for w in [
+            ValuesVectorNative,
+            NamedValuesVectorNative,
+            CharacterVectorNative,
+            StringStringMapNative,
+            MultiRegularTimeSeriesDataNative,
+        ]
+    }
+)
+
+
+def wrap_native_struct(
+    ffi: FFI, ptr: Union[CffiData, OwningCffiNativeHandle], owner: Any = None
+) -> NativeStructWrapper:
+    """Wraps a pointer to a native struct in the typed wrapper class for its type
+
+    Args:
+        ffi (FFI): ffi object to the library
+        ptr (Union[CffiData, OwningCffiNativeHandle]): pointer or handle to a native struct
+        owner (Any, optional): object owning the native memory, kept alive by the wrapper. Defaults to None, or to `ptr` if it is a handle.
 
     Raises:
-        TypeError: unexpected input type
+        TypeError: no wrapper class for this type of struct
 
     Returns:
-        OwningCffiNativeHandle: wrapper to a C struct `multi_regular_time_series_data`
+        NativeStructWrapper: typed wrapper
     """
-    ptr = ffi.new("multi_regular_time_series_data*")
-    tsg = get_native_tsgeom(ffi, data)
-    ptr.time_series_geometry = tsg.obj
-    if isinstance(data, xr.DataArray):
-        np_data = data.values
-        if len(data.shape) == 1:
-            ensemble_size = 1
-        elif len(data.shape) == 2:
-            assert set(data.variable.dims) == set([ENSEMBLE_DIMNAME, TIME_DIMNAME])
-            ensemble_size = len(data.coords[ENSEMBLE_DIMNAME].values)
-            if not data.variable.dims[0] == ENSEMBLE_DIMNAME:
-                np_data = data.values.transpose()
-        else:
-            raise ValueError("Cannot convert data with more than 2 dimensions")
-    elif isinstance(data, pd.Series):
-        ensemble_size = 1
-        np_data = data.values
-    elif isinstance(data, pd.DataFrame):
-        ensemble_size = data.shape[1]
-        np_data = data.values.transpose()
-    else:
-        raise TypeError("Not recognised as a type of time series: " + str(type(data)))
-    ptr.ensemble_size = ensemble_size
-    num_data = two_d_np_array_double_to_native(ffi, np_data)
-    ptr.numeric_data = num_data.ptr
-    result = OwningCffiNativeHandle(ptr)
-    result.keepalive = [tsg, num_data]
-    return result
+    if isinstance(ptr, OwningCffiNativeHandle):
+        owner = owner if owner is not None else ptr
+    p: CffiData = unwrap_cffi_native_handle(ptr)
+    cname = ffi.typeof(p).cname
+    wrapper = _struct_wrappers.get(cname)
+    if wrapper is None:
+        raise TypeError("No wrapper class for native type: %s" % cname)
+    return wrapper(ffi, p, owner)
 
 
 def values_to_nparray(ffi: FFI, ptr: CffiData) -> np.ndarray:
@@ -614,8 +2237,11 @@ def create_values_struct(
     """create_values_struct"""
     ptr = ffi.new("values_vector*")
     ptr.size = len(data)
-    ptr.values = as_c_double_array(ffi, data).ptr
-    return OwningCffiNativeHandle(ptr)
+    values = as_c_double_array(ffi, data)
+    ptr.values = values.ptr
+    result = OwningCffiNativeHandle(ptr)
+    result.keepalive = values
+    return result
 
 
 def as_c_double_array(
@@ -661,7 +2287,11 @@ def as_c_double_array(
 
 
 def two_d_as_np_array_double(
-    ffi: FFI, ptr: CffiData, nrow: int, ncol: int
+    ffi: FFI,
+    ptr: CffiData,
+    nrow: int,
+    ncol: int,
+    engine: Optional[ParallelCopyEngine] = None,
 ) -> np.ndarray:
     """Convert if possible a cffi pointer to a C data array, into a numpy array of double precision floats.
 
@@ -670,7 +2300,7 @@ def two_d_as_np_array_double(
         ptr (CffiData): cffi pointer (FFI.CData)
         nrow (int): number of rows
         ncol (int): number of columns
-        shallow (bool): If true the array points directly to native data array. Defaults to False.
+        engine (Optional[ParallelCopyEngine], optional): engine copying blocks of rows in parallel. Defaults to None.
 
     Raises:
         RuntimeError: conversion is not supported
@@ -685,6 +2315,15 @@ def two_d_as_np_array_double(
         return np.ndarray(shape=(nrow, ncol))
     else:
         rows = ffi.cast("double*[%d]" % (nrow,), ptr)
+        if engine is not None:
+            res = np.empty(shape=(nrow, ncol))
+
+            def _copy(start: int, stop: int) -> None:
+                for i in range(start, stop):
+                    res[i, :] = as_numeric_np_array(ffi, rows[i], size=ncol, shallow=True)
+
+            engine.for_each_block(_copy, nrow, nrow * ncol)
+            return res
         # We can use a shallow creation for as_numeric_np_array: np.vstack does a copy anyway.
         res = np.vstack(
             [
@@ -696,13 +2335,14 @@ def two_d_as_np_array_double(
 
 
 def two_d_np_array_double_to_native(
-    ffi: FFI, data: np.ndarray
+    ffi: FFI, data: np.ndarray, engine: Optional[ParallelCopyEngine] = None
 ) -> OwningCffiNativeHandle:
     """Convert if possible a cffi pointer to a C data array, into a numpy array of double precision floats.
 
     Args:
         ffi (FFI): FFI instance wrapping the native compilation module owning the native memory
         data (np.ndarray): data
+        engine (Optional[ParallelCopyEngine], optional): engine copying blocks of rows in parallel to a single contiguous native block. Defaults to None.
 
     Raises:
         RuntimeError: conversion is not supported
@@ -721,6 +2361,14 @@ def two_d_np_array_double_to_native(
         data = data.reshape((1, len(data)))
 
     nrow = data.shape[0]
+    if engine is not None:
+        block = np.empty(shape=data.shape)
+
+        def _copy(start: int, stop: int) -> None:
+            block[start:stop] = data[start:stop]
+
+        engine.for_each_block(_copy, nrow, data.size)
+        return _row_pointers(ffi, block)
     ptr = new_doubleptr_array(ffi, nrow)
     items = [as_c_double_array(ffi, data[i, :]).ptr for i in range(nrow)]
     for i in range(nrow):
@@ -761,9 +2409,16 @@ def c_charptrptr_as_string_list(ffi: FFI, ptr: CffiData, size: int) -> List[str]
         List[str]: converted data
     """
     # TODO check type
-    strings = ffi.cast("char*[%d]" % (size,), ptr)
-    res = [as_string(ffi.string(strings[i])) for i in range(size)]
-    return res
+    # a constant type string: cffi parses it once, whereas "char*[n]" would be parsed and cached for each size
+    return _charptrptr_as_string_list(ffi, "char**", ptr, size)
+
+
+def _charptrptr_as_string_list(
+    ffi: FFI, charpp: Union[str, Any], ptr: CffiData, size: int
+) -> List[str]:
+    strings = ffi.cast(charpp, ptr)
+    string = ffi.string
+    return [as_string(string(strings[i])) for i in range(size)]
 
 
 def dtts_as_datetime(ptr: CffiData) -> datetime:
@@ -870,10 +2525,54 @@ def as_string(obj: Any) -> Union[str, Any]:
     return obj
 
 
+_cffi_types = FFI()
+"""FFI instance used only to inspect the types of cffi functions"""
+
+
+def _char_args(func: Any) -> Optional[Tuple[int, Tuple[int, ...], bool]]:
+    """Number of arguments, positions of the `char*` or `char` arguments, and whether the result is a `char`,
+    of a cffi function with a fixed number of arguments; None for other callables."""
+    if not isinstance(func, FFI.CData):
+        return None
+    try:
+        ftype = _cffi_types.typeof(func)
+    except TypeError:
+        return None
+    if ftype.kind != "function" or ftype.ellipsis:
+        return None
+    positions = tuple(
+        i
+        for i, a in enumerate(ftype.args)
+        if a.cname == "char" or (a.kind == "pointer" and a.item.cname == "char")
+    )
+    return len(ftype.args), positions, ftype.result.cname == "char"
+
+
+def _specialised_convert_strings(
+    func: Any, n_args: int, positions: Tuple[int, ...], char_result: bool
+) -> Callable:
+    args = ["a{}".format(i) for i in range(n_args)]
+    call_args = ["as_bytes({})".format(a) if i in positions else a for i, a in enumerate(args)]
+    call = "func({})".format(", ".join(call_args))
+    if char_result:
+        call = "as_string({})".format(call)
+    source = "def wrapper({}):\n    return {}\n".format(", ".join(args), call)
+    namespace = {"func": func, "as_bytes": as_bytes, "as_string": as_string}
+    exec(compile(source, "<convert_strings>", "exec"), namespace)
+    return namespace["wrapper"]
+
+
 def convert_strings(func: Callable) -> Callable:
     """Returns a wrapper that converts any str/unicode object arguments to
     bytes.
+
+    For cffi functions the signature is inspected once, and only the `char*` arguments are converted.
+    Results other than a `char` are then returned as is. For other callables all arguments are converted,
+    and bytes results, or lists of bytes, are converted to strings.
     """
+    signature = _char_args(func)
+    if signature is not None:
+        return wraps(func)(_specialised_convert_strings(func, *signature))
 
     @wraps(func)
     def wrapper(*args, **kwargs) -> Any:
@@ -881,15 +2580,12 @@ def convert_strings(func: Callable) -> Callable:
 
         :param func func: Python function wrapping a lakeoned function.
         """
-        new_args = []
-        for arg in args:
-            new_args.append(as_bytes(arg))
-        new_kwargs = {}
-        for key in kwargs:
-            new_kwargs[key] = as_bytes(kwargs[key])
+        new_args = [as_bytes(arg) for arg in args]
+        if kwargs:
+            kwargs = {key: as_bytes(value) for key, value in kwargs.items()}
 
         # Call the function
-        return_value = func(*new_args, **new_kwargs)
+        return_value = func(*new_args, **kwargs)
         if isinstance(return_value, (list, tuple)):
             return [as_string(obj) for obj in return_value]
         else:
@@ -898,11 +2594,385 @@ def convert_strings(func: Callable) -> Callable:
     return wrapper
 
 
+class NativeConversionCache:
+    """A least recently used cache of native representations of time series.
+
+    Entries are keyed on the identity of the source object, the shape, data type and a fingerprint of the
+    content of its data, and its time geometry. Entries are evicted when the source object is garbage collected,
+    when the memory budget is exceeded, or explicitly with `invalidate`.
+
+    Native handles returned from the cache are shared between callers, and must not be modified by native code.
+    """
+
+    def __init__(self, max_bytes: int = 256 * 1024 * 1024) -> None:
+        """A least recently used cache of native representations of time series
+
+        Args:
+            max_bytes (int, optional): memory budget for the data of the cached native series. Defaults to 256 MiB.
+        """
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[Tuple, Tuple[OwningCffiNativeHandle, int]]" = OrderedDict()
+        self._keys_by_id: Dict[int, List[Tuple]] = dict()
+        self._refs: Dict[int, Any] = dict()
+        self._pending: Dict[Tuple, threading.Event] = dict()
+        self._nbytes = 0
+        self._lock = threading.RLock()
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def nbytes(self) -> int:
+        """Total size of the data of the native series currently cached"""
+        return self._nbytes
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _key(self, data: TimeSeriesLike) -> Tuple:
+        values = _time_series_values(data)
+        return (
+            id(data),
+            values.shape,
+            values.dtype.str,
+            _content_fingerprint(values),
+            _geometry_key(get_tsgeom(data)),
+        )
+
+    def get_or_convert(
+        self,
+        data: TimeSeriesLike,
+        convert: Callable[[TimeSeriesLike], OwningCffiNativeHandle],
+    ) -> OwningCffiNativeHandle:
+        """Gets the native representation of a time series from the cache, or converts and caches it
+
+        A series is converted only once when several threads request it at the same time:
+        the other threads wait for the conversion, and count as cache hits.
+
+        Args:
+            data (TimeSeriesLike): xarray or pandas based time series
+            convert (Callable[[TimeSeriesLike], OwningCffiNativeHandle]): conversion to use on a cache miss
+
+        Returns:
+            OwningCffiNativeHandle: native representation of the series
+        """
+        key = self._key(data)
+        while True:
+            with self._lock:
+                entry = self._entries.get(key)
+                if entry is not None:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return entry[0]
+                pending = self._pending.get(key)
+                if pending is None:
+                    # this thread converts the series
+                    pending = threading.Event()
+                    self._pending[key] = pending
+                    self.misses += 1
+                    break
+            # another thread is converting the series; if it fails, or the series is too large
+            # to be cached, the next iteration converts it in this thread.
+            pending.wait()
+        try:
+            native = convert(data)
+            nbytes = _time_series_values(data).size * 8
+            with self._lock:
+                entry = self._entries.get(key)
+                if entry is not None:
+                    return entry[0]
+                if nbytes > self.max_bytes:
+                    return native
+                self._track(data)
+                self._entries[key] = (native, nbytes)
+                keys = self._keys_by_id.setdefault(id(data), [])
+                if key not in keys:
+                    keys.append(key)
+                self._nbytes += nbytes
+                self._evict(self.max_bytes)
+            return native
+        finally:
+            with self._lock:
+                self._pending.pop(key, None)
+            pending.set()
+
+    def _track(self, data: Any) -> None:
+        obj_id = id(data)
+        if obj_id in self._refs:
+            return
+        try:
+            self._refs[obj_id] = weakref.ref(data, lambda _, obj_id=obj_id: self._invalidate_id(obj_id))
+        except TypeError:
+            # not weakly referenceable; rely on the content fingerprint in the keys
+            self._refs[obj_id] = None
+
+    def _remove(self, key: Tuple) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._nbytes -= entry[1]
+        keys = self._keys_by_id.get(key[0], [])
+        if key in keys:
+            keys.remove(key)
+        if len(keys) == 0:
+            self._keys_by_id.pop(key[0], None)
+            self._refs.pop(key[0], None)
+
+    def _evict(self, max_bytes: int) -> None:
+        while self._nbytes > max_bytes and len(self._entries) > 0:
+            self._remove(next(iter(self._entries)))
+
+    def _invalidate_id(self, obj_id: int) -> None:
+        with self._lock:
+            for key in list(self._keys_by_id.get(obj_id, [])):
+                self._remove(key)
+            self._refs.pop(obj_id, None)
+
+    def invalidate(self, data: Optional[Any] = None) -> None:
+        """Removes cached entries
+
+        Args:
+            data (Optional[Any], optional): source object for which to remove the cached entries. Defaults to None, in which case all entries are removed.
+        """
+        if data is None:
+            with self._lock:
+                self._entries.clear()
+                self._keys_by_id.clear()
+                self._refs.clear()
+                self._nbytes = 0
+        else:
+            self._invalidate_id(id(data))
+
+
+class ScratchArena:
+    """Reusable native memory for temporary buffers, e.g. arguments only needed for the duration of a native call.
+
+    Buffers are allocated by bumping an offset in large native blocks kept for reuse, avoiding
+    a native allocation per buffer. An arena is not thread-safe: `CffiMarshal.scratch` gives each thread its own.
+    """
+
+    _ALIGNMENT = 16
+
+    def __init__(self, ffi: FFI, block_size: int = 64 * 1024) -> None:
+        """Reusable native memory for temporary buffers
+
+        Args:
+            ffi (FFI): ffi object to the native library
+            block_size (int, optional): size in bytes of the first native block. Defaults to 64 KiB.
+        """
+        self._ffi = ffi
+        self._block_size = block_size
+        self._blocks: List[Tuple[CffiData, int]] = []
+        self._block = 0
+        self._offset = 0
+
+    @property
+    def capacity(self) -> int:
+        """Total size in bytes of the native blocks held by this arena"""
+        return sum(size for _, size in self._blocks)
+
+    def mark(self) -> Tuple[int, int]:
+        """Current allocation position, to restore with `release`"""
+        return (self._block, self._offset)
+
+    def release(self, mark: Tuple[int, int] = (0, 0)) -> None:
+        """Releases the buffers allocated since a position, by default all of them. Their memory is reused by later allocations."""
+        self._block, self._offset = mark
+
+    def allocate(self, ctype: str, size: int) -> CffiData:
+        """Allocates a temporary array
+
+        Args:
+            ctype (str): C type of the elements, e.g. "double"
+            size (int): number of elements
+
+        Returns:
+            CffiData: pointer to the array, valid until the arena is released past it
+        """
+        if size < 0:
+            raise ValueError(f"array size must be positive, but got {size}")
+        nbytes = max(1, self._ffi.sizeof(ctype) * size)
+        nbytes += -nbytes % self._ALIGNMENT
+        while self._block < len(self._blocks):
+            block, block_size = self._blocks[self._block]
+            if self._offset + nbytes <= block_size:
+                ptr = block + self._offset
+                self._offset += nbytes
+                return self._ffi.cast(ctype + "*", ptr)
+            self._block += 1
+            self._offset = 0
+        block_size = max(nbytes, self._block_size, 2 * self.capacity)
+        self._blocks.append((self._ffi.new("char[]", block_size), block_size))
+        self._block = len(self._blocks) - 1
+        self._offset = 0
+        return self.allocate(ctype, size)
+
+    def as_c_double_array(self, data: Union[np.ndarray, Sequence[float]]) -> CffiData:
+        """Copies data to a temporary C array of double precision floats
+
+        Args:
+            data (Union[np.ndarray, Sequence[float]]): data
+
+        Returns:
+            CffiData: pointer to the `double` array
+        """
+        data = np.asarray(data, dtype=np.float64).ravel()
+        ptr = self.allocate("double", len(data))
+        if len(data) > 0:
+            self._ffi.buffer(ptr, data.nbytes)[:] = data.tobytes()
+        return ptr
+
+    def as_charptr(self, x: str) -> CffiData:
+        """Copies a string to a temporary, null terminated C string"""
+        b = as_bytes(x)
+        ptr = self.allocate("char", len(b) + 1)
+        self._ffi.memmove(ptr, b, len(b))
+        ptr[len(b)] = b"\0"
+        return ptr
+
+
+class _ScratchScope:
+    """Context manager releasing the allocations made in a scratch arena during its scope"""
+
+    __slots__ = ("arena", "_mark")
+
+    def __init__(self, arena: ScratchArena) -> None:
+        self.arena = arena
+
+    def __enter__(self) -> ScratchArena:
+        self._mark = self.arena.mark()
+        return self.arena
+
+    def __exit__(self, *args: Any) -> None:
+        self.arena.release(self._mark)
+
+
 class CffiMarshal:
-    """A helper class for marshalling data to/from a native library module (i.e. DLL)"""
+    """A helper class for marshalling data to/from a native library module (i.e. DLL)
+
+    An instance can be shared by several threads. Conversions do not modify the state of the instance;
+    the conversion cache is updated under a lock and converts a series only once when threads request it concurrently,
+    and the module level cache of time indices is read without locks.
+    Callers needing temporary native buffers can take them from the scratch arena of their thread, see `scratch`.
+    Native handles returned by conversions, including their `keepalive` references, are fully initialised
+    before being returned or cached, and are not modified afterwards.
+    """
 
-    def __init__(self, ffi: FFI) -> None:
+    def __init__(
+        self, ffi: FFI, engine: Optional[ParallelCopyEngine] = None
+    ) -> None:
+        """A helper class for marshalling data to/from a native library module (i.e. DLL)
+
+        Args:
+            ffi (FFI): ffi object to the native library accessed
+            engine (Optional[ParallelCopyEngine], optional): engine for parallel copies of large arrays and batches. Defaults to None.
+        """
         self._ffi: FFI = ffi
+        self._conversion_cache: Optional[NativeConversionCache] = None
+        self.engine = engine
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._ctypes = ReadMostlyCache(max_size=1024)
+        self._array_converters = ReadMostlyCache(max_size=256)
+        self._charpp = ffi.typeof("char**")
+        self._as_np_array_double = _numeric_array_converter(ffi, np.dtype(np.float64))
+
+    def ctype(self, cdecl: Union[str, Any]) -> Any:
+        """The cffi type object for a C type declaration, parsed once then cached
+
+        Args:
+            cdecl (Union[str, Any]): C type declaration, e.g. "double*", or a cffi type object returned as is
+
+        Returns:
+            Any: cffi type object (`FFI.CType`)
+        """
+        if not isinstance(cdecl, str):
+            return cdecl
+        return self._ctypes.get_or_create(cdecl, lambda: self._ffi.typeof(cdecl))
+
+    def numeric_array_converter(
+        self, ctype: Union[str, Any]
+    ) -> Callable[[CffiData, int, bool], np.ndarray]:
+        """The conversion function to numpy arrays for a type of native numeric array, created once then cached
+
+        The function `(ptr, size, shallow=False) -> np.ndarray` does no type introspection;
+        this is the fastest path for repeated conversions of pointers of a known type.
+
+        Args:
+            ctype (Union[str, Any]): C pointer type, e.g. "double*", or cffi type object
+
+        Raises:
+            TypeError: conversion is not supported
+
+        Returns:
+            Callable[[CffiData, int, bool], np.ndarray]: conversion function
+        """
+        t = self.ctype(ctype)
+        converter = self._array_converters.get(t)
+        if converter is None:
+            dtype = _dtype_of_ctype(t)
+            if dtype is None:
+                raise TypeError("Cannot (yet)create an array for element type: %s" % t.cname)
+            converter = self._array_converters.get_or_create(
+                t, lambda: _numeric_array_converter(self._ffi, dtype)
+            )
+        return converter
+
+    @property
+    def scratch_arena(self) -> ScratchArena:
+        """The scratch arena of the calling thread, for temporary native buffers"""
+        arena = getattr(self._local, "arena", None)
+        if arena is None:
+            arena = ScratchArena(self._ffi)
+            self._local.arena = arena
+        return arena
+
+    def scratch(self) -> _ScratchScope:
+        """Scope for temporary native buffers of the calling thread, released on exit
+
+        Examples:
+            >>> with marshal.scratch() as arena:
+            ...     lib.some_function(arena.as_c_double_array(x), len(x))
+        """
+        return _ScratchScope(self.scratch_arena)
+
+    @property
+    def conversion_cache(self) -> Optional[NativeConversionCache]:
+        """The cache used by `as_native_time_series`, if enabled"""
+        return self._conversion_cache
+
+    def enable_conversion_cache(
+        self, max_bytes: int = 256 * 1024 * 1024
+    ) -> NativeConversionCache:
+        """Enables the caching of conversions by `as_native_time_series`.
+
+        Series with the same identity, content and geometry as a previously converted one return the same native handle.
+        This is useful e.g. for observations converted repeatedly during a calibration; native code must not modify cached series.
+
+        Args:
+            max_bytes (int, optional): memory budget for the cached native data. Defaults to 256 MiB.
+
+        Returns:
+            NativeConversionCache: the conversion cache
+        """
+        with self._lock:
+            self._conversion_cache = NativeConversionCache(max_bytes)
+            return self._conversion_cache
+
+    def disable_conversion_cache(self) -> None:
+        """Disables and clears the caching of conversions by `as_native_time_series`"""
+        with self._lock:
+            cache, self._conversion_cache = self._conversion_cache, None
+        if cache is not None:
+            cache.invalidate()
+
+    def invalidate_conversion_cache(self, data: Optional[Any] = None) -> None:
+        """Removes cached native conversions, for a given source object or all of them
+
+        Args:
+            data (Optional[Any], optional): source object. Defaults to None, for all cached conversions.
+        """
+        cache = self._conversion_cache
+        if cache is not None:
+            cache.invalidate(data)
 
     def as_numeric_np_array(
         self, ptr: CffiData, size: int, shallow: bool = False
@@ -920,7 +2990,9 @@ class CffiMarshal:
         Returns:
             np.ndarray: converted data
         """
-        return as_numeric_np_array(self._ffi, ptr, size, shallow)
+        t = self._ffi.typeof(ptr)
+        converter = self._array_converters.get(t) or self.numeric_array_converter(t)
+        return converter(ptr, size, shallow)
 
     @property
     def nullptr(self) -> Any:
@@ -950,7 +3022,7 @@ class CffiMarshal:
         Returns:
             np.ndarray: converted data
         """
-        return as_np_array_double(self._ffi, ptr, size, shallow)
+        return self._as_np_array_double(ptr, size, shallow)
 
     def two_d_as_np_array_double(
         self, ptr: CffiData, nrow: int, ncol: int
@@ -968,7 +3040,7 @@ class CffiMarshal:
         Returns:
             np.ndarray: converted data
         """
-        return two_d_as_np_array_double(self._ffi, ptr, nrow, ncol)
+        return two_d_as_np_array_double(self._ffi, ptr, nrow, ncol, self.engine)
 
     def c_string_as_py_string(self, ptr: CffiData) -> str:
         """Convert if possible a cffi pointer to an ANSI C string <char*> to a python string.
@@ -1019,7 +3091,7 @@ class CffiMarshal:
         Returns:
             List[str]: converted data
         """
-        return c_charptrptr_as_string_list(self._ffi, ptr, size)
+        return _charptrptr_as_string_list(self._ffi, self._charpp, ptr, size)
 
     def character_vector_as_string_list(self, ptr: CffiData) -> List[str]:
         """Convert if possible a cffi pointer to a C character_vector , into a list of python strings.
@@ -1137,8 +3209,107 @@ class CffiMarshal:
         return tsgeom.as_native(self._ffi)
 
     def as_xarray_time_series(self, ptr: CffiData) -> xr.DataArray:
-        """TODO docstring"""
-        return as_xarray_time_series(self._ffi, ptr)
+        """Converts a native time series structure to an xarray representation
+
+        Args:
+            ptr (CffiData): pointer to the native struct `multi_regular_time_series_data`
+
+        Returns:
+            xr.DataArray: xarray time series
+        """
+        return as_xarray_time_series(self._ffi, ptr, engine=self.engine)
+
+    def native_ts_windows(
+        self, ptr: CffiData, windows: Sequence[TimeWindow]
+    ) -> List[xr.DataArray]:
+        """Gets many temporal windows of a native time series, as xarray time series
+
+        Args:
+            ptr (CffiData): pointer to the native struct `multi_regular_time_series_data`
+            windows (Sequence[TimeWindow]): (from_date, to_date) pairs, inclusive. `None` means unbounded.
+
+        Returns:
+            List[xr.DataArray]: xarray time series, one per window
+        """
+        return native_ts_windows(self._ffi, ptr, windows)
+
+    def stacked_native_ts_windows(
+        self, ptr: CffiData, windows: Sequence[TimeWindow]
+    ) -> np.ndarray:
+        """Gets many temporal windows of identical lengths of a native time series, stacked in a single array
+
+        Args:
+            ptr (CffiData): pointer to the native struct `multi_regular_time_series_data`
+            windows (Sequence[TimeWindow]): (from_date, to_date) pairs, inclusive. `None` means unbounded.
+
+        Returns:
+            np.ndarray: array of dimensions (window, ensemble, time)
+        """
+        return stacked_native_ts_windows(self._ffi, ptr, windows)
+
+    def window_native_time_series(
+        self,
+        data: NativePointerLike,
+        from_date: ConvertibleToTimestamp = None,
+        to_date: ConvertibleToTimestamp = None,
+    ) -> OwningCffiNativeHandle:
+        """Gets a temporal window of a native time series, without copying its data
+
+        Args:
+            data (NativePointerLike): (wrapper to a) pointer to the native struct `multi_regular_time_series_data`
+            from_date (ConvertibleToTimestamp, optional): start date of the window. Defaults to None.
+            to_date (ConvertibleToTimestamp, optional): end date of the window, inclusive. Defaults to None.
+
+        Returns:
+            OwningCffiNativeHandle: wrapper to a C struct `multi_regular_time_series_data` pointing inside the data of the original series
+        """
+        return window_native_time_series(self._ffi, data, from_date, to_date)
+
+    def iter_native_time_series(
+        self,
+        ptr: CffiData,
+        chunk_size: Optional[int] = None,
+        freq: Optional[str] = None,
+        as_xarray: bool = True,
+    ) -> Iterator[Union[xr.DataArray, Tuple[pd.DatetimeIndex, np.ndarray]]]:
+        """Iterates over consecutive chunks of a native time series
+
+        Args:
+            ptr (CffiData): pointer to the native struct `multi_regular_time_series_data`
+            chunk_size (Optional[int], optional): number of time steps in each chunk. Defaults to None.
+            freq (Optional[str], optional): pandas frequency string for calendar aligned chunks, e.g. "YS" for yearly chunks. Defaults to None.
+            as_xarray (bool, optional): yields xarray time series if True, otherwise tuples of the time index and a numpy array (ensemble, time). Defaults to True.
+
+        Yields:
+            Union[xr.DataArray, Tuple[pd.DatetimeIndex, np.ndarray]]: chunks of the time series, in chronological order
+        """
+        return iter_native_time_series(self._ffi, ptr, chunk_size, freq, as_xarray)
+
+    def as_xarray_dataset(
+        self, ptrs: Sequence[CffiData], names: Sequence[str], stack: bool = False
+    ) -> Union[xr.Dataset, xr.DataArray]:
+        """Converts many native time series to a single xarray Dataset, or a DataArray stacked along a "variable" dimension
+
+        Args:
+            ptrs (Sequence[CffiData]): pointers to native structs `multi_regular_time_series_data`
+            names (Sequence[str]): names of the series, used as variable names
+            stack (bool, optional): If True return a DataArray with dimensions (variable, ensemble, time). Defaults to False.
+
+        Returns:
+            Union[xr.Dataset, xr.DataArray]: Dataset with one variable per series, or stacked DataArray
+        """
+        return as_xarray_dataset(self._ffi, ptrs, names, stack, self.engine)
+
+    def as_numpy_time_series(self, ptr: CffiData) -> NumpyTimeSeries:
+        """Copies a native time series into a lightweight NumpyTimeSeries, without creating pandas or xarray objects
+
+        Args:
+            ptr (CffiData): pointer to the native struct `multi_regular_time_series_data`
+
+        Returns:
+            NumpyTimeSeries: time series, with data managed by Python
+        """
+        return NumpyTimeSeries.from_native(self._ffi, ptr)
 
     def get_native_tsgeom(self, pd_series: pd.Series) -> OwningCffiNativeHandle:
         """TODO docstring"""
@@ -1202,11 +3373,177 @@ class CffiMarshal:
         return as_c_double_array(self._ffi, data, shallow)
 
     def as_native_time_series(self, data: TimeSeriesLike) -> OwningCffiNativeHandle:
-        """TODO docstring"""
-        return as_native_time_series(self._ffi, data)
+        """Convert a pure python time series to a native representation via a C struct `multi_regular_time_series_data`
+
+        If the conversion cache is enabled, a previous conversion of the same series may be returned.
+
+        Args:
+            data (TimeSeriesLike): xarray or pandas based time series
+
+        Returns:
+            OwningCffiNativeHandle: wrapper to a C struct `multi_regular_time_series_data`
+        """
+        cache = self._conversion_cache
+        if cache is None:
+            return as_native_time_series(self._ffi, data, self.engine)
+        return cache.get_or_convert(
+            data, lambda x: as_native_time_series(self._ffi, x, self.engine)
+        )
+
+    def as_native_forecasts_series(
+        self, data: xr.DataArray, lead_time_step_seconds: Optional[int] = None
+    ) -> OwningCffiNativeHandle:
+        """Convert an ensemble forecasts time series to an array of native `multi_regular_time_series_data` structs
+
+        Args:
+            data (xr.DataArray): forecasts with dimensions "ensemble", "lead_time" and "time"
+            lead_time_step_seconds (Optional[int], optional): length of the lead time step in seconds. Defaults to None.
+
+        Returns:
+            OwningCffiNativeHandle: wrapper to a C array `multi_regular_time_series_data*[n]`, where n is the number of issue times
+        """
+        return as_native_forecasts_series(self._ffi, data, lead_time_step_seconds)
+
+    def as_xarray_forecasts_series(
+        self, ptr: CffiData, size: int, name: Optional[str] = None
+    ) -> xr.DataArray:
+        """Converts an array of native `multi_regular_time_series_data` forecasts into an ensemble forecasts time series
+
+        Args:
+            ptr (CffiData): pointer to a C array `multi_regular_time_series_data*`, one per issue time
+            size (int): number of issue times (forecasts) in the array
+            name (Optional[str], optional): name of the returned series. Defaults to None.
+
+        Returns:
+            xr.DataArray: forecasts with dimensions "ensemble", "lead_time" and "time"
+        """
+        return as_xarray_forecasts_series(self._ffi, ptr, size, name)
+
+    def as_native_nd_time_series(
+        self, data: xr.DataArray, time_step_seconds: Optional[int] = None
+    ) -> NdTimeSeriesNative:
+        """Convert an xarray time series of any rank to a native representation, described by a `time_series_dimensions_description`
+
+        Args:
+            data (xr.DataArray): time series, or any data array. A "time" dimension is optional.
+            time_step_seconds (Optional[int], optional): time step, required if the time dimension has length one. Defaults to None.
+
+        Returns:
+            NdTimeSeriesNative: native representation of the data
+        """
+        return as_native_nd_time_series(self._ffi, data, time_step_seconds)
+
+    def nd_time_series_as_xarray(
+        self,
+        dimensions: CffiData,
+        data: CffiData,
+        time_series_geometry: Optional[CffiData] = None,
+        coords: Optional[Dict[str, Any]] = None,
+        shallow: bool = False,
+        name: Optional[str] = None,
+    ) -> xr.DataArray:
+        """Converts a native multidimensional time series, described by a `time_series_dimensions_description`, to an xarray representation
+
+        Args:
+            dimensions (CffiData): pointer to the native struct `time_series_dimensions_description`
+            data (CffiData): pointer to the native array of `double`, in C (row-major) order
+            time_series_geometry (Optional[CffiData], optional): pointer to the `regular_time_series_geometry` of the "time" dimension. Defaults to None.
+            coords (Optional[Dict[str, Any]], optional): coordinates for the dimensions other than "time". Defaults to None.
+            shallow (bool, optional): If True the resulting array points directly to the native data. Defaults to False.
+            name (Optional[str], optional): name of the returned series. Defaults to None.
+
+        Returns:
+            xr.DataArray: xarray time series
+        """
+        return nd_time_series_as_xarray(
+            self._ffi, dimensions, data, time_series_geometry, coords, shallow, name
+        )
+
+    def as_native_multi_statistic_definition(
+        self,
+        objectives: Union[pd.DataFrame, Iterable[Mapping[str, Any]]],
+        mix_statistics_id: str = "",
+    ) -> OwningCffiNativeHandle:
+        """Creates a native `multi_statistic_definition` from a table of objectives, sharing identical observations
+
+        Args:
+            objectives (Union[pd.DataFrame, Iterable[Mapping[str, Any]]]): one row or mapping per statistic, with keys as in `STATISTIC_DEFINITION_FIELDS`
+            mix_statistics_id (str, optional): name of the list of statistics. Defaults to "".
+
+        Returns:
+            OwningCffiNativeHandle: wrapper to a C struct `multi_statistic_definition`
+        """
+        return as_native_multi_statistic_definition(self._ffi, objectives, mix_statistics_id)
+
+    def as_native_time_series_batch(
+        self,
+        data: Union[Sequence[TimeSeriesLike], Mapping[str, TimeSeriesLike], xr.Dataset],
+    ) -> OwningCffiNativeHandle:
+        """Convert many time series to native `multi_regular_time_series_data` structs in one pass
+
+        Args:
+            data (Union[Sequence[TimeSeriesLike], Mapping[str, TimeSeriesLike], xr.Dataset]): time series. For mappings and datasets, the order of the keys is the order of the native array.
+
+        Returns:
+            OwningCffiNativeHandle: wrapper to a C array `multi_regular_time_series_data*[n]`, owning all the native memory
+        """
+        return as_native_time_series_batch(self._ffi, data, self.engine)
+
+    def native_array(
+        self, ptr: CffiData, shape: Union[int, Tuple[int, ...]], owner: Any = None
+    ) -> NativeArray:
+        """A view of a native numeric array, exportable to array libraries without copy
+
+        Args:
+            ptr (CffiData): pointer to the first element, e.g. `double*`
+            shape (Union[int, Tuple[int, ...]]): shape of the contiguous (C order) array
+            owner (Any, optional): object owning the native memory, kept alive by this view. Defaults to None.
+
+        Returns:
+            NativeArray: view of the native array
+        """
+        return NativeArray(self._ffi, ptr, shape, owner)
+
+    def values_vector_as_array(
+        self, ptr: Union[CffiData, OwningCffiNativeHandle]
+    ) -> NativeArray:
+        """Zero-copy view of the values of a native `values_vector`"""
+        return values_vector_as_array(self._ffi, ptr)
+
+    def time_series_rows_as_arrays(
+        self, ptr: Union[CffiData, OwningCffiNativeHandle]
+    ) -> List[NativeArray]:
+        """Zero-copy views of the rows (ensemble members) of a native `multi_regular_time_series_data`"""
+        return time_series_rows_as_arrays(self._ffi, ptr)
+
+    def wrap_native_struct(
+        self, ptr: Union[CffiData, OwningCffiNativeHandle], owner: Any = None
+    ) -> NativeStructWrapper:
+        """Wraps a pointer to a native struct in the typed wrapper class for its type
+
+        Args:
+            ptr (Union[CffiData, OwningCffiNativeHandle]): pointer or handle to a native struct
+            owner (Any, optional): object owning the native memory, kept alive by the wrapper. Defaults to None.
+
+        Returns:
+            NativeStructWrapper: typed wrapper, with lazily cached views of the members of the struct
+        """
+        return wrap_native_struct(self._ffi, ptr, owner)
+
+    def new_time_series_buffer(self, ensemble_size: int, length: int) -> NativeTimeSeriesBuffer:
+        """Creates a preallocated native time series, reusable for time series of the same shape
+
+        Args:
+            ensemble_size (int): number of ensemble members
+            length (int): length of the series
+
+        Returns:
+            NativeTimeSeriesBuffer: preallocated native `multi_regular_time_series_data`
+        """
+        return NativeTimeSeriesBuffer(self._ffi, ensemble_size, length)
 
     def two_d_np_array_double_to_native(
         self, data: np.ndarray
     ) -> OwningCffiNativeHandle:
         """TODO docstring"""
-        return two_d_np_array_double_to_native(self._ffi, data)
+        return two_d_np_array_double_to_native(self._ffi, data, self.engine)
@@ -0,0 +1,122 @@
+"""Parallel execution of large data copies between Python and native memory.
+
+numpy releases the GIL while copying arrays of numeric types, so that large copies can
+be split in blocks and run concurrently on a thread pool. Whether this is faster than a serial copy
+depends on the number of CPUs and the memory bandwidth of the machine;
+see `benchmarks/parallel_marshalling.py` to compare the timings with one worker.
+"""
+
+import os
+import threading
+from concurrent.futures import Executor, ThreadPoolExecutor
+from typing import Any, Callable, List, Optional, Sequence
+
+DEFAULT_MIN_PARALLEL_SIZE = 1024 * 1024
+"""Default number of elements (e.g. `double`) below which copies are done serially"""
+
+
+class ParallelCopyEngine:
+    """Splits large copies in blocks of rows or items, and runs them on a thread pool.
+
+    Copies of a total size below a threshold are done serially in the calling thread,
+    to avoid the overhead of dispatching small copies to threads.
+    """
+
+    def __init__(
+        self,
+        max_workers: Optional[int] = None,
+        min_parallel_size: int = DEFAULT_MIN_PARALLEL_SIZE,
+        executor: Optional[Executor] = None,
+    ) -> None:
+        """Splits large copies in blocks of rows or items, and runs them on a thread pool.
+
+        Args:
+            max_workers (Optional[int], optional): number of threads. Defaults to None, for the number of CPUs.
+            min_parallel_size (int, optional): total number of elements copied below which the copy is done serially. Defaults to DEFAULT_MIN_PARALLEL_SIZE.
+            executor (Optional[Executor], optional): executor to use. Defaults to None, in which case a thread pool is created on first use and owned by this engine.
+        """
+        self.max_workers = max_workers if max_workers is not None else (os.cpu_count() or 1)
+        self.min_parallel_size = min_parallel_size
+        self._executor = executor
+        self._owns_executor = executor is None
+        self._lock = threading.Lock()
+
+    @property
+    def executor(self) -> Executor:
+        """The executor running the parallel copies"""
+        executor = self._executor
+        if executor is None:
+            with self._lock:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(
+                        max_workers=self.max_workers, thread_name_prefix="cinterop-copy"
+                    )
+                executor = self._executor
+        return executor
+
+    def is_parallel(self, total_size: int, n_items: int) -> bool:
+        """Whether a copy of a given size would be run in parallel"""
+        return self.max_workers > 1 and n_items > 1 and total_size >= self.min_parallel_size
+
+    def blocks(self, n_items: int) -> List[range]:
+        """Splits a number of items in contiguous blocks, about one per worker"""
+        n_blocks = max(1, min(n_items, self.max_workers))
+        size, rem = divmod(n_items, n_blocks)
+        result = []
+        start = 0
+        for i in range(n_blocks):
+            stop = start + size + (1 if i < rem else 0)
+            result.append(range(start, stop))
+            start = stop
+        return result
+
+    def for_each_block(
+        self, func: Callable[[int, int], Any], n_items: int, total_size: int
+    ) -> None:
+        """Calls `func(start, stop)` over contiguous blocks covering `range(n_items)`, in parallel if the copy is large enough
+
+        Args:
+            func (Callable[[int, int], Any]): function processing the items from start (inclusive) to stop (exclusive)
+            n_items (int): number of items, e.g. rows
+            total_size (int): total number of elements to copy, compared to the threshold for parallel processing
+        """
+        if not self.is_parallel(total_size, n_items):
+            func(0, n_items)
+            return
+        futures = [
+            self.executor.submit(func, b.start, b.stop) for b in self.blocks(n_items)
+        ]
+        for f in futures:
+            f.result()
+
+    def map(
+        self, func: Callable[[Any], Any], items: Sequence[Any], total_size: int
+    ) -> List[Any]:
+        """Applies a function to each item, e.g. each series of a batch, in parallel if the copy is large enough
+
+        Args:
+            func (Callable[[Any], Any]): function to apply
+            items (Sequence[Any]): items
+            total_size (int): total number of elements to copy, compared to the threshold for parallel processing
+
+        Returns:
+            List[Any]: results, in the order of the items
+        """
+        if not self.is_parallel(total_size, len(items)):
+            return [func(x) for x in items]
+        return list(self.executor.map(func, items))
+
+    def shutdown(self, wait: bool = True) -> None:
+        """Shuts down the thread pool, if owned by this engine"""
+        with self._lock:
+            executor = self._executor if self._owns_executor else None
+            if executor is not None:
+                self._executor = None
+        if executor is not None:
+            executor.shutdown(wait=wait)
+
+    def __enter__(self) -> "ParallelCopyEngine":
+        return self
+
+    def __exit__(self, *args: Any) -> None:
+        self.shutdown()
@@ -0,0 +1,264 @@
+"""Compact serialisation of regular time series and native handles, e.g. for inter-process communication.
+
+Regular time series are pickled as a time series geometry and their data, rather than their full time index.
+`loads` returns xarray time series, so the receiver rebuilds their time index from the geometry when unpickling;
+a `CompactTimeSeries` pickled as such keeps its geometry, and builds its time index only on first use.
+With pickle protocol 5 the data is passed as an out-of-band buffer.
+Native handles are pickled as their Python equivalent, and recreated in the receiving process with an FFI
+registered under the same key with `register_ffi`.
+"""
+
+import io
+import pickle
+from typing import Any, Callable, Dict, Hashable, Iterable, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+import xarray as xr
+from cffi import FFI
+from refcount.interop import OwningCffiNativeHandle
+
+from cinterop.cffi.marshal import (
+    NumpyTimeSeries,
+    TimeSeriesGeometry,
+    TimeSeriesGeometryNative,
+    get_tsgeom,
+)
+from cinterop.timeseries import TIME_DIMNAME
+
+_ffi_registry: Dict[Hashable, FFI] = {}
+
+
+def register_ffi(key: Hashable, ffi: FFI) -> None:
+    """Registers an FFI instance, to recreate native handles when unpickling in this process
+
+    Args:
+        key (Hashable): key identifying the native library, identical in all processes
+        ffi (FFI): ffi object to the native library in this process
+    """
+    _ffi_registry[key] = ffi
+
+
+def registered_ffi(key: Hashable) -> FFI:
+    """The FFI instance registered with a key
+
+    Raises:
+        pickle.PickleError: no FFI registered for this key
+    """
+    ffi = _ffi_registry.get(key)
+    if ffi is None:
+        raise pickle.PickleError(
+            "No FFI registered with the key '{}'; call register_ffi in this process first".format(key)
+        )
+    return ffi
+
+
+def _is_regular(index: pd.DatetimeIndex, geometry: TimeSeriesGeometry) -> bool:
+    if geometry.time_step_code == 0:
+        ticks = index.values.astype("datetime64[ns]").astype(np.int64)
+        return bool(np.all(np.diff(ticks) == geometry.time_step_seconds * 1_000_000_000))
+    rebuilt = pd.DatetimeIndex(geometry.time_index())
+    return bool(
+        np.array_equal(
+            rebuilt.values.astype("datetime64[ns]"), index.values.astype("datetime64[ns]")
+        )
+    )
+
+
+class CompactTimeSeries:
+    """A regular xarray time series, pickled as its time series geometry and data.
+
+    The time index is rebuilt on demand from the geometry.
+    """
+
+    __slots__ = ("geometry", "data", "dims", "coords", "name", "attrs", "_time_index")
+
+    def __init__(
+        self,
+        geometry: TimeSeriesGeometry,
+        data: np.ndarray,
+        dims: Tuple[str, ...],
+        coords: Optional[Dict[str, Tuple[Tuple[str, ...], np.ndarray]]] = None,
+        name: Optional[Hashable] = None,
+        attrs: Optional[Dict[str, Any]] = None,
+    ) -> None:
+        """A regular xarray time series, pickled as its time series geometry and data.
+
+        Args:
+            geometry (TimeSeriesGeometry): temporal geometry
+            data (np.ndarray): data, with dimensions `dims`
+            dims (Tuple[str, ...]): dimension names, including "time"
+            coords (Optional[Dict[str, Tuple[Tuple[str, ...], np.ndarray]]], optional): coordinates other than "time", as dimension names and values. Defaults to None.
+            name (Optional[Hashable], optional): name of the series. Defaults to None.
+            attrs (Optional[Dict[str, Any]], optional): attributes of the series. Defaults to None.
+        """
+        self.geometry = geometry
+        self.data = data
+        self.dims = tuple(dims)
+        self.coords = coords or {}
+        self.name = name
+        self.attrs = attrs or {}
+        self._time_index: Optional[pd.DatetimeIndex] = None
+
+    @staticmethod
+    def from_xarray(x: xr.DataArray) -> "CompactTimeSeries":
+        """Creates a compact representation of a regular time series
+
+        Args:
+            x (xr.DataArray): time series with a "time" dimension
+
+        Raises:
+            ValueError: the time index is not regular, i.e. cannot be rebuilt from a time series geometry
+
+        Returns:
+            CompactTimeSeries: compact representation, sharing the data of the input if it is contiguous
+        """
+        if TIME_DIMNAME not in x.dims:
+            raise ValueError("Expected a time series with a '{}' dimension".format(TIME_DIMNAME))
+        geometry = get_tsgeom(x)
+        index = x.indexes[TIME_DIMNAME]
+        if not _is_regular(index, geometry):
+            raise ValueError("The time index of the series is not regular")
+        coords = {
+            str(k): (tuple(str(d) for d in c.dims), c.values)
+            for k, c in x.coords.items()
+            if k != TIME_DIMNAME
+        }
+        return CompactTimeSeries(
+            geometry,
+            np.ascontiguousarray(x.values),
+            tuple(str(d) for d in x.dims),
+            coords,
+            x.name,
+            dict(x.attrs),
+        )
+
+    def time_index(self) -> pd.DatetimeIndex:
+        """The time index, created on first use"""
+        if self._time_index is None:
+            self._time_index = pd.DatetimeIndex(self.geometry.time_index())
+        return self._time_index
+
+    def to_xarray(self) -> xr.DataArray:
+        """The xarray time series, sharing the data of this object"""
+        coords = dict(self.coords)
+        coords[TIME_DIMNAME] = self.time_index()
+        return xr.DataArray(
+            self.data, coords=coords, dims=self.dims, name=self.name, attrs=self.attrs
+        )
+
+    def __reduce__(self) -> Tuple:
+        return (
+            CompactTimeSeries,
+            (self.geometry, self.data, self.dims, self.coords, self.name, self.attrs),
+        )
+
+
+def _as_xarray(compact: CompactTimeSeries) -> xr.DataArray:
+    return compact.to_xarray()
+
+
+def _native_time_series(
+    ffi_key: Hashable, series: NumpyTimeSeries
+) -> OwningCffiNativeHandle:
+    return series.as_native(registered_ffi(ffi_key))
+
+
+def _native_geometry(
+    ffi_key: Hashable, geometry: TimeSeriesGeometry
+) -> TimeSeriesGeometryNative:
+    return geometry.as_native(registered_ffi(ffi_key))
+
+
+class TimeSeriesPickler(pickle.Pickler):
+    """Pickler with compact representations of regular xarray time series and native handles.
+
+    - regular xarray time series are pickled as a geometry and data, and unpickled as xarray time series;
+    - native `multi_regular_time_series_data` handles and `TimeSeriesGeometryNative` are pickled as their
+      Python equivalent, and unpickled as new native handles created with the FFI registered under `ffi_key`.
+    """
+
+    def __init__(
+        self,
+        file: Any,
+        protocol: int = 5,
+        ffi_key: Optional[Hashable] = None,
+        buffer_callback: Optional[Callable[[pickle.PickleBuffer], Any]] = None,
+    ) -> None:
+        """Pickler with compact representations of regular xarray time series and native handles.
+
+        Args:
+            file (Any): file like object to write to
+            protocol (int, optional): pickle protocol. Defaults to 5, for out-of-band data buffers if `buffer_callback` is given.
+            ffi_key (Optional[Hashable], optional): key of the FFI to recreate native handles with in the receiving process. Defaults to None, in which case native handles cannot be pickled.
+            buffer_callback (Optional[Callable[[pickle.PickleBuffer], Any]], optional): callback collecting out-of-band buffers (pickle protocol 5). Defaults to None.
+        """
+        super().__init__(file, protocol=protocol, buffer_callback=buffer_callback)
+        self.ffi_key = ffi_key
+
+    def _native_reduction(self, obj: OwningCffiNativeHandle) -> Any:
+        if self.ffi_key is None:
+            raise pickle.PicklingError("Native handles can only be pickled with an ffi_key")
+        if isinstance(obj, TimeSeriesGeometryNative):
+            return (_native_geometry, (self.ffi_key, TimeSeriesGeometry.from_native(obj)))
+        ffi = registered_ffi(self.ffi_key)
+        ptr = obj.ptr
+        if ffi.typeof(ptr).cname == "multi_regular_time_series_data *":
+            series = NumpyTimeSeries.from_native(ffi, ptr)
+            return (_native_time_series, (self.ffi_key, series))
+        raise pickle.PicklingError(
+            "Cannot pickle a native handle to '{}'".format(ffi.typeof(ptr).cname)
+        )
+
+    def reducer_override(self, obj: Any) -> Any:
+        if (
+            isinstance(obj, xr.DataArray)
+            and TIME_DIMNAME in obj.dims
+            and obj.sizes[TIME_DIMNAME] > 1
+        ):
+            try:
+                compact = CompactTimeSeries.from_xarray(obj)
+            except ValueError:
+                return NotImplemented
+            return (_as_xarray, (compact,))
+        if isinstance(obj, OwningCffiNativeHandle):
+            return self._native_reduction(obj)
+        return NotImplemented
+
+
+def dumps(
+    obj: Any,
+    ffi_key: Optional[Hashable] = None,
+    buffer_callback: Optional[Callable[[pickle.PickleBuffer], Any]] = None,
+    protocol: int = 5,
+) -> bytes:
+    """Pickles an object, with compact representations of regular xarray time series and native handles
+
+    Args:
+        obj (Any): object to pickle, e.g. a time series, or a structure containing time series
+        ffi_key (Optional[Hashable], optional): key of the FFI to recreate native handles with in the receiving process. Defaults to None.
+        buffer_callback (Optional[Callable[[pickle.PickleBuffer], Any]], optional): callback collecting out-of-band data buffers, e.g. `list.append`. Defaults to None, to include the data in the returned bytes.
+        protocol (int, optional): pickle protocol. Defaults to 5.
+
+    Returns:
+        bytes: pickled object
+    """
+    f = io.BytesIO()
+    pickler = TimeSeriesPickler(
+        f, protocol=protocol, ffi_key=ffi_key, buffer_callback=buffer_callback
+    )
+    pickler.dump(obj)
+    return f.getvalue()
+
+
+def loads(data: bytes, buffers: Optional[Iterable[Any]] = None) -> Any:
+    """Unpickles an object pickled with `dumps`
+
+    Args:
+        data (bytes): pickled object
+        buffers (Optional[Iterable[Any]], optional): out-of-band buffers collected when pickling. Defaults to None.
+
+    Returns:
+        Any: unpickled object
+    """
+    return pickle.loads(data, buffers=buffers)
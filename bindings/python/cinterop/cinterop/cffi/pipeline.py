@@ -0,0 +1,188 @@
+"""Pipelined execution of iterative workflows: marshalling inputs, calling native code, and unmarshalling outputs.
+
+The three stages run on their own threads, so that the marshalling of the inputs of iteration
+`i+1` and the unmarshalling of the outputs of iteration `i-1` overlap with the native call of iteration `i`.
+"""
+
+import queue
+import threading
+from typing import Any, Callable, Iterable, Iterator, List, Optional, Sequence
+
+_END = object()
+
+
+class _StageError:
+    __slots__ = ("error",)
+
+    def __init__(self, error: BaseException) -> None:
+        self.error = error
+
+
+class _Stopped(Exception):
+    pass
+
+
+class MarshallingPipeline:
+    """Overlaps the marshalling, native call and unmarshalling stages of successive iterations.
+
+    Each iteration is given one of a fixed set of reusable buffers, e.g. preallocated native
+    input and output structures. A buffer is handed to the next iteration only once the outputs
+    of its previous iteration have been unmarshalled, which also bounds the number of iterations in flight:
+    the marshalling stage blocks (backpressure) until a buffer is available.
+    Three buffers are needed for the three stages to be busy at the same time.
+
+    The native calls are all made sequentially from the same thread, in the order of the inputs.
+    Results are yielded in the order of the inputs.
+    """
+
+    def __init__(
+        self,
+        marshal_in: Callable[[Any, Any], Any],
+        call: Callable[[Any], Any],
+        marshal_out: Callable[[Any, Any], Any],
+        buffers: Optional[Sequence[Any]] = None,
+        n_buffers: int = 3,
+    ) -> None:
+        """Overlaps the marshalling, native call and unmarshalling stages of successive iterations.
+
+        Args:
+            marshal_in (Callable[[Any, Any], Any]): function `(item, buffer) -> native_args` converting an input item, typically into `buffer`
+            call (Callable[[Any], Any]): function `(native_args) -> native_result`, typically calling the native library
+            marshal_out (Callable[[Any, Any], Any]): function `(native_result, buffer) -> result` converting the outputs of the native call
+            buffers (Optional[Sequence[Any]], optional): reusable buffers, handed in turn to the iterations. Defaults to None, in which case the buffers are the integers `0` to `n_buffers - 1`.
+            n_buffers (int, optional): number of buffers if `buffers` is None. Defaults to 3.
+
+        Raises:
+            ValueError: no buffer
+        """
+        if buffers is None:
+            buffers = list(range(n_buffers))
+        if len(buffers) < 1:
+            raise ValueError("At least one buffer is required")
+        self.marshal_in = marshal_in
+        self.call = call
+        self.marshal_out = marshal_out
+        self.buffers = list(buffers)
+
+    def map(self, items: Iterable[Any]) -> Iterator[Any]:
+        """Processes items through the pipeline
+
+        Args:
+            items (Iterable[Any]): inputs, consumed lazily as buffers become available
+
+        Returns:
+            Iterator[Any]: results, in the order of the inputs. Exceptions raised by a stage are raised when the corresponding result is reached.
+        """
+        n = len(self.buffers)
+        stop = threading.Event()
+        free: queue.Queue = queue.Queue()
+        for b in self.buffers:
+            free.put(b)
+        to_call: queue.Queue = queue.Queue(maxsize=n)
+        to_out: queue.Queue = queue.Queue(maxsize=n)
+        results: queue.Queue = queue.Queue(maxsize=n)
+
+        def _get(q: queue.Queue) -> Any:
+            while True:
+                if stop.is_set():
+                    raise _Stopped()
+                try:
+                    return q.get(timeout=0.05)
+                except queue.Empty:
+                    pass
+
+        def _put(q: queue.Queue, x: Any) -> None:
+            while True:
+                if stop.is_set():
+                    raise _Stopped()
+                try:
+                    q.put(x, timeout=0.05)
+                    return
+                except queue.Full:
+                    pass
+
+        def _in_stage() -> None:
+            try:
+                for item in items:
+                    buffer = _get(free)
+                    try:
+                        x = self.marshal_in(item, buffer)
+                    except BaseException as e:
+                        x = _StageError(e)
+                    _put(to_call, (buffer, x))
+                _put(to_call, _END)
+            except _Stopped:
+                pass
+            except BaseException as e:
+                # failure iterating over the inputs
+                try:
+                    _put(to_call, (None, _StageError(e)))
+                    _put(to_call, _END)
+                except _Stopped:
+                    pass
+
+        def _call_stage() -> None:
+            try:
+                while True:
+                    entry = _get(to_call)
+                    if entry is _END:
+                        _put(to_out, _END)
+                        return
+                    buffer, x = entry
+                    if not isinstance(x, _StageError):
+                        try:
+                            x = self.call(x)
+                        except BaseException as e:
+                            x = _StageError(e)
+                    _put(to_out, (buffer, x))
+            except _Stopped:
+                pass
+
+        def _out_stage() -> None:
+            try:
+                while True:
+                    entry = _get(to_out)
+                    if entry is _END:
+                        _put(results, _END)
+                        return
+                    buffer, x = entry
+                    if not isinstance(x, _StageError):
+                        try:
+                            x = self.marshal_out(x, buffer)
+                        except BaseException as e:
+                            x = _StageError(e)
+                    if buffer is not None:
+                        free.put(buffer)
+                    _put(results, x)
+            except _Stopped:
+                pass
+
+        threads: List[threading.Thread] = [
+            threading.Thread(target=f, name="cinterop-pipeline-" + name, daemon=True)
+            for f, name in [(_in_stage, "in"), (_call_stage, "call"), (_out_stage, "out")]
+        ]
+        for t in threads:
+            t.start()
+        try:
+            while True:
+                x = results.get()
+                if x is _END:
+                    return
+                if isinstance(x, _StageError):
+                    raise x.error
+                yield x
+        finally:
+            stop.set()
+            for t in threads:
+                t.join()
+
+    def run(self, items: Iterable[Any]) -> List[Any]:
+        """Processes all items through the pipeline
+
+        Args:
+            items (Iterable[Any]): inputs
+
+        Returns:
+            List[Any]: results, in the order of the inputs
+        """
+        return list(self.map(items))
@@ -0,0 +1,212 @@
+"""Time series in shared memory, to pass to native code in worker processes without copies.
+
+The parent process packs the data of time series once in a `multiprocessing.shared_memory` block,
+and sends a small picklable descriptor to the workers. Each worker attaches to the block,
+and only creates the row pointers and geometry of the native `multi_regular_time_series_data` structs.
+"""
+
+import os
+import sys
+from multiprocessing import resource_tracker, shared_memory
+from typing import Any, Dict, Iterable, Mapping, Optional, Tuple, Union
+
+import numpy as np
+from cffi import FFI
+from refcount.interop import OwningCffiNativeHandle
+
+from cinterop.cffi.marshal import (
+    NumpyTimeSeries,
+    TimeSeriesGeometry,
+)
+from cinterop.timeseries import TimeSeriesLike
+
+SeriesKey = Optional[str]
+
+_ITEMSIZE = np.dtype(np.float64).itemsize
+
+
+def _attach(name: str, pool_workers: bool, creator_pid: int) -> shared_memory.SharedMemory:
+    # The creating process is responsible for unlinking the block
+    if sys.version_info >= (3, 13):
+        return shared_memory.SharedMemory(name=name, track=False)
+    # Before Python 3.13 attaching registers the block with the resource tracker of the process (POSIX only).
+    # Pool workers share the tracker of the creating process, where the block is already registered once;
+    # other processes have a tracker of their own, which would unlink the block when they exit.
+    shm = shared_memory.SharedMemory(name=name)
+    if not pool_workers and os.getpid() != creator_pid and os.name == "posix":
+        resource_tracker.unregister("/" + shm.name, "shared_memory")
+    return shm
+
+
+class SharedTimeSeriesDescriptor:
+    """Picklable description of time series in a shared memory block: the name of the block, and the geometry, ensemble size and position of each series"""
+
+    __slots__ = ("shm_name", "entries", "pool_workers", "creator_pid")
+
+    def __init__(
+        self,
+        shm_name: str,
+        entries: Dict[SeriesKey, Tuple[int, int, TimeSeriesGeometry]],
+        pool_workers: bool = True,
+    ) -> None:
+        """Picklable description of time series in a shared memory block
+
+        Args:
+            shm_name (str): name of the shared memory block
+            entries (Dict[SeriesKey, Tuple[int, int, TimeSeriesGeometry]]): for each series, the offset (in number of `double`) of its data, its ensemble size and its geometry
+            pool_workers (bool, optional): whether the processes attaching are started by the creating process. Defaults to True.
+        """
+        self.shm_name = shm_name
+        self.entries = entries
+        self.pool_workers = pool_workers
+        self.creator_pid = os.getpid()
+
+    def __getstate__(self) -> Tuple:
+        return (self.shm_name, self.entries, self.pool_workers, self.creator_pid)
+
+    def __setstate__(self, state: Tuple) -> None:
+        self.shm_name, self.entries, self.pool_workers, self.creator_pid = state
+
+    def attach(self, ffi: FFI) -> "AttachedTimeSeries":
+        """Attaches to the shared memory block, typically in a worker process
+
+        Args:
+            ffi (FFI): ffi object to the native library
+
+        Returns:
+            AttachedTimeSeries: time series backed by the shared memory
+        """
+        return AttachedTimeSeries(self, ffi)
+
+
+class SharedTimeSeries:
+    """Time series copied once into a shared memory block, owned by the creating process.
+
+    The block is freed with `unlink`, e.g. on exiting a `with` statement, once the workers are done with it.
+    """
+
+    def __init__(
+        self,
+        data: Union[
+            TimeSeriesLike,
+            NumpyTimeSeries,
+            Mapping[str, Union[TimeSeriesLike, NumpyTimeSeries]],
+        ],
+        pool_workers: bool = True,
+    ) -> None:
+        """Time series copied once into a shared memory block
+
+        Args:
+            data (Union[TimeSeriesLike, NumpyTimeSeries, Mapping[str, Union[TimeSeriesLike, NumpyTimeSeries]]]): a time series, or time series by name
+            pool_workers (bool, optional): whether the processes attaching to the block are started by this one,
+                e.g. with `multiprocessing` or `concurrent.futures`, and share its resource tracker.
+                Set to False for independent processes. Defaults to True.
+        """
+        if isinstance(data, Mapping):
+            items = list(data.items())
+        else:
+            items = [(None, data)]
+        series = [
+            (
+                k,
+                x if isinstance(x, NumpyTimeSeries) else NumpyTimeSeries.from_time_series(x),
+            )
+            for k, x in items
+        ]
+        size = sum(x.data.size for _, x in series)
+        self._shm = shared_memory.SharedMemory(
+            create=True, size=max(1, size * _ITEMSIZE)
+        )
+        block = np.ndarray((size,), dtype=np.float64, buffer=self._shm.buf)
+        entries = {}
+        offset = 0
+        for k, x in series:
+            n = x.data.size
+            block[offset : offset + n].reshape(x.data.shape)[:] = x.data
+            entries[k] = (offset, x.ensemble_size, x.geometry)
+            offset += n
+        del block
+        self.descriptor = SharedTimeSeriesDescriptor(self._shm.name, entries, pool_workers)
+
+    @property
+    def name(self) -> str:
+        """Name of the shared memory block"""
+        return self._shm.name
+
+    def close(self) -> None:
+        """Closes the access to the shared memory block from this object"""
+        self._shm.close()
+
+    def unlink(self) -> None:
+        """Closes and frees the shared memory block. Workers must no longer use it."""
+        self._shm.close()
+        self._shm.unlink()
+
+    def __enter__(self) -> "SharedTimeSeries":
+        return self
+
+    def __exit__(self, *args: Any) -> None:
+        self.unlink()
+
+
+class AttachedTimeSeries:
+    """Time series read from a shared memory block, typically in a worker process.
+
+    The numpy arrays and native structs point directly to the shared memory, and must not be used after `close`.
+    """
+
+    def __init__(self, descriptor: SharedTimeSeriesDescriptor, ffi: FFI) -> None:
+        """Time series read from a shared memory block
+
+        Args:
+            descriptor (SharedTimeSeriesDescriptor): description of the shared series
+            ffi (FFI): ffi object to the native library
+        """
+        self._ffi = ffi
+        self._shm = _attach(descriptor.shm_name, descriptor.pool_workers, descriptor.creator_pid)
+        self._native: Dict[SeriesKey, OwningCffiNativeHandle] = {}
+        self.series: Dict[SeriesKey, NumpyTimeSeries] = {}
+        for k, (offset, ensemble_size, geometry) in descriptor.entries.items():
+            data = np.ndarray(
+                (ensemble_size, geometry.length),
+                dtype=np.float64,
+                buffer=self._shm.buf,
+                offset=offset * _ITEMSIZE,
+            )
+            self.series[k] = NumpyTimeSeries(geometry, data)
+
+    def keys(self) -> Iterable[SeriesKey]:
+        """Names of the series"""
+        return self.series.keys()
+
+    def native(self, key: SeriesKey = None) -> OwningCffiNativeHandle:
+        """Native `multi_regular_time_series_data` for a series, pointing to the shared data
+
+        Args:
+            key (SeriesKey, optional): name of the series. Defaults to None, for a single unnamed series.
+
+        Returns:
+            OwningCffiNativeHandle: wrapper to a C struct `multi_regular_time_series_data`
+        """
+        handle = self._native.get(key)
+        if handle is None:
+            handle = self.series[key].as_native(self._ffi)
+            handle.keepalive = [handle.keepalive, self]
+            self._native[key] = handle
+        return handle
+
+    def close(self) -> None:
+        """Releases the views on the shared memory, and detaches from it
+
+        Raises:
+            BufferError: some views of the shared memory are still referenced elsewhere
+        """
+        self._native.clear()
+        self.series.clear()
+        self._shm.close()
+
+    def __enter__(self) -> "AttachedTimeSeries":
+        return self
+
+    def __exit__(self, *args: Any) -> None:
+        self.close()
@@ -0,0 +1,403 @@
+"""Converters between native structs and Python objects, compiled from the cdef declarations of the structs.
+
+A `StructConverter` inspects the fields of a struct type once, and compiles specialised functions
+converting a struct to a dictionary and filling a struct from a dictionary, without per-field dispatch at call time.
+Structs with only numeric fields (or pointers, seen as addresses) also have a numpy structured dtype,
+so that native arrays of structs can be viewed or created from numpy structured arrays without copies.
+Converters are cached per FFI object and struct type; see `struct_converter`.
+"""
+
+import dataclasses
+import keyword
+import threading
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+from cffi import FFI
+from refcount.interop import CffiData, OwningCffiNativeHandle, unwrap_cffi_native_handle
+
+from cinterop.cffi.marshal import as_bytes
+
+_FLOAT_TYPES = ("float", "double")
+_BOOL_TYPES = ("_Bool", "bool")
+
+
+def _primitive_dtype(ffi: FFI, ctype: Any) -> Optional[np.dtype]:
+    """numpy dtype of a primitive type, or None if numpy has no exact equivalent, e.g. `long double`"""
+    name = ctype.cname
+    size = ffi.sizeof(ctype)
+    if name in _FLOAT_TYPES:
+        return np.dtype("f{}".format(size))
+    if name in _BOOL_TYPES:
+        return np.dtype("?")
+    if "double" in name or "float" in name or size not in (1, 2, 4, 8):
+        return None
+    if name.startswith("unsigned") or name.startswith("uint") or name == "size_t":
+        return np.dtype("u{}".format(size))
+    return np.dtype("i{}".format(size))
+
+
+def _struct_type(ffi: FFI, ctype: Any) -> Any:
+    t = ffi.typeof(ctype) if isinstance(ctype, str) else ctype
+    if t.kind == "pointer":
+        t = t.item
+    if t.kind != "struct":
+        raise TypeError("Expected a struct type, got: %s" % t.cname)
+    return t
+
+
+def _field_access(name: str) -> str:
+    if keyword.iskeyword(name):
+        return "getattr(p, {!r})".format(name)
+    return "p." + name
+
+
+class StructConverter:
+    """Converter between a native struct type and dictionaries, objects or numpy structured arrays.
+
+    Fields are converted as follows:
+
+    - numeric fields as Python numbers;
+    - `char*` fields as `str` (None for NULL), and fixed size `char[n]` fields as `str`;
+    - fixed size arrays of numbers as lists;
+    - nested structs as nested dictionaries;
+    - other pointers as cffi pointers, unchanged. When filling a struct they may also be given as
+      handles, and pointers to numbers as numpy arrays, which are pointed to without copy if they
+      are contiguous and of the dtype of the pointed type, and otherwise converted to it.
+    """
+
+    def __init__(self, ffi: FFI, ctype: Any) -> None:
+        """Compiles the conversions for a struct type
+
+        Args:
+            ffi (FFI): ffi object to the library
+            ctype (Any): struct type, or pointer to struct type, as a string (e.g. "values_vector") or cffi ctype
+
+        Raises:
+            TypeError: `ctype` is not a struct type
+        """
+        self._ffi = ffi
+        self.ctype = _struct_type(ffi, ctype)
+        self.fields = tuple(name for name, _ in self.ctype.fields)
+        self.itemsize = ffi.sizeof(self.ctype)
+        self.dtype: Optional[np.dtype] = self._create_dtype()
+        self._dataclass: Optional[type] = None
+        self.to_dict: Callable[[CffiData], Dict[str, Any]]
+        self._fill: Callable[[CffiData, Dict[str, Any], List[Any]], None]
+        self.to_dict, self._fill = self._compile()
+
+    def _pointer_type(self) -> Any:
+        return self._ffi.typeof(self.ctype.cname + " *")
+
+    def _array_type(self) -> Any:
+        return self._ffi.typeof(self.ctype.cname + "[]")
+
+    def _field_dtype(self, ftype: Any) -> Optional[Any]:
+        ffi = self._ffi
+        if ftype.kind == "primitive":
+            return _primitive_dtype(ffi, ftype)
+        if ftype.kind == "enum":
+            return np.dtype("i{}".format(ffi.sizeof(ftype)))
+        if ftype.kind == "pointer":
+            return np.dtype("u{}".format(ffi.sizeof(ftype)))
+        if ftype.kind == "array" and ftype.length is not None:
+            item = self._field_dtype(ftype.item)
+            return None if item is None else (item, (ftype.length,))
+        if ftype.kind == "struct":
+            return struct_converter(ffi, ftype).dtype
+        return None
+
+    def _create_dtype(self) -> Optional[np.dtype]:
+        names, formats, offsets = [], [], []
+        for name, field in self.ctype.fields:
+            if field.bitsize != -1:
+                return None
+            dtype = self._field_dtype(field.type)
+            if dtype is None:
+                return None
+            names.append(name)
+            formats.append(dtype)
+            offsets.append(field.offset)
+        return np.dtype(
+            {"names": names, "formats": formats, "offsets": offsets, "itemsize": self.itemsize}
+        )
+
+    def _compile(self) -> Tuple[Callable, Callable]:
+        ffi = self._ffi
+        namespace: Dict[str, Any] = {
+            "_string": self._string,
+            "_chars": self._chars,
+            "_encode": self._encode,
+            "_pointer": self._pointer,
+            "_sequence": self._sequence,
+        }
+        getters = []
+        setters = []
+        for i, (name, field) in enumerate(self.ctype.fields):
+            ftype = field.type
+            get = _field_access(name)
+            value = "d[{!r}]".format(name)
+            if ftype.kind == "pointer" and ftype.item.cname == "char":
+                get = "_string({})".format(get)
+                set_ = "_encode({}, keep)".format(value)
+            elif ftype.kind == "array" and ftype.item.cname == "char":
+                get = "_chars({})".format(get)
+                set_ = "as_bytes({})".format(value)
+                namespace["as_bytes"] = as_bytes
+            elif ftype.kind == "array":
+                get = "list({})".format(get)
+                set_ = "_sequence({})".format(value)
+            elif ftype.kind == "struct":
+                nested = "_nested_{}".format(i)
+                namespace[nested] = struct_converter(ffi, ftype)
+                getters.append("{!r}: {}.to_dict({})".format(name, nested, get))
+                setters.append(
+                    "    if {n!r} in d: {c}._fill({g}, {v}, keep)".format(
+                        n=name, c=nested, g=get, v=value
+                    )
+                )
+                continue
+            elif ftype.kind == "pointer":
+                pointer_type = "_ptype_{}".format(i)
+                namespace[pointer_type] = ftype
+                set_ = "_pointer({}, {}, keep)".format(pointer_type, value)
+            else:
+                set_ = value
+            getters.append("{!r}: {}".format(name, get))
+            if keyword.iskeyword(name):
+                setters.append(
+                    "    if {n!r} in d: setattr(p, {n!r}, {s})".format(n=name, s=set_)
+                )
+            else:
+                setters.append("    if {n!r} in d: p.{n} = {s}".format(n=name, s=set_))
+        source = "def to_dict(p):\n    return {" + ", ".join(getters) + "}\n"
+        source += "def fill(p, d, keep):\n" + "\n".join(setters + ["    pass"]) + "\n"
+        code = compile(source, "<struct converter {}>".format(self.ctype.cname), "exec")
+        exec(code, namespace)
+        return namespace["to_dict"], namespace["fill"]
+
+    def _string(self, x: CffiData) -> Optional[str]:
+        if x == self._ffi.NULL:
+            return None
+        return self._ffi.string(x).decode("utf-8")
+
+    def _chars(self, x: CffiData) -> str:
+        return self._ffi.string(x).decode("utf-8")
+
+    def _encode(self, x: Any, keep: List[Any]) -> CffiData:
+        if x is None:
+            return self._ffi.NULL
+        buffer = self._ffi.new("char[]", as_bytes(x))
+        keep.append(buffer)
+        return buffer
+
+    def _pointer(self, ftype: Any, x: Any, keep: List[Any]) -> CffiData:
+        if x is None:
+            return self._ffi.NULL
+        if isinstance(x, np.ndarray):
+            x = self._from_array(ftype.item, x)
+        keep.append(x)
+        return unwrap_cffi_native_handle(x)
+
+    def _from_array(self, item: Any, x: np.ndarray) -> CffiData:
+        if item.kind == "void":
+            return self._ffi.from_buffer(np.ascontiguousarray(x))
+        dtype = self._field_dtype(item)
+        if dtype is None or isinstance(dtype, tuple):
+            raise TypeError(
+                "Cannot point to a numpy array from a field of type '%s *'" % item.cname
+            )
+        # e.g. integers are converted to float64 for a `double*` field, but not float64 to integers
+        x = np.ascontiguousarray(x.astype(dtype, casting="same_kind", copy=False))
+        return self._ffi.from_buffer(item.cname + "[]", x)
+
+    @staticmethod
+    def _sequence(x: Any) -> Any:
+        return x.tolist() if isinstance(x, np.ndarray) else x
+
+    def fill(self, ptr: Union[CffiData, OwningCffiNativeHandle], data: Dict[str, Any]) -> List[Any]:
+        """Sets the fields of a native struct from a dictionary; fields missing from the dictionary are unchanged
+
+        Args:
+            ptr (Union[CffiData, OwningCffiNativeHandle]): pointer or handle to the struct
+            data (Dict[str, Any]): field values
+
+        Returns:
+            List[Any]: objects owning memory pointed to by the struct, e.g. strings, to keep alive as long as the struct is used
+        """
+        keep: List[Any] = []
+        self._fill(unwrap_cffi_native_handle(ptr), data, keep)
+        return keep
+
+    def from_dict(self, data: Dict[str, Any]) -> OwningCffiNativeHandle:
+        """Creates a native struct from a dictionary; missing fields are zero
+
+        Args:
+            data (Dict[str, Any]): field values
+
+        Returns:
+            OwningCffiNativeHandle: wrapper to a pointer to the new struct
+        """
+        ptr = self._ffi.new(self._pointer_type())
+        result = OwningCffiNativeHandle(ptr)
+        result.keepalive = self.fill(ptr, data)
+        return result
+
+    def to_dicts(self, ptr: Union[CffiData, OwningCffiNativeHandle], size: int) -> List[Dict[str, Any]]:
+        """Converts a native array of structs to dictionaries
+
+        Args:
+            ptr (Union[CffiData, OwningCffiNativeHandle]): pointer to the first struct
+            size (int): number of structs
+
+        Returns:
+            List[Dict[str, Any]]: converted structs
+        """
+        p: CffiData = unwrap_cffi_native_handle(ptr)
+        to_dict = self.to_dict
+        return [to_dict(p[i]) for i in range(size)]
+
+    def from_dicts(self, items: Sequence[Dict[str, Any]]) -> OwningCffiNativeHandle:
+        """Creates a native array of structs from dictionaries
+
+        Args:
+            items (Sequence[Dict[str, Any]]): field values of each struct
+
+        Returns:
+            OwningCffiNativeHandle: wrapper to the new array of structs
+        """
+        ptr = self._ffi.new(self._array_type(), len(items))
+        keep: List[Any] = []
+        fill = self._fill
+        for i, d in enumerate(items):
+            fill(ptr[i], d, keep)
+        result = OwningCffiNativeHandle(ptr)
+        result.keepalive = keep
+        return result
+
+    def dataclass(self) -> type:
+        """A dataclass with the fields of the struct, created on first use
+
+        Raises:
+            TypeError: a field name is a Python keyword
+        """
+        if self._dataclass is None:
+            name = self.ctype.cname.replace(" ", "_").replace("$", "_")
+            self._dataclass = dataclasses.make_dataclass(name, list(self.fields))
+        return self._dataclass
+
+    def to_object(self, ptr: Union[CffiData, OwningCffiNativeHandle], cls: Optional[Callable[..., Any]] = None) -> Any:
+        """Converts a native struct to an object created with the fields of the struct as keyword arguments
+
+        Args:
+            ptr (Union[CffiData, OwningCffiNativeHandle]): pointer or handle to the struct
+            cls (Optional[Callable[..., Any]], optional): class of the object, e.g. a dataclass. Defaults to None, for the class returned by `dataclass()`.
+
+        Returns:
+            Any: converted struct
+        """
+        if cls is None:
+            cls = self.dataclass()
+        return cls(**self.to_dict(unwrap_cffi_native_handle(ptr)))
+
+    def from_object(self, obj: Any) -> OwningCffiNativeHandle:
+        """Creates a native struct from the attributes of an object, e.g. a dataclass instance
+
+        Args:
+            obj (Any): object with attributes named after the fields of the struct
+
+        Returns:
+            OwningCffiNativeHandle: wrapper to a pointer to the new struct
+        """
+        data = {k: getattr(obj, k) for k in self.fields if hasattr(obj, k)}
+        return self.from_dict(data)
+
+    def _require_dtype(self) -> np.dtype:
+        if self.dtype is None:
+            raise TypeError(
+                "Struct type '%s' has fields without a numpy equivalent" % self.ctype.cname
+            )
+        return self.dtype
+
+    def as_structured_array(self, ptr: Union[CffiData, OwningCffiNativeHandle], size: int) -> np.ndarray:
+        """A numpy structured array pointing to a native array of structs, without copy
+
+        Pointer fields are seen as unsigned integer addresses.
+
+        Args:
+            ptr (Union[CffiData, OwningCffiNativeHandle]): pointer to the first struct
+            size (int): number of structs
+
+        Raises:
+            TypeError: the struct has fields without a numpy equivalent
+
+        Returns:
+            np.ndarray: structured array, valid as long as the native memory is
+        """
+        dtype = self._require_dtype()
+        p = unwrap_cffi_native_handle(ptr)
+        if size == 0:
+            return np.empty(0, dtype=dtype)
+        return np.frombuffer(self._ffi.buffer(p, size * self.itemsize), dtype=dtype)
+
+    def from_structured_array(self, data: np.ndarray) -> OwningCffiNativeHandle:
+        """A native array of structs pointing to the data of a numpy structured array
+
+        The data is copied only if it does not already have the dtype of the struct, and is contiguous.
+
+        Args:
+            data (np.ndarray): structured array with the fields of the struct
+
+        Raises:
+            TypeError: the struct has fields without a numpy equivalent
+
+        Returns:
+            OwningCffiNativeHandle: wrapper to the array of structs, keeping the data alive
+        """
+        dtype = self._require_dtype()
+        data = np.ascontiguousarray(data.astype(dtype, copy=False))
+        if len(data) == 0:
+            ptr = self._ffi.new(self._array_type(), 0)
+        else:
+            ptr = self._ffi.from_buffer(self._array_type(), data)
+        result = OwningCffiNativeHandle(ptr)
+        result.keepalive = data
+        return result
+
+
+_CONVERTERS_ATTR = "_cinterop_struct_converters"
+"""Attribute of FFI objects holding their struct converters. Converters reference their FFI object,
+so they are stored on it rather than in a module level cache, and are freed with it."""
+
+_converters_lock = threading.RLock()
+
+
+def struct_converter(ffi: FFI, ctype: Any) -> StructConverter:
+    """The converter for a struct type, compiled on first use and cached for this FFI object
+
+    Args:
+        ffi (FFI): ffi object to the library
+        ctype (Any): struct type, or pointer to struct type, as a string (e.g. "values_vector") or cffi ctype
+
+    Raises:
+        TypeError: `ctype` is not a struct type
+
+    Returns:
+        StructConverter: converter
+    """
+    # e.g. "values_vector", "values_vector*" and their cffi ctypes share a converter
+    key = _struct_type(ffi, ctype).cname
+    cache: Dict[str, StructConverter] = getattr(ffi, _CONVERTERS_ATTR, {})
+    converter = cache.get(key)
+    if converter is not None:
+        return converter
+    with _converters_lock:
+        cache = getattr(ffi, _CONVERTERS_ATTR, {})
+        converter = cache.get(key)
+        if converter is None:
+            converter = StructConverter(ffi, ctype)
+            # copy on write, for lookups without lock; converters of nested structs may have been added meanwhile
+            cache = dict(getattr(ffi, _CONVERTERS_ATTR, {}))
+            cache[key] = converter
+            setattr(ffi, _CONVERTERS_ATTR, cache)
+    return converter
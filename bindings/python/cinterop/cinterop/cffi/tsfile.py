@@ -0,0 +1,227 @@
+"""A simple binary file format for time series, loaded as native time series by memory mapping.
+
+The file holds a fixed size header mirroring the C struct `regular_time_series_geometry` and
+the ensemble size, followed by the data as contiguous little-endian float64, one ensemble member after the other.
+Opening a file maps it in memory; the rows of the native `multi_regular_time_series_data` point into the mapping,
+so that the data is only read from disk when accessed.
+
+| offset | type      | content                                         |
+|--------|-----------|-------------------------------------------------|
+| 0      | char[4]   | magic number `CITS`                             |
+| 4      | uint32    | format version                                  |
+| 8      | int32[6]  | start: year, month, day, hour, minute, second   |
+| 32     | int32     | time_step_seconds                               |
+| 36     | int32     | length                                          |
+| 40     | int32     | time_step_code                                  |
+| 44     | int32     | ensemble_size                                   |
+| 48     | uint32    | offset of the data in the file                  |
+| 64     | float64[] | data, of shape (ensemble_size, length)          |
+"""
+
+import mmap
+import os
+import struct
+import sys
+from datetime import datetime
+from typing import Any, Optional, Tuple, Union
+
+import numpy as np
+from cffi import FFI
+from refcount.interop import CffiData, OwningCffiNativeHandle, unwrap_cffi_native_handle
+
+from cinterop.cffi.marshal import (
+    NumpyTimeSeries,
+    TimeSeriesGeometry,
+    TimeSeriesGeometryNative,
+    as_np_array_double,
+)
+from cinterop.timeseries import TimeSeriesLike, as_pydatetime
+
+MAGIC = b"CITS"
+FORMAT_VERSION = 1
+HEADER_SIZE = 64
+
+_HEADER = struct.Struct("<4sI6iiiiiI")
+
+PathLike = Union[str, os.PathLike]
+
+
+def _pack_header(geometry: TimeSeriesGeometry, ensemble_size: int) -> bytes:
+    start = as_pydatetime(geometry.start)
+    header = _HEADER.pack(
+        MAGIC,
+        FORMAT_VERSION,
+        start.year,
+        start.month,
+        start.day,
+        start.hour,
+        start.minute,
+        start.second,
+        geometry.time_step_seconds,
+        geometry.length,
+        geometry.time_step_code,
+        ensemble_size,
+        HEADER_SIZE,
+    )
+    return header.ljust(HEADER_SIZE, b"\0")
+
+
+def _unpack_header(buffer: Any) -> Tuple[TimeSeriesGeometry, int, int]:
+    if len(buffer) < HEADER_SIZE:
+        raise ValueError("Not a time series file: the file is too short")
+    fields = _HEADER.unpack_from(buffer)
+    magic, version = fields[0], fields[1]
+    if magic != MAGIC:
+        raise ValueError("Not a time series file: unexpected magic number {!r}".format(magic))
+    if version > FORMAT_VERSION:
+        raise ValueError("Unsupported time series file format version {}".format(version))
+    year, month, day, hour, minute, second = fields[2:8]
+    time_step_seconds, length, time_step_code, ensemble_size, data_offset = fields[8:13]
+    geometry = TimeSeriesGeometry(
+        datetime(year, month, day, hour, minute, second),
+        time_step_seconds,
+        length,
+        time_step_code,
+    )
+    return geometry, ensemble_size, data_offset
+
+
+def read_time_series_header(path: PathLike) -> Tuple[TimeSeriesGeometry, int]:
+    """Reads the geometry and ensemble size of a time series file, without its data
+
+    Args:
+        path (PathLike): file path
+
+    Returns:
+        Tuple[TimeSeriesGeometry, int]: time series geometry and ensemble size
+    """
+    with open(path, "rb") as f:
+        geometry, ensemble_size, _ = _unpack_header(f.read(HEADER_SIZE))
+    return geometry, ensemble_size
+
+
+def write_time_series_file(
+    path: PathLike,
+    data: Union[TimeSeriesLike, NumpyTimeSeries, CffiData, OwningCffiNativeHandle],
+    ffi: Optional[FFI] = None,
+) -> None:
+    """Writes a time series to a file, to be memory mapped with `open_time_series_file`
+
+    Args:
+        path (PathLike): file path
+        data (Union[TimeSeriesLike, NumpyTimeSeries, CffiData, OwningCffiNativeHandle]): xarray or pandas time series, or a native `multi_regular_time_series_data`
+        ffi (Optional[FFI], optional): ffi object to the library, required if `data` is a native time series. Defaults to None.
+    """
+    if isinstance(data, (OwningCffiNativeHandle, FFI.CData)):
+        if ffi is None:
+            raise ValueError("An FFI object is required to write a native time series")
+        ptr: CffiData = unwrap_cffi_native_handle(data)
+        geometry = TimeSeriesGeometry.from_native(
+            TimeSeriesGeometryNative(ptr.time_series_geometry)
+        )
+        ensemble_size = ptr.ensemble_size
+        # rows are written one at a time from the native memory, without a copy of the whole series
+        rows = (
+            as_np_array_double(ffi, ptr.numeric_data[i], geometry.length, shallow=True)
+            for i in range(ensemble_size)
+        )
+    else:
+        if not isinstance(data, NumpyTimeSeries):
+            data = NumpyTimeSeries.from_time_series(data)
+        geometry = data.geometry
+        ensemble_size = data.ensemble_size
+        rows = (data.data[i] for i in range(ensemble_size))
+    with open(path, "wb") as f:
+        f.write(_pack_header(geometry, ensemble_size))
+        for row in rows:
+            f.write(np.asarray(row, dtype="<f8").tobytes())
+
+
+class MappedTimeSeries:
+    """A time series file mapped in memory.
+
+    The mapping is private (copy on write): native code may modify the data in memory, but not the file.
+    Arrays and native structs obtained from this object point into the mapping, and must not be used after `close`.
+    """
+
+    def __init__(self, path: PathLike) -> None:
+        """A time series file mapped in memory
+
+        Args:
+            path (PathLike): file path
+
+        Raises:
+            ValueError: the file is not a valid time series file
+        """
+        if sys.byteorder != "little":  # pragma: no cover
+            raise NotImplementedError(
+                "Memory mapping time series files requires a little-endian platform"
+            )
+        self.path = path
+        with open(path, "rb") as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_COPY)
+        try:
+            geometry, ensemble_size, data_offset = _unpack_header(self._mmap)
+            n = ensemble_size * geometry.length
+            if len(self._mmap) < data_offset + n * 8:
+                raise ValueError("Truncated time series file: {}".format(path))
+            data = np.frombuffer(self._mmap, dtype=np.float64, count=n, offset=data_offset)
+        except BaseException:
+            self._mmap.close()
+            raise
+        self.series = NumpyTimeSeries(geometry, data.reshape((ensemble_size, geometry.length)))
+
+    @property
+    def geometry(self) -> TimeSeriesGeometry:
+        """Geometry of the time series"""
+        return self.series.geometry
+
+    @property
+    def ensemble_size(self) -> int:
+        """Number of ensemble members"""
+        return self.series.ensemble_size
+
+    @property
+    def data(self) -> np.ndarray:
+        """The data of shape (ensemble, time), a view on the mapped memory"""
+        return self.series.data
+
+    def as_native(self, ffi: FFI) -> OwningCffiNativeHandle:
+        """Native `multi_regular_time_series_data` with rows pointing into the mapped memory
+
+        Args:
+            ffi (FFI): ffi object to the library
+
+        Returns:
+            OwningCffiNativeHandle: wrapper to a C struct `multi_regular_time_series_data`, keeping the mapping alive
+        """
+        handle = self.series.as_native(ffi)
+        handle.keepalive = [handle.keepalive, self]
+        return handle
+
+    def close(self) -> None:
+        """Unmaps the file
+
+        Raises:
+            BufferError: arrays or native structs pointing to the mapping are still referenced
+        """
+        self.series = None
+        self._mmap.close()
+
+    def __enter__(self) -> "MappedTimeSeries":
+        return self
+
+    def __exit__(self, *args: Any) -> None:
+        self.close()
+
+
+def open_time_series_file(path: PathLike) -> MappedTimeSeries:
+    """Opens a time series file by mapping it in memory, without reading the data
+
+    Args:
+        path (PathLike): file path
+
+    Returns:
+        MappedTimeSeries: time series file mapped in memory
+    """
+    return MappedTimeSeries(path)
@@ -1,7 +1,7 @@
 """Python representations of multidimensional time series and interop with Python cffi"""
 
 from datetime import datetime
-from typing import Any, Callable, List, Optional, Union
+from typing import Any, Callable, List, Optional, Sequence, Tuple, Union
 
 import numpy as np
 import pandas as pd
@@ -11,6 +11,7 @@ TIME_DIM_NAME = "time"
 TIME_DIMNAME = "time"
 ENSEMBLE_DIMNAME = "ensemble"
 LEADTIME_DIMNAME = "lead_time"
+VARIABLE_DIMNAME = "variable"
 
 XR_UNITS_ATTRIB_ID: str = "units"
 """key for the units attribute on xarray DataArray objects"""
@@ -25,6 +26,10 @@ ConvertibleToTimestamp = Union[str, datetime, np.datetime64, pd.Timestamp]
 """types that can be converted with relative unambiguity to a pandas Timestamp 
 """
 
+TimeWindow = Tuple[Optional[ConvertibleToTimestamp], Optional[ConvertibleToTimestamp]]
+"""a (from_date, to_date) pair defining a temporal window, both ends inclusive. `None` means unbounded.
+"""
+
 
 def create_even_time_index(
     start: ConvertibleToTimestamp, time_step_seconds: int, n: int
@@ -547,3 +552,139 @@ def ts_window(
         return slice_pd_time_series(ts, from_date, to_date)
     else:
         raise TypeError("Not supported: " + str(type(ts)))
+
+
+def window_positions(
+    time_index: Union[np.ndarray, pd.DatetimeIndex], windows: Sequence[TimeWindow]
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Resolves many temporal windows to positions in a time index, with a single vectorised search
+
+    Args:
+        time_index (Union[np.ndarray, pd.DatetimeIndex]): sorted time index of a series
+        windows (Sequence[TimeWindow]): (from_date, to_date) pairs, inclusive. `None` means unbounded.
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray]: start (inclusive) and end (exclusive) positions of each window in the time index.
+    """
+    tindx = np.asarray(time_index)
+    if not np.issubdtype(tindx.dtype, np.datetime64):
+        tindx = tindx.astype("datetime64[ns]")
+    n_windows = len(windows)
+    if len(tindx) == 0:
+        empty = np.zeros(n_windows, dtype=np.int64)
+        return empty, empty.copy()
+    unit = np.datetime_data(tindx.dtype)[0]
+    bounds = np.empty(2 * n_windows, dtype=tindx.dtype)
+    # Searching for to_date plus one tick with side="left" is equivalent to an inclusive search with side="right".
+    # This lets us resolve all the windows bounds in a single call to searchsorted
+    one_tick = np.timedelta64(1, unit)
+    for i, (from_date, to_date) in enumerate(windows):
+        bounds[i] = tindx[0] if from_date is None else as_datetime64(from_date)
+        end = tindx[-1] if to_date is None else np.datetime64(as_datetime64(to_date), unit)
+        bounds[n_windows + i] = end + one_tick
+    positions = np.searchsorted(tindx, bounds, side="left")
+    starts = positions[:n_windows]
+    ends = np.maximum(positions[n_windows:], starts)
+    return starts, ends
+
+
+def _time_axis(ts: TimeSeriesLike) -> int:
+    if isinstance(ts, xr.DataArray):
+        return ts.get_axis_num(TIME_DIMNAME)
+    elif isinstance(ts, pd.Series) or isinstance(ts, pd.DataFrame):
+        return 0
+    else:
+        raise TypeError("Not supported: " + str(type(ts)))
+
+
+def ts_windows(
+    ts: TimeSeriesLike, windows: Sequence[TimeWindow]
+) -> List[TimeSeriesLike]:
+    """Gets many temporal windows of a time series, as views on the original data where possible
+
+    The time index is searched only once for all the windows, unlike repeated calls to `ts_window`.
+
+    Args:
+        ts (TimeSeriesLike): pandas dataframe, series, or xarray DataArray
+        windows (Sequence[TimeWindow]): (from_date, to_date) pairs, inclusive. `None` means unbounded.
+
+    Raises:
+        TypeError: unhandled input time for `ts`
+
+    Returns:
+        List[TimeSeriesLike]: Subset windows of the full time series, in the order of `windows`
+
+    Examples:
+        ts_windows(unaccounted_indus, [('1980-04-01', '1990-03-31'), ('1990-04-01', '2000-03-31')])
+    """
+    _time_axis(ts)  # checks the type of ts
+    starts, ends = window_positions(__ts_index(ts), windows)
+    if isinstance(ts, xr.DataArray):
+        return [
+            ts.isel({TIME_DIMNAME: slice(a, b)}) for a, b in zip(starts, ends)
+        ]
+    else:
+        return [ts.iloc[a:b] for a, b in zip(starts, ends)]
+
+
+def stacked_windows(
+    data: np.ndarray, starts: np.ndarray, length: int, time_axis: int = 0
+) -> np.ndarray:
+    """Stacks windows of identical length along a new leading axis
+
+    Windows are extracted from a sliding window view of `data`. If the windows starts
+    are evenly spaced the result is a read-only strided view without any copy,
+    otherwise a single gather copy is performed.
+
+    Args:
+        data (np.ndarray): array with a time axis
+        starts (np.ndarray): start positions of the windows along the time axis
+        length (int): length of all the windows
+        time_axis (int, optional): axis of the time dimension in `data`. Defaults to 0.
+
+    Returns:
+        np.ndarray: array of shape `(len(starts),) + data.shape`, with `length` in lieu of the time dimension length
+    """
+    starts = np.asarray(starts, dtype=np.int64)
+    n = data.shape[time_axis]
+    out_shape = (len(starts),) + data.shape[:time_axis] + (length,) + data.shape[time_axis + 1 :]
+    if len(starts) == 0 or length == 0 or length > n:
+        return np.empty(out_shape, dtype=data.dtype)
+    sliding = np.lib.stride_tricks.sliding_window_view(data, length, axis=time_axis)
+    steps = np.diff(starts)
+    if len(starts) == 1 or (steps[0] > 0 and np.all(steps == steps[0])):
+        step = 1 if len(starts) == 1 else int(steps[0])
+        selector = slice(int(starts[0]), int(starts[-1]) + 1, step)
+        selected = sliding[(slice(None),) * time_axis + (selector,)]
+    else:
+        selected = np.take(sliding, starts, axis=time_axis)
+    # 'selected' has the windows along time_axis, and the window length as the last axis
+    return np.moveaxis(selected, [time_axis, -1], [0, time_axis + 1])
+
+
+def stacked_ts_windows(
+    ts: TimeSeriesLike, windows: Sequence[TimeWindow]
+) -> np.ndarray:
+    """Gets many temporal windows of identical lengths of a time series, stacked in a single array
+
+    Args:
+        ts (TimeSeriesLike): pandas dataframe, series, or xarray DataArray
+        windows (Sequence[TimeWindow]): (from_date, to_date) pairs, inclusive. `None` means unbounded.
+
+    Raises:
+        TypeError: unhandled input time for `ts`
+        ValueError: windows are not all of the same length
+
+    Returns:
+        np.ndarray: array with the windows along the first axis, then the dimensions of `ts`. This is a read-only view if the windows are evenly spaced.
+    """
+    time_axis = _time_axis(ts)
+    starts, ends = window_positions(__ts_index(ts), windows)
+    lengths = ends - starts
+    if len(lengths) > 0 and not np.all(lengths == lengths[0]):
+        raise ValueError(
+            "Windows must all be of the same length to be stacked, but got lengths "
+            + str(sorted(set(lengths.tolist())))
+        )
+    length = int(lengths[0]) if len(lengths) > 0 else 0
+    return stacked_windows(np.asarray(ts.values), starts, length, time_axis)
@@ -76,7 +76,7 @@ CLASSIFIERS = ['Development Status :: 4 - Beta',
                 # Suggestions in the CFFI mailing list that refcount may be cpython only and problematic on pypy
                 'Programming Language :: Python :: Implementation :: CPython',
                 # 'Programming Language :: Python :: 2.7', # Not sure anymore. Needs unit testing if so.
-                'Programming Language :: Python :: 3'
+                'Programming Language :: Python :: 3',
                 ]
 # Arguments marked as "Required" below must be included for upload to PyPI.
 # Fields marked as "Optional" may be commented out.
@@ -94,6 +94,7 @@ setup(
     keywords='interop python native-libraries reference-counting handle cffi',
     packages=['cinterop', 'cinterop.cffi'],
     install_requires=REQUIREMENTS,
+    extras_require={'arrow': ['pyarrow']},
     # extras_require={
     #     ':python_version >= "3.6"': [
     #         'PyQt5',
@@ -1,7 +1,11 @@
+import asyncio
 import os
 import sys
+import threading
+import time
 from datetime import datetime
 from pathlib import Path
+from typing import Dict, List
 
 import numpy as np
 import pandas as pd
@@ -10,21 +14,47 @@ import xarray as xr
 from cffi import FFI
 from cinterop.cffi.marshal import (
     CffiMarshal,
+    CharacterVectorNative,
+    LEAD_TIME_STEP_ATTR,
+    MultiRegularTimeSeriesDataNative,
+    NamedValuesVectorNative,
+    NativeArray,
+    NumpyTimeSeries,
+    ReadMostlyCache,
+    StringStringMapNative,
     TimeSeriesGeometry,
+    ValuesVectorNative,
     as_bytes,
     as_native_time_series,
     as_string,
+    convert_strings,
     geom_to_xarray_time_series,
+    get_native_tsgeom,
     get_tsgeom,
     new_ctype_array,
     new_double_array,
     new_int_array,
 )
 
+from cinterop.cffi.aio import AsyncNativeCaller
+from cinterop.cffi.bindings import bind_native_function, cdef_arg_names, native_binding
+from cinterop.cffi.parallel import ParallelCopyEngine
+from cinterop.cffi.pickling import CompactTimeSeries, dumps, loads, register_ffi
+from cinterop.cffi.pipeline import MarshallingPipeline
+from cinterop.cffi.shared import SharedTimeSeries
+from cinterop.cffi.structs import struct_converter
+from cinterop.cffi.tsfile import (
+    open_time_series_file,
+    read_time_series_header,
+    write_time_series_file,
+)
+
 # from cinterop.cffi.marshal import
 from cinterop.timeseries import (
     as_datetime64,
     as_timestamp,
+    create_daily_time_index,
+    create_ensemble_forecasts_series,
     create_ensemble_series,
     create_even_time_index,
     create_monthly_time_index,
@@ -518,6 +548,1275 @@ def test_multi_regular_time_series_data():
     ut_dll.dispose_mtsd(ptr)
 
 
+def test_native_ts_windows():
+    ptr = ut_dll.create_mtsd()
+    windows = [("2001-01-02", "2001-01-04"), ("2001-01-04", "2001-01-06"), (None, "2001-01-03")]
+    subsets = marshal.native_ts_windows(ptr, windows)
+    assert len(subsets) == 3
+    assert subsets[0].shape == (2, 2)
+    assert subsets[1].shape == (2, 2)
+    assert subsets[2].shape == (2, 1)
+    assert subsets[1].values[1, 0] == 2.1
+    assert start_ts(subsets[1]) == as_datetime64("2001-01-04T03:04:05")
+    stacked = marshal.stacked_native_ts_windows(ptr, [("2001-01-03", "2001-01-05"), ("2001-01-05", "2001-01-07")])
+    assert stacked.shape == (2, 2, 2)
+    assert stacked[1, 0, 0] == 3.0
+    assert stacked[1, 1, 1] == 4.1
+    with pytest.raises(ValueError):
+        marshal.stacked_native_ts_windows(ptr, windows)
+    ptr.time_series_geometry.time_step_seconds = 0
+    with pytest.raises(ValueError, match="time step of 0 seconds"):
+        marshal.stacked_native_ts_windows(ptr, windows)
+    with pytest.raises(ValueError, match="start 2001-01-02T03:04:05, length 7"):
+        marshal.window_native_time_series(ptr, "2001-01-03", None)
+    ut_dll.dispose_mtsd(ptr)
+
+
+def test_window_native_time_series():
+    ptr = ut_dll.create_mtsd()
+    w = marshal.window_native_time_series(ptr, "2001-01-03", "2001-01-05T12")
+    assert w.ptr.ensemble_size == 2
+    assert w.ptr.time_series_geometry.length == 3
+    assert w.ptr.numeric_data[0][0] == 1.0
+    assert w.ptr.numeric_data[1][2] == 3.1
+    x = marshal.as_xarray_time_series(w.ptr)
+    assert start_ts(x) == as_datetime64("2001-01-03T03:04:05")
+    assert end_ts(x) == as_datetime64("2001-01-05T03:04:05")
+    # no copy: the window points to the original data
+    ptr.numeric_data[0][1] = 3.1415
+    assert w.ptr.numeric_data[0][0] == 3.1415
+    w = marshal.window_native_time_series(ptr, "2002-01-01", None)
+    assert w.ptr.time_series_geometry.length == 0
+    ut_dll.dispose_mtsd(ptr)
+
+    data = _create_test_series_xr()
+    parent = as_native_time_series(ut_ffi, data)
+    w = marshal.window_native_time_series(parent, from_date="2020-01-02")
+    del parent
+    x = marshal.as_xarray_time_series(w.ptr)
+    assert x.shape == (2, 2)
+    assert np.array_equal(x.values, data.values[:, 1:])
+
+    data = mk_xarray_series(np.arange(12, dtype=float), time_index=create_monthly_time_index("2000-01-01", 12))
+    parent = as_native_time_series(ut_ffi, data)
+    w = marshal.window_native_time_series(parent, "2000-03-01", "2000-05-15")
+    x = marshal.as_xarray_time_series(w.ptr)
+    assert x.shape == (1, 3)
+    assert start_ts(x) == as_datetime64("2000-03-01")
+    assert x.values[0, 0] == 2.0
+
+
+def test_iter_native_time_series():
+    ptr = ut_dll.create_mtsd()
+    chunks = list(marshal.iter_native_time_series(ptr, chunk_size=3))
+    assert [c.shape for c in chunks] == [(2, 3), (2, 3), (2, 1)]
+    assert start_ts(chunks[1]) == as_datetime64("2001-01-05T03:04:05")
+    assert chunks[2].values[1, 0] == 6.1
+    chunks = list(marshal.iter_native_time_series(ptr, chunk_size=3, as_xarray=False))
+    time_index, npx = chunks[0]
+    assert len(time_index) == 3
+    assert npx.shape == (2, 3)
+    with pytest.raises(ValueError):
+        list(marshal.iter_native_time_series(ptr))
+    with pytest.raises(ValueError):
+        list(marshal.iter_native_time_series(ptr, chunk_size=3, freq="YS"))
+    # an empty series has no chunk, whichever way it is chunked
+    empty = marshal.window_native_time_series(ptr, "2002-01-01", None)
+    assert empty.ptr.time_series_geometry.length == 0
+    assert list(marshal.iter_native_time_series(empty.ptr, chunk_size=3)) == []
+    assert list(marshal.iter_native_time_series(empty.ptr, freq="YS")) == []
+    del empty
+    ut_dll.dispose_mtsd(ptr)
+
+    data = mk_hourly_xarray_series(np.arange(24 * 400, dtype=float), "2000-12-31T20")
+    native = as_native_time_series(ut_ffi, data)
+    chunks = list(marshal.iter_native_time_series(native.ptr, freq="YS"))
+    assert [c.shape[1] for c in chunks] == [4, 365 * 24, 24 * 400 - 4 - 365 * 24]
+    assert start_ts(chunks[1]) == as_datetime64("2001-01-01")
+    assert end_ts(chunks[1]) == as_datetime64("2001-12-31T23")
+    recombined = np.concatenate([c.values for c in chunks], axis=1)
+    assert np.array_equal(recombined[0], data.values)
+
+
+def test_as_native_time_series_batch(monkeypatch):
+    time_index = create_daily_time_index("2000-01-01", 4)
+    ds = xr.Dataset(
+        {
+            "rain": ("time", np.arange(4, dtype=float)),
+            "pet": ("time", np.arange(4, dtype=float) + 10),
+        },
+        coords={"time": time_index},
+    )
+    native = marshal.as_native_time_series_batch(ds)
+    ptr = native.ptr
+    assert ptr[0].ensemble_size == 1
+    assert ptr[0].time_series_geometry.length == 4
+    assert ptr[1].numeric_data[0][3] == 13.0
+    x = marshal.as_xarray_time_series(ptr[1])
+    assert np.array_equal(x.values[0], ds["pet"].values)
+    assert np.array_equal(x.time.values, ds.time.values)
+
+    series = {
+        "ens": _create_test_series_xr(ens_dim_first=False),
+        "pd": _create_test_series_pd_series(),
+        "df": _create_test_series_pd_df(),
+        "monthly": mk_xarray_series(np.arange(12, dtype=float), time_index=create_monthly_time_index("2000-01-01", 12)),
+    }
+    native = marshal.as_native_time_series_batch(series)
+    ptr = native.ptr
+    assert [ptr[i].ensemble_size for i in range(4)] == [2, 1, 2, 1]
+    assert ptr[0].numeric_data[1][2] == 6.0
+    assert ptr[2].numeric_data[1][0] == 4.0
+    assert ptr[3].time_series_geometry.time_step_code == 1
+    # all the rows are in a single contiguous block
+    assert ptr[1].numeric_data[0] == ptr[0].numeric_data[1] + 3
+    native = marshal.as_native_time_series_batch(list(series.values()))
+    assert native.ptr[3].numeric_data[0][11] == 11.0
+
+    # equal time indices that are distinct objects share a geometry; different ones do not
+    hourly = pd.Series(np.arange(3, dtype=float), index=pd.date_range("2000-01-01", periods=3, freq="h"))
+    same = pd.Series(np.arange(3, dtype=float) + 3, index=pd.DatetimeIndex(list(hourly.index)))
+    later = pd.Series(np.arange(3, dtype=float) + 6, index=hourly.index + pd.Timedelta(days=1))
+    daily = pd.Series(np.arange(3, dtype=float) + 9, index=pd.date_range("2000-01-01", periods=3, freq="D"))
+    assert same.index is not hourly.index
+    inferred = []
+
+    def counting_get_native_tsgeom(ffi, x):
+        inferred.append(x)
+        return get_native_tsgeom(ffi, x)
+
+    monkeypatch.setattr("cinterop.cffi.marshal.get_native_tsgeom", counting_get_native_tsgeom)
+    native = marshal.as_native_time_series_batch([hourly, same, later, daily])
+    assert len(inferred) == 3
+    for i, x in enumerate([hourly, same, later, daily]):
+        y = marshal.as_xarray_time_series(native.ptr[i])
+        assert np.array_equal(y.time.values, x.index.values)
+        assert np.array_equal(y.values[0], x.values)
+
+
+def test_as_xarray_dataset():
+    time_index = create_daily_time_index("2000-01-01", 4)
+    ds = xr.Dataset(
+        {
+            "rain": ("time", np.arange(4, dtype=float)),
+            "pet": ("time", np.arange(4, dtype=float) + 10),
+        },
+        coords={"time": time_index},
+    )
+    native = marshal.as_native_time_series_batch(ds)
+    names = ["rain", "pet"]
+    x = marshal.as_xarray_dataset([native.ptr[0], native.ptr[1]], names)
+    assert isinstance(x, xr.Dataset)
+    assert list(x.data_vars) == names
+    assert np.array_equal(x["pet"].values[0], ds["pet"].values)
+    assert np.array_equal(x.time.values, ds.time.values)
+    x = marshal.as_xarray_dataset(native.ptr, names, stack=True)
+    assert x.dims == ("variable", "ensemble", "time")
+    assert list(x.coords["variable"].values) == names
+    assert x.sel(variable="pet").values[0, 2] == 12.0
+
+    ptr = ut_dll.create_mtsd()
+    x = marshal.as_xarray_dataset([native.ptr[0], ptr], ["rain", "mtsd"])
+    assert x["mtsd"].sel(ensemble=1).dropna("time").values[0] == 0.1
+    with pytest.raises(ValueError):
+        marshal.as_xarray_dataset([native.ptr[0], ptr], ["rain", "mtsd"], stack=True)
+    with pytest.raises(ValueError):
+        marshal.as_xarray_dataset([ptr], ["rain", "mtsd"])
+    with pytest.raises(ValueError):
+        marshal.as_xarray_dataset([native.ptr[0], ptr], ["rain", "rain"])
+    ut_dll.dispose_mtsd(ptr)
+
+
+def test_native_time_series_container():
+    ptr = ut_dll.create_mtsd()
+    nts = marshal.as_numpy_time_series(ptr)
+    ut_dll.dispose_mtsd(ptr)
+    assert nts.ensemble_size == 2
+    assert nts.length == 7
+    assert nts.geometry.start == datetime(2001, 1, 2, 3, 4, 5)
+    assert nts.data[1, 6] == 6.1
+    with pytest.raises(AttributeError):
+        nts.something = 1
+
+    native = nts.as_native(ut_ffi)
+    assert native.ptr.time_series_geometry.length == 7
+    assert native.ptr.time_series_geometry.time_step_seconds == 86400
+    # rows point to the numpy data
+    native.ptr.numeric_data[1][6] = 3.1415
+    assert nts.data[1, 6] == 3.1415
+    back = NumpyTimeSeries.from_native(ut_ffi, native.ptr)
+    assert np.array_equal(back.data, nts.data)
+    assert back.data is not nts.data
+
+    x = nts.to_xarray(name="x")
+    assert x.name == "x"
+    assert x.shape == (2, 7)
+    assert start_ts(x) == as_datetime64("2001-01-02T03:04:05")
+    df = nts.to_pandas()
+    assert df.shape == (7, 2)
+
+    nts = NumpyTimeSeries.from_time_series(_create_test_series_pd_series())
+    assert nts.ensemble_size == 1
+    assert isinstance(nts.to_pandas(), pd.Series)
+    nts = NumpyTimeSeries.from_time_series(_create_test_series_xr(ens_dim_first=False))
+    assert nts.data[1, 0] == 4.0
+    native = nts.as_native(ut_ffi)
+    assert native.ptr.numeric_data[1][2] == 6.0
+    with pytest.raises(ValueError):
+        NumpyTimeSeries(nts.geometry, np.zeros((2, 5)))
+
+
+def test_conversion_cache():
+    m = CffiMarshal(ut_ffi)
+    data = _create_test_series_xr()
+    assert m.conversion_cache is None
+    assert m.as_native_time_series(data) is not m.as_native_time_series(data)
+    cache = m.enable_conversion_cache(max_bytes=1000)
+    x = m.as_native_time_series(data)
+    assert m.as_native_time_series(data) is x
+    assert cache.hits == 1
+    assert cache.nbytes == 6 * 8
+    # content changed: new conversion
+    data.values[0, 0] = 42.0
+    y = m.as_native_time_series(data)
+    assert y is not x
+    assert y.ptr.numeric_data[0][0] == 42.0
+    # same content, different object: new conversion
+    other = data.copy(deep=True)
+    assert m.as_native_time_series(other) is not y
+    assert len(cache) == 3
+    m.invalidate_conversion_cache(data)
+    assert len(cache) == 1
+    assert m.as_native_time_series(data) is not y
+    # garbage collected source objects are evicted
+    del other
+    assert len(cache) == 1
+    # memory budget
+    big = mk_daily_xarray_series(np.arange(100, dtype=float), "2000-01-01")
+    m.as_native_time_series(big)
+    assert cache.nbytes <= 1000
+    assert len(cache) == 2
+    big2 = mk_daily_xarray_series(np.arange(100, dtype=float) + 1, "2000-01-01")
+    m.as_native_time_series(big2)
+    assert len(cache) == 1
+    huge = mk_daily_xarray_series(np.arange(1000, dtype=float), "2000-01-01")
+    m.as_native_time_series(huge)
+    assert len(cache) == 1
+    m.invalidate_conversion_cache()
+    assert len(cache) == 0
+    assert cache.nbytes == 0
+    m.disable_conversion_cache()
+    assert m.conversion_cache is None
+
+
+def test_conversion_cache_concurrent_misses():
+    from cinterop.cffi.marshal import NativeConversionCache, as_native_time_series
+
+    cache = NativeConversionCache()
+    data = _create_test_series_xr()
+    n_threads = 4
+    barrier = threading.Barrier(n_threads)
+    n_conversions = []
+    results = []
+
+    def slow_convert(x):
+        n_conversions.append(1)
+        time.sleep(0.05)
+        return as_native_time_series(ut_ffi, x)
+
+    def worker():
+        barrier.wait()
+        results.append(cache.get_or_convert(data, slow_convert))
+
+    threads = [threading.Thread(target=worker) for _ in range(n_threads)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert len(n_conversions) == 1
+    assert all(r is results[0] for r in results)
+    assert cache.misses == 1 and cache.hits == n_threads - 1
+    assert cache.nbytes == 6 * 8
+    cache.invalidate(data)
+    assert len(cache) == 0 and cache.nbytes == 0
+
+    # a failed conversion does not block the threads waiting for it
+    def failing(x):
+        raise ValueError("conversion failed")
+
+    with pytest.raises(ValueError):
+        cache.get_or_convert(data, failing)
+    assert cache.get_or_convert(data, slow_convert) is not None
+
+
+def test_parallel_copy_engine():
+    engine = ParallelCopyEngine(max_workers=4, min_parallel_size=10)
+    assert [len(b) for b in engine.blocks(10)] == [3, 3, 2, 2]
+    assert engine.is_parallel(100, 10)
+    assert not engine.is_parallel(5, 10)
+    assert not engine.is_parallel(100, 1)
+    m = CffiMarshal(ut_ffi, engine=engine)
+    serial = CffiMarshal(ut_ffi)
+    x = np.arange(7 * 13, dtype=float).reshape((7, 13))
+    native = m.two_d_np_array_double_to_native(x)
+    assert np.array_equal(serial.two_d_as_np_array_double(native.ptr, 7, 13), x)
+    assert np.array_equal(m.two_d_as_np_array_double(native.ptr, 7, 13), x)
+    ens = create_ensemble_series(
+        np.arange(4 * 20, dtype=float).reshape((4, 20)),
+        ["a", "b", "c", "d"],
+        create_daily_time_index(pd.Timestamp("2000-01-01"), 20),
+    )
+    ts = m.as_native_time_series(ens)
+    assert np.array_equal(m.as_xarray_time_series(ts.ptr).values, ens.values)
+    batch = [ens, ens + 1, ens + 2]
+    handle = m.as_native_time_series_batch(batch)
+    ptrs = [handle.ptr[i] for i in range(3)]
+    y = m.as_xarray_dataset(ptrs, ["x", "y", "z"], stack=True)
+    z = serial.as_xarray_dataset(ptrs, ["x", "y", "z"], stack=True)
+    assert y.equals(z)
+    assert np.array_equal(y.values[2], ens.values + 2)
+    engine.shutdown()
+    # the thread pool is created once, even when first used concurrently
+    engine = ParallelCopyEngine(max_workers=2)
+    executors = []
+    threads = [threading.Thread(target=lambda: executors.append(engine.executor)) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert len(set(id(e) for e in executors)) == 1
+    engine.shutdown()
+
+
+def test_async_native_caller():
+    started = threading.Event()
+    release = threading.Event()
+    calls = []
+
+    def blocking(x):
+        calls.append(x)
+        started.set()
+        release.wait(5)
+        return x
+
+    async def scenario():
+        async with AsyncNativeCaller(marshal, max_workers=2, max_concurrency=1) as caller:
+            data = _create_test_series_xr()
+            ts = await caller.as_native_time_series(data)
+            x = await caller.as_xarray_time_series(ts)
+            assert np.array_equal(x.values, data.values)
+            x_ptr = marshal.new_double_array(5)
+            x_ptr[4] = 2.0
+            assert await caller.call_native(ut_dll.get_array_double, x_ptr, 4) == 2.0
+            get_array_double = caller.wrap(ut_dll.get_array_double)
+            assert await get_array_double(x_ptr, 4) == 2.0
+            first = asyncio.ensure_future(caller.run(blocking, 1))
+            await asyncio.get_running_loop().run_in_executor(None, started.wait, 5)
+            # waits for a concurrency slot, then cancelled before running
+            second = asyncio.ensure_future(caller.run(blocking, 2))
+            await asyncio.sleep(0.01)
+            second.cancel()
+            release.set()
+            assert await first == 1
+            with pytest.raises(asyncio.CancelledError):
+                await second
+            assert await caller.run(lambda: 3) == 3
+            assert caller.pending_count == 0
+
+    asyncio.run(scenario())
+    assert calls == [1]
+
+
+def test_marshalling_pipeline():
+    in_flight = []
+    counts = {"in": 0, "out": 0}
+
+    def marshal_in(item, buffers):
+        counts["in"] += 1
+        in_flight.append(counts["in"] - counts["out"])
+        return buffers[0].fill(item), buffers[1]
+
+    def call(args):
+        src, out = args[0].ptr, args[1]
+        if src.numeric_data[0][0] < 0:
+            raise ValueError("negative")
+        out.ptr.time_series_geometry = src.time_series_geometry
+        for i in range(src.ensemble_size):
+            for j in range(src.time_series_geometry.length):
+                out.ptr.numeric_data[i][j] = src.numeric_data[i][j] * 2
+        return out
+
+    def marshal_out(out, buffers):
+        counts["out"] += 1
+        return out.to_xarray()
+
+    buffers = [
+        (marshal.new_time_series_buffer(2, 3), marshal.new_time_series_buffer(2, 3))
+        for _ in range(3)
+    ]
+    pipeline = MarshallingPipeline(marshal_in, call, marshal_out, buffers=buffers)
+    items = [_create_test_series_xr() + i for i in range(10)]
+    results = pipeline.run(items)
+    assert len(results) == 10
+    for x, y in zip(items, results):
+        assert np.array_equal(y.values, x.values * 2)
+        assert np.array_equal(y.time.values, x.time.values)
+    assert max(in_flight) <= 3
+    with pytest.raises(ValueError):
+        buffers[0][0].fill(mk_daily_xarray_series(np.arange(4, dtype=float), "2000-01-01"))
+    # univariate series fill a buffer with a single ensemble member
+    univariate = marshal.new_time_series_buffer(1, 5)
+    series = pd.Series(np.arange(5, dtype=float), index=create_daily_time_index("2000-01-01", 5))
+    handle = univariate.fill(series)
+    assert handle.ptr.numeric_data[0][4] == 4.0
+    assert np.array_equal(univariate.to_xarray().values[0], series.values)
+    univariate.fill(mk_daily_xarray_series(np.arange(5, dtype=float) + 1, "2000-01-01"))
+    assert handle.ptr.numeric_data[0][4] == 5.0
+    # errors are raised in order, and stop the pipeline
+    items[4] = items[4] * 0 - 1
+    results = []
+    with pytest.raises(ValueError, match="negative"):
+        for y in pipeline.map(items):
+            results.append(y)
+    assert len(results) == 4
+    # stopping early
+    it = pipeline.map(items)
+    next(it)
+    it.close()
+
+
+def test_c2dtype_read_only():
+    from cinterop.cffi.marshal import _c2dtype
+
+    with pytest.raises(TypeError):
+        _c2dtype["int *"] = np.dtype("i4")
+
+
+def test_read_mostly_cache():
+    cache = ReadMostlyCache(max_size=2)
+    assert cache.get("a") is None
+    assert cache.get_or_create("a", lambda: 1) == 1
+    assert cache.get_or_create("a", lambda: 2) == 1
+    cache.get_or_create("b", lambda: 2)
+    assert len(cache) == 2
+    cache.get_or_create("c", lambda: 3)
+    assert len(cache) == 1
+    assert cache.get("c") == 3
+    cache.clear()
+    assert len(cache) == 0
+
+
+def test_scratch_arena():
+    m = CffiMarshal(ut_ffi)
+    arena = m.scratch_arena
+    with m.scratch() as a:
+        assert a is arena
+        x = a.as_c_double_array([1.0, 2.0, 3.0])
+        assert ut_dll.get_array_double(x, 2) == 3.0
+        s = a.as_charptr("abc")
+        assert ut_ffi.string(s) == b"abc"
+        mark = a.mark()
+        big = a.allocate("double", 100000)
+        assert a.capacity >= 800000
+        a.release(mark)
+        y = a.allocate("double", 3)
+        assert int(ut_ffi.cast("intptr_t", y)) != int(ut_ffi.cast("intptr_t", big))
+    assert arena.mark() == (0, 0)
+    capacity = arena.capacity
+    # memory is reused
+    with m.scratch() as a:
+        a.allocate("double", 100000)
+    assert arena.capacity == capacity
+    with pytest.raises(ValueError):
+        arena.allocate("double", -1)
+
+
+def test_marshal_concurrent_stress():
+    n_threads = 8
+    n_iter = 50
+    m = CffiMarshal(ut_ffi)
+    m.enable_conversion_cache()
+    shared = _create_test_series_xr()
+    errors = []
+    arenas = set()
+    cached_handles = []
+    barrier = threading.Barrier(n_threads)
+
+    def worker(k):
+        try:
+            barrier.wait()
+            arenas.add(id(m.scratch_arena))
+            for i in range(n_iter):
+                values = np.arange(10, dtype=float) + k * 1000 + i
+                data = mk_daily_xarray_series(values, "2000-01-01")
+                native = m.as_native_time_series(data)
+                back = m.as_xarray_time_series(native.ptr)
+                assert np.array_equal(back.values[0], data.values)
+                assert back.time.values[0] == data.time.values[0]
+                cached = m.as_native_time_series(shared)
+                assert cached.ptr.numeric_data[1][2] == 6.0
+                cached_handles.append(cached)
+                with m.scratch() as arena:
+                    x = arena.as_c_double_array([k, i])
+                    assert ut_dll.get_array_double(x, 0) == k
+                    assert ut_dll.get_array_double(x, 1) == i
+                    assert ut_ffi.string(arena.as_charptr("k%d" % k)) == b"k%d" % k
+        except BaseException as e:  # pragma: no cover
+            errors.append(e)
+
+    threads = [threading.Thread(target=worker, args=(k,)) for k in range(n_threads)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert errors == []
+    assert len(arenas) == n_threads
+    n_calls = n_threads * n_iter
+    # the shared series is converted only once, whatever the interleaving of the threads
+    assert len(cached_handles) == n_calls
+    assert all(h is cached_handles[0] for h in cached_handles)
+    cache = m.conversion_cache
+    assert cache.hits + cache.misses == 2 * n_calls
+    # one miss per distinct series: each per-iteration series, and the shared one
+    assert cache.misses == n_calls + 1
+
+
+def _sum_shared_series(descriptor):
+    with descriptor.attach(ut_ffi) as attached:
+        ptr = attached.native("b").ptr
+        n = ptr.time_series_geometry.length
+        total = sum(
+            ptr.numeric_data[i][j] for i in range(ptr.ensemble_size) for j in range(n)
+        )
+        x = attached.series["a"].to_xarray()
+        result = (total, x.time.values[0])
+        del ptr, x
+    return result
+
+
+def test_shared_time_series():
+    import pickle
+
+    a = _create_test_series_xr()
+    b = mk_daily_xarray_series(np.arange(10, dtype=float), "2000-01-01")
+    with SharedTimeSeries({"a": a, "b": b}) as shared:
+        descriptor = pickle.loads(pickle.dumps(shared.descriptor))
+        assert len(pickle.dumps(shared.descriptor)) < 1000
+        attached = descriptor.attach(ut_ffi)
+        assert set(attached.keys()) == {"a", "b"}
+        h = attached.native("a")
+        assert attached.native("a") is h
+        x = marshal.as_xarray_time_series(h.ptr)
+        assert np.array_equal(x.values, a.values)
+        assert np.array_equal(x.time.values, a.time.values)
+        # no copy: writes are visible to other processes attached
+        attached.series["b"].data[0, 0] = 42.0
+        assert _sum_shared_series(descriptor) == (42.0 + 45.0, a.time.values[0])
+        del h, x
+        attached.close()
+        import multiprocessing as mp
+        from concurrent.futures import ProcessPoolExecutor
+
+        methods = ["spawn"] if sys.platform == "win32" else ["fork", "spawn"]
+        for method in methods:
+            with ProcessPoolExecutor(2, mp_context=mp.get_context(method)) as pool:
+                results = list(pool.map(_sum_shared_series, [descriptor] * 2))
+            assert results == [(87.0, a.time.values[0])] * 2
+        # the block outlives the workers: exiting them did not unlink it
+        assert _sum_shared_series(descriptor) == (87.0, a.time.values[0])
+    single = SharedTimeSeries(b)
+    attached = single.descriptor.attach(ut_ffi)
+    assert attached.native().ptr.numeric_data[0][9] == 9.0
+    attached.close()
+    single.unlink()
+
+    # an independent process has a resource tracker of its own,
+    # which must neither unlink the block nor report it as leaked on exit
+    import subprocess
+
+    import cinterop
+
+    with SharedTimeSeries(b, pool_workers=False) as independent:
+        assert not independent.descriptor.pool_workers
+        code = (
+            "import pickle, sys; from cffi import FFI; "
+            "pickle.loads(bytes.fromhex(sys.argv[1])).attach(FFI()).close()"
+        )
+        env = dict(os.environ, PYTHONPATH=os.path.dirname(os.path.dirname(cinterop.__file__)))
+        arg = pickle.dumps(independent.descriptor).hex()
+        child = subprocess.run([sys.executable, "-c", code, arg], env=env, capture_output=True, text=True)
+        assert child.returncode == 0 and "leaked" not in child.stderr
+        attached = independent.descriptor.attach(ut_ffi)
+        assert attached.native().ptr.numeric_data[0][9] == 9.0
+        attached.close()
+
+
+def test_compact_pickling():
+    import pickle
+
+    tsg = TimeSeriesGeometry(datetime(2001, 2, 3), 86400, 10, 0)
+    tsg2 = pickle.loads(pickle.dumps(tsg))
+    assert (tsg2.start, tsg2.time_step_seconds, tsg2.length) == (tsg.start, 86400, 10)
+    n = 10000
+    x = mk_hourly_xarray_series(np.arange(n, dtype=float), pd.Timestamp("2000-01-01"))
+    x.name = "rain"
+    x.attrs["units"] = "mm"
+    compact = dumps(x)
+    assert len(compact) < len(pickle.dumps(x, protocol=5)) * 0.6
+    y = loads(compact)
+    assert y.equals(x)
+    assert y.name == "rain" and y.attrs["units"] == "mm"
+    # out-of-band data
+    buffers = []
+    small = dumps(x, buffer_callback=buffers.append)
+    assert len(small) < 1000
+    assert len(buffers) == 1
+    assert loads(small, buffers=buffers).equals(x)
+    # ensemble and monthly series, in a container
+    e = _create_test_series_xr()
+    m = mk_xarray_series(
+        np.arange(24, dtype=float),
+        time_index=create_monthly_time_index(pd.Timestamp("2000-01-01"), 24),
+    )
+    z = loads(dumps({"e": e, "m": m}))
+    assert z["e"].equals(e)
+    assert z["m"].equals(m)
+    c = CompactTimeSeries.from_xarray(e)
+    assert c.to_xarray().equals(e)
+    c2 = pickle.loads(pickle.dumps(CompactTimeSeries.from_xarray(e)))
+    assert c2._time_index is None
+    assert c2.to_xarray().equals(e)
+    # irregular series are pickled as usual
+    irregular = e.isel(time=[0, 1]).copy()
+    last = e.isel(time=[2]).assign_coords(time=[pd.Timestamp("2020-01-10")])
+    irregular = xr.concat([irregular, last], "time")
+    with pytest.raises(ValueError):
+        CompactTimeSeries.from_xarray(irregular)
+    assert loads(dumps(irregular)).equals(irregular)
+
+
+def test_native_handles_pickling():
+    import pickle
+
+    register_ffi("test_native_library", ut_ffi)
+    data = _create_test_series_xr()
+    handle = marshal.as_native_time_series(data)
+    with pytest.raises(pickle.PicklingError):
+        dumps(handle)
+    h = loads(dumps({"a": handle}, ffi_key="test_native_library"))["a"]
+    assert h.ptr != handle.ptr
+    assert np.array_equal(marshal.as_xarray_time_series(h.ptr).values, data.values)
+    tsg = TimeSeriesGeometry(datetime(2001, 2, 3), 86400, 10, 0).as_native(ut_ffi)
+    tsg2 = loads(dumps(tsg, ffi_key="test_native_library"))
+    assert tsg2.ptr != tsg.ptr
+    assert (tsg2.start, tsg2.length) == (tsg.start, 10)
+    with pytest.raises(pickle.PickleError):
+        dumps(handle, ffi_key="unknown")
+    with pytest.raises(pickle.PicklingError):
+        dumps(OwningCffiNativeHandle(ut_ffi.new("double[3]")), ffi_key="test_native_library")
+
+
+def test_time_series_file(tmp_path):
+    data = _create_test_series_xr()
+    path = tmp_path / "series.bin"
+    write_time_series_file(path, data)
+    assert os.path.getsize(path) == 64 + 6 * 8
+    geometry, ensemble_size = read_time_series_header(path)
+    assert (geometry.start, geometry.length, ensemble_size) == (datetime(2020, 1, 1), 3, 2)
+    with open_time_series_file(path) as f:
+        assert np.array_equal(f.data, data.values)
+        native = f.as_native(ut_ffi)
+        # zero copy: the native rows point into the mapping
+        row_address = int(ut_ffi.cast("intptr_t", native.ptr.numeric_data[1]))
+        assert row_address == f.data.ctypes.data + 3 * 8
+        x = marshal.as_xarray_time_series(native.ptr)
+        assert np.array_equal(x.values, data.values)
+        assert np.array_equal(x.time.values, data.time.values)
+        # private mapping: modifications are not written to the file
+        native.ptr.numeric_data[0][0] = -1.0
+        del native, x
+    with open_time_series_file(path) as f:
+        assert f.data[0, 0] == 1.0
+    # from pandas, and from native time series
+    s = pd.Series(
+        np.arange(5, dtype=float),
+        index=create_daily_time_index(pd.Timestamp("2000-01-01"), 5),
+    )
+    write_time_series_file(path, s)
+    with open_time_series_file(path) as f:
+        assert f.ensemble_size == 1 and f.geometry.time_step_seconds == 86400
+        assert np.array_equal(f.data[0], s.values)
+    ptr = ut_dll.create_mtsd()
+    with pytest.raises(ValueError):
+        write_time_series_file(path, ptr)
+    write_time_series_file(path, ptr, ut_ffi)
+    expected = marshal.as_xarray_time_series(ptr)
+    ut_dll.dispose_mtsd(ptr)
+    with open_time_series_file(path) as f:
+        assert np.array_equal(f.series.to_xarray().values, expected.values)
+    path.write_bytes(b"not a time series file" * 10)
+    with pytest.raises(ValueError):
+        open_time_series_file(path)
+
+
+def test_arrow_interop():
+    pa = pytest.importorskip("pyarrow")
+    from cinterop.cffi.arrow import (
+        arrow_to_character_vector,
+        arrow_to_native_time_series,
+        arrow_to_values_vector,
+        character_vector_to_arrow,
+        time_series_to_arrow,
+        values_vector_to_arrow,
+    )
+
+    vv = ut_dll.create_vv()
+    expected = marshal.values_to_nparray(vv)
+    a = values_vector_to_arrow(ut_ffi, vv)
+    assert np.array_equal(a.to_numpy(), expected)
+    b = values_vector_to_arrow(ut_ffi, vv, zero_copy=True)
+    vv.values[0] = 42.0
+    assert b[0].as_py() == 42.0 and a[0].as_py() == expected[0]
+    del b
+    ut_dll.dispose_vv(vv)
+    arr = pa.array([1.0, 2.0, 3.0])
+    native = arrow_to_values_vector(ut_ffi, arr)
+    assert native.ptr.size == 3
+    assert ut_dll.first_in_vv(native.ptr[0]) == 1.0
+    back_vv = values_vector_to_arrow(ut_ffi, native)
+    assert np.array_equal(back_vv.to_numpy(), [1.0, 2.0, 3.0])
+    with pytest.raises(ValueError):
+        arrow_to_values_vector(ut_ffi, pa.array([1.0, None]))
+
+    strings = pa.array(["a", "", "héllo", "xyz"])
+    cvec = arrow_to_character_vector(ut_ffi, strings)
+    assert marshal.c_charptrptr_as_string_list(cvec.ptr.values, 4) == strings.to_pylist()
+    assert ut_ffi.string(ut_dll.first_in_cvec(cvec.ptr[0])) == b"a"
+    assert character_vector_to_arrow(ut_ffi, cvec).equals(strings)
+    chunked = pa.chunked_array([strings[1:], strings[:1]])
+    sliced = arrow_to_character_vector(ut_ffi, chunked)
+    assert character_vector_to_arrow(ut_ffi, sliced).to_pylist() == ["", "héllo", "xyz", "a"]
+    empty = arrow_to_character_vector(ut_ffi, pa.array([], pa.string()))
+    assert len(character_vector_to_arrow(ut_ffi, empty)) == 0
+    with pytest.raises(ValueError):
+        arrow_to_character_vector(ut_ffi, pa.array(["a", None]))
+
+    mtsd = ut_dll.create_mtsd()
+    x = marshal.as_xarray_time_series(mtsd)
+    table = time_series_to_arrow(ut_ffi, mtsd)
+    assert table.column_names == ["time", "0", "1"]
+    assert table.schema.field("time").type == pa.timestamp("s")
+    times = table.column("time").to_numpy().astype("datetime64[ns]")
+    assert np.array_equal(times, x.time.values.astype("datetime64[ns]"))
+    assert np.array_equal(table.column("1").to_numpy(), x.values[1])
+    shallow = time_series_to_arrow(ut_ffi, mtsd, zero_copy=True)
+    assert shallow.equals(table)
+    del shallow
+    ut_dll.dispose_mtsd(mtsd)
+    back = arrow_to_native_time_series(ut_ffi, table)
+    y = marshal.as_xarray_time_series(back.ptr)
+    assert np.array_equal(y.values, x.values)
+    assert np.array_equal(y.time.values, x.time.values)
+    # columns without nulls are passed to native code without copy
+    row_address = int(ut_ffi.cast("intptr_t", back.ptr.numeric_data[0]))
+    assert row_address == table.column("0").chunk(0).buffers()[1].address
+    one_row = table.slice(0, 1)
+    with pytest.raises(ValueError):
+        arrow_to_native_time_series(ut_ffi, one_row)
+    single = arrow_to_native_time_series(ut_ffi, one_row, time_step_seconds=3600)
+    assert single.ptr.time_series_geometry.length == 1
+    assert single.ptr.time_series_geometry.time_step_seconds == 3600
+    assert np.array_equal(marshal.as_xarray_time_series(single.ptr).values, x.values[:, :1])
+    with pytest.raises(ValueError):
+        arrow_to_native_time_series(ut_ffi, table.slice(0, 0), time_step_seconds=3600)
+
+
+def test_native_array_export():
+    import gc
+    import weakref
+
+    x = marshal.new_double_array(4)
+    for i in range(4):
+        x[i] = i + 0.5
+    a = NativeArray(ut_ffi, x, 4)
+    assert a.shape == (4,) and a.nbytes == 32 and len(a) == 4
+    y = np.asarray(a)
+    assert np.array_equal(y, [0.5, 1.5, 2.5, 3.5])
+    y[0] = 42.0
+    assert x[0] == 42.0
+    assert np.array_equal(np.from_dlpack(a), y)
+    assert a.__dlpack_device__() == (1, 0)
+    assert np.array_equal(np.frombuffer(a.__buffer__(0), dtype=np.float64), y)
+    assert a.__buffer__(0).readonly
+    writable = a.__buffer__(1)
+    assert not writable.readonly
+    writable[1] = 7.0
+    del writable
+    assert x[1] == 7.0
+    if sys.version_info >= (3, 12):
+        import inspect
+
+        assert memoryview(a).readonly
+        assert not a.__buffer__(inspect.BufferFlags.WRITABLE).readonly
+    assert np.array_equal(np.asarray(NativeArray(ut_ffi, x, (2, 2))), y.reshape((2, 2)))
+    # the numpy array keeps the native memory alive
+    handle = marshal.as_native_time_series(_create_test_series_xr())
+    rows = marshal.time_series_rows_as_arrays(handle)
+    ref = weakref.ref(handle)
+    z = np.asarray(rows[1])
+    del handle, rows
+    gc.collect()
+    assert ref() is not None
+    assert np.array_equal(z, [4.0, 5.0, 6.0])
+    del z
+    gc.collect()
+    assert ref() is None
+    vv = ut_dll.create_vv()
+    v = marshal.values_vector_as_array(vv)
+    assert np.array_equal(np.asarray(v), marshal.values_to_nparray(vv))
+    del v
+    ut_dll.dispose_vv(vv)
+    assert np.asarray(NativeArray(ut_ffi, x, 0)).shape == (0,)
+    scalar = NativeArray(ut_ffi, x, ())
+    assert scalar.size == 1 and np.asarray(scalar)[()] == 42.0
+    with pytest.raises(TypeError):
+        len(scalar)
+    with pytest.raises(TypeError):
+        NativeArray(ut_ffi, ut_ffi.new("char[3]"), 3)
+
+
+def test_native_struct_wrappers():
+    ptr = ut_dll.create_vv()
+    vv = marshal.wrap_native_struct(ptr)
+    assert isinstance(vv, ValuesVectorNative)
+    assert vv.values is vv.values
+    assert np.array_equal(vv.values, marshal.values_to_nparray(ptr))
+    del vv
+    ut_dll.dispose_vv(ptr)
+    data = np.array([3.0, 4.0])
+    vv = ValuesVectorNative.from_values(ut_ffi, data)
+    assert len(vv) == 2
+    assert ut_dll.first_in_vv(vv.obj) == 3.0
+    vv.values[0] = 5.0
+    assert data[0] == 5.0
+
+    ptr = ut_dll.create_nvv()
+    nvv = marshal.wrap_native_struct(ptr)
+    assert isinstance(nvv, NamedValuesVectorNative)
+    assert nvv.to_dict() == marshal.named_values_to_dict(ptr)
+    assert nvv.names is nvv.names
+    assert nvv.to_dict() is nvv.to_dict()
+    del nvv
+    ut_dll.dispose_nvv(ptr)
+    nvv = NamedValuesVectorNative.from_dict(ut_ffi, {"c": 3.0, "d": 4.0})
+    assert nvv.names == ["c", "d"]
+    assert ut_dll.first_in_nvv(nvv.obj) == 3.0
+
+    ptr = ut_dll.create_cvec()
+    cvec = marshal.wrap_native_struct(ptr)
+    assert isinstance(cvec, CharacterVectorNative)
+    assert cvec.values == marshal.character_vector_as_string_list(ptr)
+    assert cvec.values is cvec.values
+    assert cvec[0] == "a"
+    del cvec
+    ut_dll.dispose_cvec(ptr)
+    cvec = CharacterVectorNative.from_strings(ut_ffi, ["c", "d"])
+    assert cvec.values == ["c", "d"]
+
+    ptr = ut_dll.create_ssm()
+    ssm = marshal.wrap_native_struct(ptr)
+    assert isinstance(ssm, StringStringMapNative)
+    assert ssm.to_dict() == marshal.string_map_to_dict(ptr)
+    del ssm
+    ut_dll.dispose_ssm(ptr)
+    ssm = StringStringMapNative.from_dict(ut_ffi, {"c": "C", "d": "D"})
+    assert ssm.keys == ["c", "d"] and ssm.values == ["C", "D"]
+
+    x = _create_test_series_xr()
+    mtsd = MultiRegularTimeSeriesDataNative.from_time_series(ut_ffi, x)
+    assert mtsd.ensemble_size == 2
+    assert mtsd.geometry.length == 3
+    assert mtsd.rows is mtsd.rows
+    assert np.array_equal(mtsd.to_numpy(), x.values)
+    assert mtsd.to_xarray() is mtsd.to_xarray()
+    assert np.array_equal(mtsd.to_xarray().time.values, x.time.values)
+    mtsd.ptr.numeric_data[0][0] = 42.0
+    assert mtsd.rows[0][0] == 42.0
+    mtsd.refresh()
+    assert mtsd.to_xarray().values[0, 0] == 42.0
+
+    # the cached views do not keep the wrappers alive, but keep the native memory alive
+    import gc
+    import weakref
+
+    vv = ValuesVectorNative.from_values(ut_ffi, np.arange(5.0))
+    values = vv.values
+    ref = weakref.ref(vv)
+    del vv
+    gc.collect()
+    assert ref() is None
+    assert np.array_equal(values, np.arange(5.0))
+    mtsd = MultiRegularTimeSeriesDataNative.from_time_series(ut_ffi, x)
+    rows = mtsd.rows
+    nvv = NamedValuesVectorNative.from_dict(ut_ffi, {"c": 3.0, "d": 4.0})
+    assert np.array_equal(nvv.values, [3.0, 4.0])
+    refs = [weakref.ref(mtsd), weakref.ref(nvv)]
+    del mtsd, nvv
+    gc.collect()
+    assert all(r() is None for r in refs)
+    assert np.array_equal(rows[1], x.values[1])
+
+    with pytest.raises(TypeError):
+        marshal.wrap_native_struct(ut_ffi.new("double[3]"))
+
+
+def test_struct_converter():
+    conv = struct_converter(ut_ffi, "regular_time_series_geometry")
+    assert struct_converter(ut_ffi, "regular_time_series_geometry") is conv
+    x = _create_test_series_xr()
+    native = marshal.as_native_time_series(x)
+    d = conv.to_dict(native.ptr.time_series_geometry)
+    assert d["start"]["year"] == 2020 and d["length"] == 3
+    assert d["time_step_seconds"] == 86400
+    h = conv.from_dict(d)
+    assert conv.to_dict(h.ptr) == d
+    assert marshal.as_datetime(h.ptr.start) == datetime(2020, 1, 1)
+    assert conv.to_object(h) == conv.dataclass()(**d)
+
+    # bulk conversions with numpy structured arrays, without copies
+    items = conv.from_dicts([{"length": i, "start": {"year": 2000 + i}} for i in range(4)])
+    arr = conv.as_structured_array(items, 4)
+    assert np.array_equal(arr["length"], np.arange(4))
+    assert np.array_equal(arr["start"]["year"], 2000 + np.arange(4))
+    arr["time_step_seconds"] = 3600
+    assert items.ptr[2].time_step_seconds == 3600
+    assert conv.to_dicts(items, 4)[3]["start"]["year"] == 2003
+    back = conv.from_structured_array(arr)
+    assert back.ptr[1].start.year == 2001
+    assert conv.as_structured_array(back, 4).ctypes.data == arr.ctypes.data
+
+    # strings and pointers
+    ssm = struct_converter(ut_ffi, "string_string_map*")
+    assert ssm.dtype is not None
+    keys = marshal.as_arrayof_bytes(["a", "b"])
+    values = marshal.as_arrayof_bytes(["A", "B"])
+    h = ssm.from_dict({"size": 2, "keys": keys, "values": values})
+    assert marshal.string_map_to_dict(h.ptr) == {"a": "A", "b": "B"}
+    vv = struct_converter(ut_ffi, "values_vector")
+    assert struct_converter(ut_ffi, "values_vector*") is vv
+    assert struct_converter(ut_ffi, ut_ffi.typeof("values_vector *")) is vv
+    values = np.array([3.0, 4.0])
+    h = vv.from_dict({"size": 2, "values": values})
+    assert ut_dll.first_in_vv(h.obj) == 3.0
+    # no copy of an array of the pointed type, conversion of other numbers
+    h.ptr.values[1] = 42.0
+    assert values[1] == 42.0
+    h = vv.from_dict({"size": 2, "values": np.array([5, 6], dtype=np.int32)})
+    assert h.ptr.values[1] == 6.0
+    with pytest.raises(TypeError):
+        vv.from_dict({"size": 2, "values": np.array([1j, 2j])})
+    ld_ffi = FFI()
+    ld_ffi.cdef("typedef struct { long double x; int n; } long_double_struct;")
+    assert struct_converter(ld_ffi, "long_double_struct").dtype is None
+    # the converters cached for an FFI object do not keep it alive
+    import gc
+    import weakref
+
+    ref = weakref.ref(ld_ffi)
+    del ld_ffi
+    gc.collect()
+    assert ref() is None
+    # converters of nested structs, created while converting the outer struct, stay cached
+    from cinterop.cffi.structs import _CONVERTERS_ATTR
+
+    nested_ffi = FFI()
+    nested_ffi.cdef("typedef struct { int a; } inner_struct; typedef struct { inner_struct x; } outer_struct;")
+    struct_converter(nested_ffi, "outer_struct")
+    assert len(getattr(nested_ffi, _CONVERTERS_ATTR)) == 2
+    cv = struct_converter(ut_ffi, "character_vector")
+    assert cv.to_dict(cv.from_dict({"size": 0, "values": None}).ptr)["values"] == ut_ffi.NULL
+    with pytest.raises(TypeError):
+        struct_converter(ut_ffi, "double")
+
+
+def test_cached_conversion_plans():
+    assert marshal.ctype("double*") is marshal.ctype("double*")
+    convert = marshal.numeric_array_converter("double*")
+    assert marshal.numeric_array_converter(ut_ffi.typeof("double *")) is convert
+    x = marshal.new_double_array(3)
+    for i in range(3):
+        x[i] = i + 1.0
+    a = convert(x, 3)
+    assert np.array_equal(a, [1.0, 2.0, 3.0])
+    a[0] = 42.0
+    assert x[0] == 1.0
+    convert(x, 3, True)[0] = 42.0
+    assert x[0] == 42.0
+    assert np.array_equal(marshal.as_numeric_np_array(x, 2), [42.0, 2.0])
+    assert marshal.as_numeric_np_array(ut_ffi.new("float[2]"), 2).dtype == np.float32
+    assert marshal.as_np_array_double(x, 0).shape == (0,)
+    with pytest.raises(TypeError):
+        marshal.numeric_array_converter("int*")
+    strings = marshal.as_arrayof_bytes(["a", "bc"])
+    assert marshal.c_charptrptr_as_string_list(strings.ptr, 2) == ["a", "bc"]
+    assert marshal.c_charptrptr_as_string_list(ut_ffi.cast("void*", strings.ptr), 2) == ["a", "bc"]
+
+
+def test_native_function_bindings():
+    cdecl = "char* value_for_key_ssm(const char* key, string_string_map ssm);"
+    assert cdef_arg_names(cdecl) == ["key", "ssm"]
+    with pytest.raises(ValueError):
+        cdef_arg_names("void f(int, char*);")
+    assert cdef_arg_names("int apply(int (*callback)(int, int), double values[3], int n);") == [
+        "callback",
+        "values",
+        "n",
+    ]
+    with pytest.raises(ValueError):
+        cdef_arg_names("int apply(int (*)(int, int), int n);")
+    value_for_key = bind_native_function(
+        ut_ffi,
+        ut_dll,
+        "value_for_key_ssm",
+        cdef_arg_names(cdecl),
+        hints={"return": str},
+        dispose=ut_dll.delete_char_array,
+    )
+    assert value_for_key("c", {"c": "C", "d": "D"}) == "C"
+    ptr = ut_dll.create_ssm()
+    assert value_for_key("a", ptr) == "A"
+    assert value_for_key(b"a", ptr[0]) == "A"
+    ut_dll.dispose_ssm(ptr)
+
+    @native_binding(ut_ffi, ut_dll)
+    def first_in_vv(vv: np.ndarray) -> float:
+        """First value"""
+
+    assert first_in_vv(np.array([3.0, 4.0])) == 3.0
+    assert first_in_vv.__doc__ == "First value"
+
+    @native_binding(ut_ffi, ut_dll)
+    def get_array_double(arr, index: int) -> float:
+        ...
+
+    assert get_array_double(np.arange(3.0), 2) == 2.0
+    assert get_array_double([1.0, 5.0], 1) == 5.0
+
+    @native_binding(ut_ffi, ut_dll, dispose=ut_dll.dispose_cvec)
+    def create_cvec() -> List[str]:
+        ...
+
+    assert create_cvec() == ["a", "b"]
+
+    @native_binding(ut_ffi, ut_dll, dispose=ut_dll.dispose_mtsd)
+    def create_mtsd() -> xr.DataArray:
+        ...
+
+    assert isinstance(create_mtsd(), xr.DataArray)
+
+    @native_binding(ut_ffi, ut_dll)
+    def first_in_nvv(nvv: Dict[str, float]) -> float:
+        ...
+
+    assert first_in_nvv({"x": 2.0}) == 2.0
+    with pytest.raises(ValueError):
+        bind_native_function(ut_ffi, ut_dll, "first_in_vv", ["a", "b"])
+    with pytest.raises(ValueError):
+        bind_native_function(ut_ffi, ut_dll, "create_vv", dispose=ut_dll.dispose_vv)
+
+
+def test_convert_strings():
+    value_for_key = convert_strings(ut_dll.value_for_key_ssm)
+    assert value_for_key.__wrapped__ is ut_dll.value_for_key_ssm
+    ssm = ut_dll.create_ssm()
+    x = value_for_key("a", ssm[0])
+    assert marshal.c_string_as_py_string(x) == "A"
+    ut_dll.delete_char_array(x)
+    ut_dll.dispose_ssm(ssm)
+    get_year = convert_strings(ut_dll.get_year)
+    assert get_year(marshal.datetime_to_dtts(datetime(2001, 2, 3)).ptr[0]) == 2001
+
+    @convert_strings
+    def f(*args, **kwargs):
+        return list(args) + list(kwargs.values())
+
+    assert f("a", 1, b="é") == ["a", 1, "é"]
+    assert f.__name__ == "f"
+    assert convert_strings(lambda: (b"a", b"b"))() == ["a", "b"]
+    assert convert_strings(lambda: b"abc")() == "abc"
+    assert convert_strings(lambda: [b"a", b"", "c", None])() == ["a", "", "c", None]
+    assert convert_strings(lambda: [b"a\0b", b"c"])() == ["a\0b", "c"]
+    # only bytes are decoded: other bytes-like objects are returned unchanged
+    buffer = bytearray(b"b")
+    arr = np.frombuffer(b"cd", dtype=np.uint8)
+    converted = convert_strings(lambda: [b"a", buffer, arr])()
+    assert converted[0] == "a" and converted[1] is buffer and converted[2] is arr
+
+
+def test_forecasts_series_interop():
+    issue_times = create_daily_time_index("2000-01-01", 4)
+    npx = np.arange(2 * 3 * 4, dtype=float).reshape((2, 3, 4))
+    fcasts = create_ensemble_forecasts_series(npx, [0, 1], [0, 1, 2], issue_times)
+    native = marshal.as_native_forecasts_series(fcasts, lead_time_step_seconds=3600)
+    ptr = native.ptr
+    assert ptr[1].ensemble_size == 2
+    assert ptr[1].time_series_geometry.length == 3
+    assert ptr[1].time_series_geometry.time_step_seconds == 3600
+    assert marshal.as_datetime(ptr[1].time_series_geometry.start) == datetime(2000, 1, 2)
+    # issue time 1, ensemble member 1, lead time 2
+    assert ptr[1].numeric_data[1][2] == npx[1, 2, 1]
+    x = marshal.as_xarray_forecasts_series(ptr, 4, name="fcast")
+    assert x.name == "fcast"
+    assert x.dims == fcasts.dims
+    assert np.array_equal(x.values, npx)
+    assert np.array_equal(x.time.values, fcasts.time.values)
+
+    # dimensions ordered (time, ensemble, lead_time): no copy
+    fcasts = fcasts.transpose("time", "ensemble", "lead_time")
+    fcasts = fcasts.copy(data=np.ascontiguousarray(fcasts.values))
+    native = marshal.as_native_forecasts_series(fcasts)
+    assert native.ptr[0].time_series_geometry.time_step_seconds == 86400
+    native.ptr[3].numeric_data[0][1] = 3.1415
+    assert fcasts.values[3, 0, 1] == 3.1415
+
+    with pytest.raises(ValueError):
+        marshal.as_native_forecasts_series(_create_test_series_xr())
+
+    # a single issue time: the lead time step cannot be inferred from the issue times
+    single = create_ensemble_forecasts_series(
+        npx[:, :, :1], [0, 1], [0, 1, 2], issue_times[:1]
+    )
+    with pytest.raises(ValueError):
+        marshal.as_native_forecasts_series(single)
+    native = marshal.as_native_forecasts_series(single, lead_time_step_seconds=3600)
+    assert native.ptr[0].time_series_geometry.time_step_seconds == 3600
+    assert native.ptr[0].numeric_data[1][2] == npx[1, 2, 0]
+    # the lead time step is kept when converting from native structs, and back
+    back = marshal.as_xarray_forecasts_series(native.ptr, 1)
+    assert back.attrs[LEAD_TIME_STEP_ATTR] == 3600
+    again = marshal.as_native_forecasts_series(back)
+    assert again.ptr[0].time_series_geometry.time_step_seconds == 3600
+    assert np.array_equal(marshal.as_xarray_forecasts_series(again.ptr, 1).values, back.values)
+    # monthly issue times
+    monthly = fcasts.isel(time=slice(0, 2)).assign_coords(
+        time=pd.DatetimeIndex(["2000-01-01", "2000-02-01"])
+    )
+    with pytest.raises(ValueError):
+        marshal.as_native_forecasts_series(monthly)
+    assert marshal.as_native_forecasts_series(monthly, 86400).ptr[1].time_series_geometry.time_step_seconds == 86400
+
+
+def test_nd_time_series_interop():
+    time_index = create_daily_time_index("2000-01-01", 5)
+    npx = np.arange(3 * 2 * 5, dtype=float).reshape((3, 2, 5))
+    data = xr.DataArray(
+        npx,
+        coords=[["a", "b", "c"], ["rain", "pet"], time_index],
+        dims=["site", "variable", "time"],
+    )
+    native = marshal.as_native_nd_time_series(data)
+    dims = native.dimensions.ptr
+    assert dims.num_dimensions == 3
+    assert marshal.c_string_as_py_string(dims.dimensions[1].dimension_type) == "variable"
+    assert dims.dimensions[2].size == 5
+    assert native.time_series_geometry.length == 5
+    # no copy for C-contiguous float64 input
+    native.data.ptr[7] = 3.1415
+    assert npx[0, 1, 2] == 3.1415
+
+    x = marshal.nd_time_series_as_xarray(
+        dims,
+        native.data.ptr,
+        native.time_series_geometry.ptr,
+        coords={"site": ["a", "b", "c"]},
+        name="nd",
+    )
+    assert x.name == "nd"
+    assert x.dims == ("site", "variable", "time")
+    assert np.array_equal(x.values, npx)
+    assert list(x.site.values) == ["a", "b", "c"]
+    assert list(x.coords["variable"].values) == [0, 1]
+    assert np.array_equal(x.time.values, data.time.values)
+    x.values[0, 0, 0] = -1.0
+    assert npx[0, 0, 0] == 0.0
+    x = marshal.nd_time_series_as_xarray(dims, native.data.ptr, shallow=True)
+    x.values[0, 0, 0] = -1.0
+    assert npx[0, 0, 0] == -1.0
+
+    # Not C-contiguous: copied once to a contiguous block
+    native = marshal.as_native_nd_time_series(data.transpose("time", "site", "variable"))
+    x = marshal.nd_time_series_as_xarray(native.dimensions.ptr, native.data.ptr)
+    assert x.dims == ("time", "site", "variable")
+    assert x.values[2, 1, 0] == npx[1, 0, 2]
+
+    # a single time step: the time step must be given
+    single = data.isel(time=slice(0, 1))
+    with pytest.raises(ValueError):
+        marshal.as_native_nd_time_series(single)
+    native = marshal.as_native_nd_time_series(single, time_step_seconds=3600)
+    assert native.time_series_geometry.length == 1
+    assert native.time_series_geometry.time_step_seconds == 3600
+
+
+def test_multi_statistic_definition():
+    obs = _create_univariate_test_series_xr()
+    obs_copy = obs.copy(deep=True)
+    other_obs = obs + 1.0
+    native_obs = as_native_time_series(ut_ffi, obs)
+
+    def _stat(i, observations, start=None, end=None):
+        return {
+            "model_variable_id": "node.%d.flow" % i,
+            "objective_identifier": "NSE_%d" % i,
+            "objective_name": "NSE",
+            "statistic_identifier": "nse",
+            "start": start,
+            "end": end,
+            "observations": observations,
+        }
+
+    objectives = [
+        _stat(0, obs),
+        _stat(1, obs, start="2020-01-02"),
+        _stat(2, obs_copy),
+        _stat(3, other_obs),
+        _stat(4, native_obs),
+    ]
+    msd = marshal.as_native_multi_statistic_definition(objectives, "mix")
+    ptr = msd.ptr
+    assert ptr.size == 5
+    assert marshal.c_string_as_py_string(ptr.mix_statistics_id) == "mix"
+    stats = [ptr.statistics[i] for i in range(5)]
+    assert marshal.c_string_as_py_string(stats[1].objective_identifier) == "NSE_1"
+    assert marshal.c_string_as_py_string(stats[1].model_variable_id) == "node.1.flow"
+    # identical strings are interned
+    assert stats[0].objective_name == stats[4].objective_name
+    # identical observations share the same native series
+    assert stats[0].observations == stats[1].observations
+    assert stats[0].observations == stats[2].observations
+    assert stats[0].observations != stats[3].observations
+    assert stats[4].observations == native_obs.ptr
+    assert stats[3].observations.numeric_data[0][0] == 2.0
+    assert marshal.as_datetime(stats[0].start) == datetime(2020, 1, 1)
+    assert marshal.as_datetime(stats[0].end) == datetime(2020, 1, 3)
+    assert marshal.as_datetime(stats[1].start) == datetime(2020, 1, 2)
+
+    df = pd.DataFrame(objectives[:2])
+    msd = marshal.as_native_multi_statistic_definition(df)
+    assert msd.ptr.size == 2
+    assert msd.ptr.statistics[0].observations == msd.ptr.statistics[1].observations
+
+    # start and end are optional, and default to the bounds of the observations
+    no_period = {k: v for k, v in _stat(5, obs).items() if k not in ("start", "end")}
+    msd = marshal.as_native_multi_statistic_definition([no_period])
+    assert marshal.as_datetime(msd.ptr.statistics[0].start) == datetime(2020, 1, 1)
+    assert marshal.as_datetime(msd.ptr.statistics[0].end) == datetime(2020, 1, 3)
+
+    del objectives[0]["observations"]
+    with pytest.raises(KeyError):
+        marshal.as_native_multi_statistic_definition(objectives)
+
+
 #   43,1: typedef struct _time_series_dimension_description
 #   50,1: typedef struct _time_series_dimensions_description
 #   57,1: typedef struct _statistic_definition
@@ -11,8 +11,10 @@ from cinterop.timeseries import (
     create_even_time_index,
     end_ts,
     mk_daily_xarray_series,
+    stacked_ts_windows,
     start_ts,
     ts_window,
+    ts_windows,
 )
 
 pkg_dir = os.path.join(os.path.dirname(__file__), "..")
@@ -45,6 +47,52 @@ def test_ts_window():
         assert end_ts(sts) == d_mid
 
 
+def test_ts_windows():
+    d = as_datetime64(datetime(2000, 1, 1))
+    x = np.arange(31, dtype=float)
+    ts = mk_daily_xarray_series(x, d)
+    windows = [
+        ("2000-01-01", "2000-01-05"),
+        ("2000-01-03", "2000-01-07"),
+        (None, "2000-01-02"),
+        ("2000-01-30", None),
+        ("1999-01-01", "1999-02-01"),
+    ]
+    sseries = [ts, ts.to_series(), ts.to_dataframe(name="test")]
+    for s in sseries:
+        subsets = ts_windows(s, windows)
+        assert len(subsets) == len(windows)
+        for w, sts in zip(windows, subsets):
+            expected = ts_window(s, from_date=w[0], to_date=w[1])
+            assert np.array_equal(sts.squeeze().values, expected.squeeze().values)
+        assert start_ts(subsets[1]) == as_datetime64("2000-01-03")
+        assert end_ts(subsets[1]) == as_datetime64("2000-01-07")
+        assert len(subsets[4]) == 0
+
+    # windows of the xarray series are views, not copies
+    subsets = ts_windows(ts, windows[:1])
+    assert np.shares_memory(subsets[0].values, ts.values)
+
+    # evenly spaced windows: a strided view
+    evenly = [("2000-01-01", "2000-01-05"), ("2000-01-03", "2000-01-07"), ("2000-01-05", "2000-01-09")]
+    stacked = stacked_ts_windows(ts, evenly)
+    assert stacked.shape == (3, 5)
+    assert np.shares_memory(stacked, ts.values)
+    assert np.array_equal(stacked[2], np.arange(4, 9, dtype=float))
+    # unevenly spaced: a copy
+    unevenly = [("2000-01-01", "2000-01-05"), ("2000-01-03", "2000-01-07"), ("2000-01-04", "2000-01-08")]
+    stacked = stacked_ts_windows(ts.to_series(), unevenly)
+    assert stacked.shape == (3, 5)
+    assert np.array_equal(stacked[2], np.arange(3, 8, dtype=float))
+    with pytest.raises(ValueError):
+        stacked_ts_windows(ts, windows[:3])
+
+    df = pd.DataFrame({"a": x, "b": x + 100}, index=ts.to_series().index)
+    stacked = stacked_ts_windows(df, unevenly)
+    assert stacked.shape == (3, 5, 2)
+    assert np.array_equal(stacked[1, :, 1], np.arange(102, 107, dtype=float))
+
+
 def test_create_even_time_index():
     n = 7
     d = as_datetime64(datetime(2000, 1, 2, 3, 4, 5))